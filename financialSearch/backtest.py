@@ -0,0 +1,162 @@
+"""
+Backtest vectorizado de la regla comprar/vender/mantener de analyze_data.
+
+La regla se evalúa en todas las barras a la vez: en el día t se usan solo los cierres hasta t,
+con los mismos indicadores que compute_analysis (pendiente de 10 días, SMA_5 frente a EMA_5 y
+RSI simple de 14 días), de modo que la señal del día t es la recomendación que habría dado
+el análisis con el histórico hasta ese día.
+
+Simulación: 'comprar' abre una posición larga, 'vender' la cierra (o pasa a corto con
+allow_short=True) y 'mantener' conserva la posición. La posición decidida al cierre de t gana
+el rendimiento de t a t + 1.
+
+Este módulo no usa el ORM, para que sus funciones se puedan ejecutar en un pool de procesos.
+"""
+import numpy as np
+
+from . import indicators, pools
+
+BUY, HOLD, SELL = 1, 0, -1
+
+# El análisis exige 20 días; la SMA_5 de los 4 primeros es NaN, igual que en getReturns
+SMA_WINDOW = 5
+MIN_VALID_DAYS = 20
+TRADING_DAYS = 252
+
+# Un ticker de ~1000 barras se evalúa en menos de 1 ms: por debajo de este número de tickers
+# el backtest se hace en el proceso actual
+PARALLEL_MIN_TICKERS = 64
+
+
+def signals(close):
+    """
+    Señal de la regla de analyze_data en cada barra.
+
+    Parámetros:
+    - close: Array 1-D o 2-D (tickers x días) de cierres.
+
+    Retorna:
+    - Array de enteros de la misma forma: BUY (1), SELL (-1) o HOLD (0); HOLD también en las
+      barras sin histórico suficiente para el análisis.
+    """
+    close = np.asarray(close, dtype=float)
+    result = np.zeros(close.shape, dtype=np.int8)
+    # build_returns pasa a compute_analysis la serie completa (la SMA_5 con sus NaN iniciales),
+    # así que los indicadores se calculan desde el primer cierre
+    if close.shape[-1] < MIN_VALID_DAYS:
+        return result
+
+    slope = indicators.rolling_slope(close, 10)
+    sma_5 = indicators.sma(close, SMA_WINDOW)
+    ema_5 = indicators.ema(close, span=5)
+    rsi = indicators.rsi(close, 14, method='simple')
+
+    buy = (slope > 0) & (sma_5 > ema_5) & (rsi < 70)
+    sell = (slope < 0) & (sma_5 < ema_5) & (rsi > 30)
+    result[...] = np.where(buy, BUY, np.where(sell, SELL, HOLD))
+    result[..., :MIN_VALID_DAYS - 1] = HOLD
+    return result
+
+
+def positions(signal, allow_short=False):
+    """
+    Posición al cierre de cada barra: la última señal BUY/SELL se mantiene hasta la siguiente.
+
+    Retorna:
+    - Array de floats 1 (largo), 0 (fuera) o -1 (corto, solo con allow_short=True).
+    """
+    signal = np.asarray(signal)
+    target = np.where(signal == BUY, 1.0, -1.0 if allow_short else 0.0)
+    # Índice de la última señal no neutra hasta cada barra (-1 si todavía no hubo ninguna)
+    last = np.where(signal != HOLD, np.arange(signal.shape[-1]), -1)
+    last = np.maximum.accumulate(last, axis=-1)
+    held = np.take_along_axis(target, np.maximum(last, 0), axis=-1)
+    return np.where(last >= 0, held, 0.0)
+
+
+def max_drawdown(equity):
+    """Mayor caída relativa desde un máximo previo de la curva de capital (valor <= 0)."""
+    if not len(equity):
+        return 0.0
+    peaks = np.maximum.accumulate(np.maximum(equity, 1.0))
+    return float((equity / peaks - 1).min())
+
+
+def run(close, allow_short=False, cost=0.0):
+    """
+    Backtest de la regla sobre una serie de cierres.
+
+    Parámetros:
+    - close: Array 1-D de cierres en orden cronológico.
+    - allow_short: Si True, 'vender' abre una posición corta en lugar de quedarse fuera.
+    - cost: Costo por unidad de cambio de posición, como fracción (0.001 = 10 pb).
+
+    Retorna:
+    - Diccionario con 'bars', 'total_return', 'annualized_return', 'buy_and_hold_return',
+      'max_drawdown', 'trades', 'hit_rate' (proporción de operaciones ganadoras, None sin
+      operaciones) y 'exposure' (proporción de días con posición abierta).
+    """
+    close = np.asarray(close, dtype=float)
+    bars = close.shape[0]
+    if bars < 2:
+        return {
+            'bars': bars, 'total_return': 0.0, 'annualized_return': 0.0, 'buy_and_hold_return': 0.0,
+            'max_drawdown': 0.0, 'trades': 0, 'hit_rate': None, 'exposure': 0.0,
+        }
+
+    position = positions(signals(close), allow_short)
+    daily = close[1:] / close[:-1] - 1
+    held = position[:-1]
+    changes = np.abs(np.diff(np.concatenate([[0.0], held])))
+    strategy = held * daily - changes * cost
+    equity = np.cumprod(1 + strategy)
+
+    # Operaciones: tramos consecutivos con la misma posición abierta
+    starts = np.flatnonzero((held != 0) & (changes != 0))
+    if len(starts):
+        segment = np.cumsum(changes != 0)
+        growth = np.log1p(strategy)
+        trade_returns = np.expm1(np.bincount(segment, weights=growth)[segment[starts]])
+        hit_rate = float((trade_returns > 0).mean())
+    else:
+        hit_rate = None
+
+    total = float(equity[-1] - 1)
+    years = len(daily) / TRADING_DAYS
+    return {
+        'bars': bars,
+        'total_return': total,
+        'annualized_return': float((1 + total) ** (1 / years) - 1) if total > -1 else -1.0,
+        'buy_and_hold_return': float(close[-1] / close[0] - 1),
+        'max_drawdown': max_drawdown(equity),
+        'trades': int(len(starts)),
+        'hit_rate': hit_rate,
+        'exposure': float((held != 0).mean()),
+    }
+
+
+def _run_item(item):
+    ticker, close, allow_short, cost = item
+    return ticker, run(close, allow_short, cost)
+
+
+def run_many(closes, allow_short=False, cost=0.0, max_workers=None, min_tickers=PARALLEL_MIN_TICKERS):
+    """
+    Backtest de varios tickers, repartido en el pool de procesos compartido si son muchos.
+
+    Parámetros:
+    - closes: Diccionario {ticker: array de cierres}.
+    - allow_short, cost: Como en `run`.
+    - max_workers: Procesos del pool (por defecto os.cpu_count()); con 1 se ejecuta en el proceso actual.
+    - min_tickers: Tickers a partir de los cuales se usa el pool; con menos, enviar los cierres a
+      otros procesos cuesta más que calcularlos aquí.
+
+    Retorna:
+    - Diccionario {ticker: resultado de `run`} en el orden de `closes`.
+    """
+    items = [(ticker, close, allow_short, cost) for ticker, close in closes.items()]
+    max_workers = min(pools.pool_size(max_workers), len(items))
+    if max_workers <= 1 or len(items) < min_tickers:
+        return dict(map(_run_item, items))
+    chunksize = max(1, len(items) // (max_workers * 4))
+    return dict(pools.map_in_pool(_run_item, items, max_workers, chunksize))
@@ -0,0 +1,182 @@
+"""
+Benchmarks de analyze_data y de la vista getReturns con series sintéticas de distintos tamaños.
+
+No se ejecutan con la suite normal (pytest.ini excluye la marca `benchmark`). Para correrlos:
+
+    pytest -m benchmark financialSearch/benchmark_tests.py
+
+Cada caso registra tiempo de pared (mejor de varias repeticiones), pico de memoria y bloques
+de memoria retenidos (tracemalloc), y falla si el tiempo o el pico superan la línea base
+guardada en benchmark_baseline.json multiplicada por el umbral.
+
+Variables de entorno:
+- BENCHMARK_THRESHOLD: factor de regresión permitido (por defecto 1.5).
+- BENCHMARK_UPDATE=1: reescribe la línea base con los resultados actuales en lugar de comparar.
+- BENCHMARK_SIZES / BENCHMARK_VIEW_SIZES: tamaños separados por comas para analyze_data y la vista.
+"""
+import json
+import os
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import allure
+import numpy as np
+import pandas as pd
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from financialSearch.cache import analysis_cache
+from financialSearch.models import FetchedRange, PriceBar
+from financialSearch.views import analyze_data
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+THRESHOLD = float(os.environ.get('BENCHMARK_THRESHOLD', '1.5'))
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE') == '1'
+
+# La vista pasa por el almacén SQLite; por encima de 1e5 barras la carga inicial domina la ejecución
+SIZES = [int(n) for n in os.environ.get('BENCHMARK_SIZES', '100,1000,10000,100000,1000000').split(',')]
+VIEW_SIZES = [int(n) for n in os.environ.get('BENCHMARK_VIEW_SIZES', '100,1000,10000,100000').split(',')]
+
+# Las fechas sintéticas empiezan en el año 1000 para que 1M de barras diarias quepa en el calendario
+SYNTHETIC_START = date(1000, 1, 1)
+
+# Holgura absoluta sumada al límite para que los casos de pocos milisegundos no fallen por ruido
+ABSOLUTE_SLACK = {'wall_s': 0.005, 'peak_kib': 64}
+
+pytestmark = pytest.mark.benchmark
+
+_results = {}
+
+
+def synthetic_series(n, seed=0):
+    """Caminata aleatoria reproducible de n cierres diarios con sus fechas."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(scale=0.5, size=n))
+    close = np.abs(close) + 1
+    dates = [SYNTHETIC_START + timedelta(days=i) for i in range(n)]
+    return dates, close
+
+
+def measure(function, repeats):
+    """
+    Ejecuta `function` y mide tiempo y memoria.
+
+    Retorna:
+    - Diccionario con 'wall_s' (mejor de `repeats` ejecuciones sin trazado), 'peak_kib' y
+      'blocks' (bloques de memoria retenidos tras una ejecución con tracemalloc).
+    """
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = function()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    del result
+    return {'wall_s': round(min(timings), 5), 'peak_kib': round(peak / 1024, 1), 'blocks': blocks}
+
+
+def check_against_baseline(case, metrics):
+    """Compara las métricas con la línea base y falla si alguna supera el umbral."""
+    _results[case] = metrics
+    allure.attach(json.dumps(metrics, indent=2), name=case, attachment_type=allure.attachment_type.JSON)
+    if UPDATE_BASELINE:
+        return
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    expected = baseline.get(case)
+    if expected is None:
+        pytest.skip(f"Sin línea base para {case}; ejecute con BENCHMARK_UPDATE=1 para registrarla.")
+    for metric in ('wall_s', 'peak_kib'):
+        limit = expected[metric] * THRESHOLD + ABSOLUTE_SLACK[metric]
+        assert metrics[metric] <= limit, (
+            f"{case}: {metric} = {metrics[metric]:.4g} supera {limit:.4g} "
+            f"(línea base {expected[metric]:.4g} x {THRESHOLD} + {ABSOLUTE_SLACK[metric]})")
+
+
+@pytest.fixture(scope='module', autouse=True)
+def write_baseline():
+    """Con BENCHMARK_UPDATE=1, guarda al final del módulo los resultados como nueva línea base."""
+    yield
+    if UPDATE_BASELINE and _results:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline.update(_results)
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + '\n')
+
+
+@pytest.fixture
+def stub_yfinance(monkeypatch):
+    """Fuente local: cualquier descarga a yfinance falla, todo debe salir del almacén sembrado."""
+    class OfflineTicker:
+        def history(self, start, end):
+            raise AssertionError("El benchmark no debe llamar a yfinance.")
+
+    monkeypatch.setattr('yfinance.Ticker', lambda x: OfflineTicker())
+
+
+@pytest.fixture
+def seeded_store(db):
+    """Siembra el almacén con una serie sintética y devuelve una función para cada tamaño."""
+    def seed(n):
+        dates, close = synthetic_series(n, seed=n)
+        PriceBar.objects.bulk_create(
+            (PriceBar(ticker='SYN', date=day, close=float(price)) for day, price in zip(dates, close)),
+            batch_size=5000,
+        )
+        FetchedRange.objects.create(ticker='SYN', start=dates[0], end=dates[-1])
+        return dates[0].isoformat(), dates[-1].isoformat()
+    return seed
+
+
+@allure.feature("Benchmarks")
+class TestAnalyzeDataBenchmark:
+
+    @allure.story("analyze_data")
+    @allure.title("Tiempo y memoria de analyze_data por tamaño de serie")
+    @allure.description("Mide analyze_data con series sintéticas de 100 a 1M de barras y compara con la línea base.")
+    @pytest.mark.parametrize("n", SIZES)
+    def test_analyze_data(self, n):
+        dates, close = synthetic_series(n)
+        date_strings = [day.isoformat() for day in dates]
+        sma_5 = pd.Series(close).rolling(5).mean().tolist()
+        close_prices = close.tolist()
+        repeats = 5 if n <= 100_000 else 2
+        metrics = measure(lambda: analyze_data(sma_5, date_strings, close_prices), repeats)
+        check_against_baseline(f"analyze_data[{n}]", metrics)
+
+
+@allure.feature("Benchmarks")
+class TestGetReturnsBenchmark:
+
+    @allure.story("getReturns")
+    @allure.title("Tiempo y memoria de la vista getReturns completa por tamaño de serie")
+    @allure.description("Mide POST /getReturns (almacén, indicadores, análisis y serialización JSON) con un almacén local sembrado y sin red.")
+    @pytest.mark.parametrize("n", VIEW_SIZES)
+    def test_get_returns(self, n, seeded_store, stub_yfinance):
+        from_date, to_date = seeded_store(n)
+        user = User.objects.create_user(username='bench', password='bench')
+        client = Client()
+        client.force_login(user)
+        data = {'from': from_date, 'to': to_date, 'brand': 'SYN'}
+
+        def request():
+            # Sin caché de análisis, para medir el camino completo en cada repetición
+            analysis_cache.clear()
+            response = client.post('/getReturns', data)
+            assert response.status_code == 200
+            return response
+
+        repeats = 5 if n <= 10_000 else 2
+        metrics = measure(request, repeats)
+        check_against_baseline(f"getReturns[{n}]", metrics)
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+_MISSING = object()
+
+
+class MemoCache:
+    """
+    Caché en memoria con límite de tamaño (LRU) y expiración por tiempo (TTL).
+
+    Es segura entre hilos y lleva contadores de aciertos, fallos y expulsiones para
+    poder medir su efectividad.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self.timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = self.timer() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Devuelve el valor guardado para `key` o lo calcula con `compute()` y lo guarda."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def series_hash(*series):
+    """Huella de contenido de una o varias series (listas de números o de textos)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in series:
+        if len(values) and isinstance(values[0], str):
+            digest.update('\x1f'.join(values).encode())
+        else:
+            import numpy as np
+            digest.update(np.asarray(values, dtype=float).tobytes())
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+analysis_cache = MemoCache(
+    maxsize=getattr(settings, 'ANALYSIS_CACHE_MAXSIZE', 256),
+    ttl=getattr(settings, 'ANALYSIS_CACHE_TTL', 300),
+)
+
+
+# Matrices alineadas de rendimientos de las canastas de getPortfolio
+portfolio_cache = MemoCache(
+    maxsize=getattr(settings, 'PORTFOLIO_CACHE_MAXSIZE', 32),
+    ttl=getattr(settings, 'PORTFOLIO_CACHE_TTL', 300),
+)
@@ -0,0 +1,58 @@
+"""
+Reducción de series para graficar con Largest-Triangle-Three-Buckets (LTTB).
+
+LTTB conserva la forma visual de la serie: divide los puntos interiores en cubetas y, de
+cada una, se queda con el punto que forma el triángulo de mayor área con el punto elegido
+en la cubeta anterior y el promedio de la siguiente. Siempre conserva el primer y el
+último punto.
+"""
+import numpy as np
+
+
+def lttb_indices(values, max_points):
+    """
+    Índices de los puntos que LTTB conserva de una serie.
+
+    Los límites de las cubetas y los promedios de cada cubeta se calculan de una sola vez;
+    la elección en cada cubeta depende del punto elegido en la anterior, por lo que se
+    recorren en orden, pero el área de todos los candidatos de una cubeta se evalúa
+    vectorizada.
+
+    Parámetros:
+    - values: Serie 1-D (por ejemplo, precios de cierre); el eje x es la posición.
+    - max_points: Número máximo de puntos a conservar (al menos 3).
+
+    Retorna:
+    - Array de índices crecientes; todos los índices si la serie ya es suficientemente corta.
+    """
+    y = np.asarray(values, dtype=float)
+    n = y.shape[0]
+    if max_points < 3:
+        raise ValueError("max_points debe ser al menos 3.")
+    if n <= max_points:
+        return np.arange(n)
+
+    buckets = max_points - 2
+    # Límites [edges[i], edges[i + 1]) de cada cubeta sobre los puntos interiores 1..n-2
+    edges = (1 + np.arange(buckets + 1) * (n - 2) / buckets).astype(np.int64)
+    edges[-1] = n - 1
+
+    # Promedio (x, y) de cada cubeta, más el último punto como "cubeta siguiente" de la última
+    sums = np.add.reduceat(y[:n - 1], edges[:-1])
+    counts = np.diff(edges)
+    next_x = np.append((edges[:-1] + edges[1:] - 1) / 2.0, n - 1)[1:]
+    next_y = np.append(sums / counts, y[-1])[1:]
+
+    positions = np.arange(n, dtype=float)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(buckets):
+        start, stop = edges[bucket], edges[bucket + 1]
+        ax, ay = float(previous), y[previous]
+        cx, cy = next_x[bucket], next_y[bucket]
+        # Doble del área del triángulo A-B-C para cada candidato B de la cubeta
+        area = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - positions[start:stop]) * (cy - ay))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
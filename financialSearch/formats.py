@@ -0,0 +1,155 @@
+"""
+Formatos de respuesta de las series de precios.
+
+- 'rows' (por defecto): lista de objetos {'date', 'close', 'sma_5'}, la que consume graph.js.
+- 'columnar': arrays paralelos por campo, con las fechas como segundos desde epoch (UTC).
+- 'msgpack': el mismo payload columnar serializado en binario con MessagePack.
+
+El formato se elige con el parámetro `format` o, en su defecto, con la cabecera Accept.
+
+La exportación en streaming (exportReturns) usa además 'csv' y 'ndjson', generados por bloques
+de filas con encode_rows.
+"""
+import csv
+import io
+import json
+
+import numpy as np
+from django.http import HttpResponse, JsonResponse
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+ROWS = 'rows'
+COLUMNAR = 'columnar'
+MSGPACK = 'msgpack'
+FORMATS = (ROWS, COLUMNAR, MSGPACK)
+
+MSGPACK_CONTENT_TYPES = ('application/x-msgpack', 'application/msgpack', 'application/vnd.msgpack')
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+EXPORT_FORMATS = (CSV, NDJSON)
+EXPORT_CONTENT_TYPES = {CSV: 'text/csv; charset=utf-8', NDJSON: 'application/x-ndjson'}
+
+# Filas por bloque de texto en la exportación en streaming
+STREAM_CHUNK_ROWS = 1000
+
+
+class UnsupportedFormat(ValueError):
+    """El formato pedido no existe o su dependencia no está instalada."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def negotiate(request):
+    """
+    Determina el formato de respuesta pedido por el cliente.
+
+    Retorna:
+    - Uno de FORMATS.
+
+    Lanza:
+    - UnsupportedFormat si el formato es desconocido (400) o si MessagePack no está disponible (406).
+    """
+    fmt = request.POST.get('format') or request.GET.get('format')
+    if not fmt:
+        accept = request.headers.get('Accept', '')
+        fmt = MSGPACK if any(content_type in accept for content_type in MSGPACK_CONTENT_TYPES) else ROWS
+    if fmt not in FORMATS:
+        raise UnsupportedFormat('Formato no soportado.')
+    if fmt == MSGPACK and msgpack is None:
+        raise UnsupportedFormat('El formato msgpack requiere el paquete msgpack.', status=406)
+    return fmt
+
+
+def nullable(values):
+    """Convierte un array de floats (de cualquier dimensión) en listas reemplazando NaN por None."""
+    values = np.asarray(values, dtype=float)
+    if not np.isnan(values).any():
+        return values.tolist()
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def epoch_seconds(index):
+    """Fechas de un DatetimeIndex como enteros de segundos desde epoch (UTC)."""
+    return index.values.astype('datetime64[s]').astype(np.int64).tolist()
+
+
+def rows(index, series):
+    """Lista de objetos por barra: {'date': 'YYYY-MM-DD', <campo>: valor, ...}."""
+    dates = index.strftime('%Y-%m-%d').to_list()
+    columns = {name: nullable(values) for name, values in series.items()}
+    return [
+        {'date': date, **{name: values[i] for name, values in columns.items()}}
+        for i, date in enumerate(dates)
+    ]
+
+
+def columns(index, series):
+    """Arrays paralelos por campo, con la fecha en segundos desde epoch."""
+    return {'date': epoch_seconds(index), **{name: nullable(values) for name, values in series.items()}}
+
+
+def negotiate_export(request):
+    """
+    Determina el formato de exportación: parámetro `format` o cabecera Accept (CSV por defecto).
+
+    Lanza:
+    - UnsupportedFormat si el formato es desconocido.
+    """
+    fmt = request.GET.get('format')
+    if not fmt:
+        fmt = NDJSON if EXPORT_CONTENT_TYPES[NDJSON] in request.headers.get('Accept', '') else CSV
+    if fmt not in EXPORT_FORMATS:
+        raise UnsupportedFormat(f"Formato de exportación no soportado. Disponibles: {', '.join(EXPORT_FORMATS)}.")
+    return fmt
+
+
+def csv_header(names):
+    """Línea de cabecera CSV."""
+    return ','.join(names) + '\n'
+
+
+def encode_rows(fmt, names, columns, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Codifica columnas paralelas en bloques de texto CSV (sin cabecera) o NDJSON.
+
+    Parámetros:
+    - fmt: CSV o NDJSON.
+    - names: Nombre de cada columna.
+    - columns: Listas de igual longitud (None para los valores faltantes, que quedan vacíos
+      en CSV y como null en NDJSON).
+    - chunk_rows: Filas por bloque.
+
+    Retorna:
+    - Generador de cadenas con chunk_rows filas cada una, terminadas en salto de línea.
+    """
+    total = len(columns[0]) if columns else 0
+    for start in range(0, total, chunk_rows):
+        block = zip(*(column[start:start + chunk_rows] for column in columns))
+        if fmt == CSV:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='\n').writerows(block)
+            yield buffer.getvalue()
+        else:
+            yield ''.join(json.dumps(dict(zip(names, row)), separators=(',', ':')) + '\n' for row in block)
+
+
+def render(payload, fmt, status=200):
+    """Serializa el payload en el formato negociado."""
+    if fmt == MSGPACK:
+        return HttpResponse(
+            msgpack.packb(payload, use_bin_type=True), status=status, content_type=MSGPACK_CONTENT_TYPES[0])
+    return JsonResponse(payload, status=status, json_dumps_params={'separators': (',', ':')} if fmt == COLUMNAR else {})
+
+
+def decode(response):
+    """Decodifica una respuesta generada por `render` (útil para clientes Python y pruebas)."""
+    if response['Content-Type'] == MSGPACK_CONTENT_TYPES[0]:
+        return msgpack.unpackb(response.content, raw=False)
+    return json.loads(response.content)
@@ -0,0 +1,250 @@
+"""
+Importación masiva de archivos históricos de precios (CSV o Parquet) al almacén local.
+
+Cada archivo se lee por trozos de tamaño fijo (pandas.read_csv con chunksize, o lotes de
+pyarrow para Parquet), así que la memoria no depende del tamaño del archivo. Los archivos se
+leen y validan en paralelo en un pool de hilos; los trozos limpios pasan por una cola acotada
+a un único escritor, que los inserta con executemany. SQLite solo admite un escritor a la vez,
+y la cola acotada frena a los lectores si la base de datos no da abasto.
+
+Formato: una fila por barra con columnas Date, Open, High, Low, Close y Volume (sin distinguir
+mayúsculas) y, en archivos con varios tickers, Ticker o Symbol. Si no hay columna de ticker, se
+usa el indicado o el nombre del archivo (AAPL.csv -> AAPL). Las fechas se toman como
+'YYYY-MM-DD' (se ignora la hora y la zona horaria, como en las exportaciones de yfinance).
+
+Validación: se descartan las filas sin fecha o ticker válidos, con cierre no positivo, High
+menor que Low o volumen negativo. Los duplicados (ticker, fecha) conservan la primera barra, y
+las barras ya guardadas nunca se sobrescriben.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+
+from . import pricefiles, store
+from .models import IndicatorState, PriceBar
+from .tickers import TICKER_PATTERN
+
+CHUNK_ROWS = 200_000
+BATCH_SIZE = 5_000
+SUFFIXES = ('.csv', '.csv.gz', '.parquet', '.pq')
+
+# Nombres de columna aceptados (en minúsculas) -> columna normalizada
+ALIASES = {
+    'date': 'Date', 'datetime': 'Date', 'timestamp': 'Date',
+    'ticker': 'Ticker', 'symbol': 'Ticker',
+    'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume',
+}
+
+
+def discover(paths):
+    """
+    Expande las rutas dadas: las carpetas se recorren buscando archivos CSV y Parquet.
+
+    Lanza:
+    - ValueError si alguna ruta no existe.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(child for child in path.rglob('*') if child.name.lower().endswith(SUFFIXES)))
+        elif path.is_file():
+            files.append(path)
+        else:
+            raise ValueError(f"No existe el archivo o carpeta {path}.")
+    return files
+
+
+def read_chunks(path, chunksize=CHUNK_ROWS):
+    """
+    Lee un archivo por trozos de a lo más `chunksize` filas.
+
+    Lanza:
+    - ValueError si el archivo es Parquet y pyarrow no está instalado.
+    """
+    if path.name.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Para importar archivos Parquet instale pyarrow.")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=lambda column: column.strip().lower() in ALIASES)
+
+
+def parse_dates(values):
+    """Fechas (datetime64[D]) de una columna de texto o de fechas; NaT si no son válidas."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if getattr(values.dt, 'tz', None) is not None:
+            values = values.dt.tz_localize(None)
+        return values.dt.normalize()
+    return pd.to_datetime(values.astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+
+
+def normalize(chunk, ticker=None):
+    """
+    Valida un trozo y lo lleva al formato del almacén.
+
+    Parámetros:
+    - chunk: DataFrame leído del archivo.
+    - ticker: Ticker de las filas si el archivo no tiene columna de ticker.
+
+    Retorna:
+    - Tupla (DataFrame con columnas Ticker, Date y OHLCV sin duplicados, filas descartadas).
+
+    Lanza:
+    - ValueError si faltan las columnas Date o Close, o la de ticker sin un ticker por defecto.
+    """
+    chunk = chunk.rename(columns=lambda column: ALIASES.get(str(column).strip().lower(), column))
+    missing = {'Date', 'Close'} - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(sorted(missing))}.")
+    if 'Ticker' not in chunk:
+        if not ticker:
+            raise ValueError("El archivo no tiene columna Ticker ni Symbol; indique el ticker.")
+        chunk = chunk.assign(Ticker=ticker)
+
+    clean = pd.DataFrame({
+        'Ticker': chunk['Ticker'].fillna('').astype(str).str.strip().str.upper(),
+        'Date': parse_dates(chunk['Date']),
+        **{column: pd.to_numeric(chunk[column], errors='coerce') if column in chunk else np.nan
+           for column in store.COLUMNS},
+    })
+    valid = (
+        clean['Date'].notna()
+        & clean['Ticker'].str.fullmatch(TICKER_PATTERN.pattern)
+        & (clean['Close'] > 0)
+        & ~(clean['High'] < clean['Low'])
+        & ~(clean['Volume'] < 0)
+    )
+    clean = clean[valid].drop_duplicates(['Ticker', 'Date'])
+    return clean, int((~valid).sum())
+
+
+def insert_statement():
+    """
+    INSERT de PriceBar que ignora las barras ya guardadas, en el dialecto de la base de datos
+    (el mismo que genera bulk_create con ignore_conflicts=True).
+    """
+    ops = connection.ops
+    fields = [PriceBar._meta.get_field(name) for name in ('ticker', 'date', *store.COLUMNS.values())]
+    suffix = ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+    return (
+        f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {ops.quote_name(PriceBar._meta.db_table)} "
+        f"({', '.join(ops.quote_name(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) {suffix}"
+    ).rstrip()
+
+
+def _rows(clean):
+    """Filas de parámetros de un trozo normalizado (NaN -> None)."""
+    columns = [clean[column].astype(object).where(clean[column].notna(), None).tolist() for column in store.COLUMNS]
+    adapt = connection.ops.adapt_datefield_value
+    dates = [adapt(day) for day in clean['Date'].dt.date.tolist()]
+    return list(zip(clean['Ticker'].tolist(), dates, *columns))
+
+
+def import_files(files, ticker=None, chunksize=CHUNK_ROWS, workers=4, progress=None):
+    """
+    Importa los archivos al almacén local.
+
+    Al terminar, marca como consultado el rango importado de cada ticker (para que no se pida
+    al proveedor), regenera sus archivos de precios y descarta sus indicadores incrementales
+    si las barras nuevas son anteriores a su último estado.
+
+    Parámetros:
+    - files: Lista de rutas (ver discover).
+    - ticker: Ticker de los archivos sin columna de ticker (por defecto, el nombre del archivo).
+    - chunksize: Filas por trozo.
+    - workers: Archivos leídos en paralelo.
+    - progress: Función opcional que recibe (ruta, filas leídas del archivo) tras cada trozo.
+
+    Retorna:
+    - Diccionario con 'files', 'rows', 'rejected', 'inserted', 'tickers' ({ticker: (primera,
+      última fecha)}) y 'errors' ({ruta: mensaje} de los archivos que no se pudieron leer).
+    """
+    chunks = queue.Queue(maxsize=2 * max(1, workers))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def produce(path):
+        try:
+            default = ticker or path.name.split('.')[0].upper()
+            for chunk in read_chunks(path, chunksize):
+                if stop.is_set():
+                    return
+                clean, rejected = normalize(chunk, default)
+                put((path, clean, len(chunk), rejected))
+        except Exception as error:
+            put((path, error, 0, 0))
+        finally:
+            put((path, done, 0, 0))
+
+    sql = insert_statement()
+    summary = {'files': len(files), 'rows': 0, 'rejected': 0, 'inserted': 0, 'tickers': {}, 'errors': {}}
+    before = PriceBar.objects.count()
+    read_rows = dict.fromkeys(files, 0)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(files))), thread_name_prefix='import')
+    try:
+        for path in files:
+            executor.submit(produce, path)
+        pending = len(files)
+        while pending:
+            path, clean, rows, rejected = chunks.get()
+            if clean is done:
+                pending -= 1
+                continue
+            if isinstance(clean, Exception):
+                summary['errors'][str(path)] = str(clean)
+                continue
+            # executemany con una sentencia preparada: bulk_create compila el SQL de cada lote
+            # campo a campo y con millones de filas ese costo domina la importación
+            with transaction.atomic(), connection.cursor() as cursor:
+                for offset in range(0, len(clean), BATCH_SIZE):
+                    cursor.executemany(sql, _rows(clean.iloc[offset:offset + BATCH_SIZE]))
+            summary['rows'] += rows
+            summary['rejected'] += rejected
+            for name, dates in clean.groupby('Ticker')['Date']:
+                first, last = dates.min().date(), dates.max().date()
+                known = summary['tickers'].get(name)
+                summary['tickers'][name] = (min(first, known[0]), max(last, known[1])) if known else (first, last)
+            read_rows[path] += rows
+            if progress:
+                progress(path, read_rows[path])
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+    summary['inserted'] = PriceBar.objects.count() - before
+    _finish(summary['tickers'])
+    return summary
+
+
+def _finish(tickers):
+    """Marca la cobertura, regenera archivos de precios e invalida estados incrementales."""
+    yesterday = date.today() - store.ONE_DAY
+    with transaction.atomic():
+        for name, (first, last) in tickers.items():
+            if first <= min(last, yesterday):
+                store._mark_covered(name, first, min(last, yesterday))
+        for state in IndicatorState.objects.filter(ticker__in=list(tickers)):
+            if tickers[state.ticker][0] <= state.last_date:
+                state.delete()
+    if pricefiles.directory() is not None:
+        for name in tickers:
+            store.write_price_file(name)
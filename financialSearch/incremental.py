@@ -0,0 +1,181 @@
+"""
+Indicadores incrementales: avanzan una barra en tiempo constante.
+
+En lugar de recalcular SMA_5, EMA_5, RSI y volatilidad sobre todo el histórico cuando llega
+un cierre nuevo, se guarda por ticker el estado mínimo (sumas acumuladas, última EMA, medias
+de Wilder y varianza de Welford sobre la ventana) y se actualiza con cada barra.
+Los valores coinciden con los de `financialSearch.indicators` para la última barra.
+"""
+from collections import deque
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import IndicatorState, PriceBar
+
+SMA_WINDOW = 5
+EMA_SPAN = 5
+RSI_WINDOW = 14
+VOLATILITY_WINDOW = 20
+
+
+class IncrementalIndicators:
+    """Estado de los indicadores de un ticker que se actualiza en O(1) por cada cierre."""
+
+    def __init__(self):
+        self.count = 0
+        self.closes = deque(maxlen=VOLATILITY_WINDOW)
+        self.sma_sum = 0.0
+        self.ema = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        # Media y suma de cuadrados de desviaciones (Welford) de la ventana de volatilidad
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, close):
+        """Incorpora un nuevo cierre y devuelve los indicadores resultantes."""
+        close = float(close)
+        previous = self.closes[-1] if self.closes else None
+
+        # SMA: suma de los últimos SMA_WINDOW cierres
+        self.sma_sum += close
+        if len(self.closes) >= SMA_WINDOW:
+            self.sma_sum -= self.closes[-SMA_WINDOW]
+
+        # EMA con adjust=False: la primera EMA es el propio cierre
+        alpha = 2.0 / (EMA_SPAN + 1)
+        self.ema = close if self.ema is None else alpha * close + (1 - alpha) * self.ema
+
+        # RSI de Wilder: media simple de las primeras variaciones y luego suavizado 1/RSI_WINDOW
+        if previous is not None:
+            delta = close - previous
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.count <= RSI_WINDOW:
+                self.avg_gain += gain / RSI_WINDOW
+                self.avg_loss += loss / RSI_WINDOW
+            else:
+                self.avg_gain += (gain - self.avg_gain) / RSI_WINDOW
+                self.avg_loss += (loss - self.avg_loss) / RSI_WINDOW
+
+        # Varianza móvil de Welford: se añade el cierre nuevo y, con la ventana llena, se retira el más antiguo
+        if len(self.closes) < VOLATILITY_WINDOW:
+            size = len(self.closes) + 1
+            delta = close - self.mean
+            self.mean += delta / size
+            self.m2 += delta * (close - self.mean)
+        else:
+            oldest = self.closes[0]
+            old_mean = self.mean
+            self.mean += (close - oldest) / VOLATILITY_WINDOW
+            self.m2 += (close - oldest) * (close - self.mean + oldest - old_mean)
+            self.m2 = max(self.m2, 0.0)
+
+        self.closes.append(close)
+        self.count += 1
+        return self.values()
+
+    def values(self):
+        """Indicadores de la última barra; None mientras no haya datos suficientes."""
+        rsi = None
+        if self.count > RSI_WINDOW:
+            rsi = 100.0 if self.avg_loss == 0 else 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        return {
+            'close': self.closes[-1] if self.closes else None,
+            'sma_5': self.sma_sum / SMA_WINDOW if self.count >= SMA_WINDOW else None,
+            'ema_5': self.ema,
+            'rsi_14': rsi,
+            'volatility_20': (self.m2 / VOLATILITY_WINDOW) ** 0.5 if self.count >= VOLATILITY_WINDOW else None,
+        }
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'closes': list(self.closes),
+            'sma_sum': self.sma_sum,
+            'ema': self.ema,
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss,
+            'mean': self.mean,
+            'm2': self.m2,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.count = data['count']
+        state.closes.extend(data['closes'])
+        state.sma_sum = data['sma_sum']
+        state.ema = data['ema']
+        state.avg_gain = data['avg_gain']
+        state.avg_loss = data['avg_loss']
+        state.mean = data['mean']
+        state.m2 = data['m2']
+        return state
+
+
+def refresh_states(tickers):
+    """
+    Avanza el estado guardado de cada ticker con las barras del almacén posteriores a su última fecha.
+
+    Los tickers sin estado se inicializan recorriendo todo su histórico una sola vez; después
+    cada barra nueva cuesta O(1). Solo se guardan en el estado las barras anteriores a hoy: la
+    de hoy es provisional (save_bars la reemplaza en cada descarga), así que se aplica a una
+    copia del estado para los valores retornados.
+
+    Parámetros:
+    - tickers: Lista de símbolos.
+
+    Retorna:
+    - Diccionario {ticker: indicadores de la última barra} de los tickers con datos.
+    """
+    today = date.today()
+    saved = {state.ticker: state for state in IndicatorState.objects.filter(ticker__in=tickers)}
+    # Histórico completo para los tickers nuevos; solo lo posterior al estado más antiguo para el resto
+    condition = Q(ticker__in=[ticker for ticker in tickers if ticker not in saved])
+    if saved:
+        oldest = min(state.last_date for state in saved.values())
+        condition |= Q(ticker__in=list(saved), date__gt=oldest)
+    bars = PriceBar.objects.filter(condition)
+
+    pending = {}
+    for ticker, bar_date, close in bars.order_by('ticker', 'date').values_list('ticker', 'date', 'close'):
+        pending.setdefault(ticker, []).append((bar_date, close))
+
+    to_create, to_update, results = [], [], {}
+    for ticker in tickers:
+        record = saved.get(ticker)
+        state = IncrementalIndicators.from_dict(record.state) if record else IncrementalIndicators()
+        last_date = record.last_date if record else None
+        provisional = []
+        for bar_date, close in pending.get(ticker, []):
+            if last_date is not None and bar_date <= last_date:
+                continue
+            if bar_date >= today:
+                provisional.append(close)
+            else:
+                state.update(close)
+                last_date = bar_date
+
+        current = state
+        if provisional:
+            current = IncrementalIndicators.from_dict(state.to_dict())
+            for close in provisional:
+                current.update(close)
+        if current.count == 0:
+            continue
+        results[ticker] = current.values()
+
+        if last_date is None:
+            continue
+        if record is None:
+            to_create.append(IndicatorState(ticker=ticker, last_date=last_date, state=state.to_dict()))
+        elif last_date != record.last_date:
+            record.last_date, record.state = last_date, state.to_dict()
+            to_update.append(record)
+
+    with transaction.atomic():
+        IndicatorState.objects.bulk_create(to_create)
+        IndicatorState.objects.bulk_update(to_update, ['last_date', 'state'])
+    return results
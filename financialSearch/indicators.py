@@ -0,0 +1,166 @@
+"""
+Indicadores técnicos vectorizados con NumPy.
+
+Todas las funciones reciben un array 1-D (días) o 2-D (tickers x días), operan sobre el último
+eje y devuelven un array de la misma forma. Las posiciones sin ventana completa quedan en NaN.
+Las series de entrada deben ser finitas: un NaN se propaga a las ventanas que lo contienen.
+"""
+import numpy as np
+
+# Exponente máximo de 1/(1 - alpha) por bloque en la EMA, muy por debajo del desborde de float64
+_MAX_BLOCK_GROWTH = 1e200
+
+
+def _as_float_array(values):
+    return np.asarray(values, dtype=float)
+
+
+def _pad_front(valid, window, dtype=float):
+    """Antepone window - 1 NaN a los valores calculados solo para ventanas completas."""
+    pad = np.full(valid.shape[:-1] + (window - 1,), np.nan, dtype=dtype)
+    return np.concatenate([pad, valid], axis=-1)
+
+
+def _window_slices(x, window):
+    """Genera, para cada desfase j de la ventana, la vista de x con el elemento j de cada ventana."""
+    n = x.shape[-1]
+    for j in range(window):
+        yield j, x[..., j:n - window + 1 + j]
+
+
+def _check_window(x, window):
+    if window < 1:
+        raise ValueError("La ventana debe ser un entero positivo.")
+    return x.shape[-1] >= window
+
+
+def sma(values, window=5):
+    """
+    Media móvil simple de `window` días.
+
+    Equivale a `pd.Series(values).rolling(window).mean()`.
+    """
+    x = _as_float_array(values)
+    if not _check_window(x, window):
+        return np.full(x.shape, np.nan)
+    total = np.zeros(x.shape[:-1] + (x.shape[-1] - window + 1,))
+    for _, view in _window_slices(x, window):
+        total += view
+    return _pad_front(total / window, window)
+
+
+def _ewm(x, alpha):
+    """
+    Recurrencia y[t] = (1 - alpha) * y[t-1] + alpha * x[t] con y[0] = x[0], sobre el último eje.
+
+    Se resuelve en forma cerrada por bloques: dentro de cada bloque
+    y[s+j] = d^j * (d * y[s-1] + alpha * cumsum(x[s+i] * d^-i)), con d = 1 - alpha.
+    El tamaño del bloque se limita para que d^-i no desborde.
+    """
+    decay = 1.0 - alpha
+    y = np.empty_like(x)
+    n = x.shape[-1]
+    if n == 0:
+        return y
+    if decay <= 0:
+        y[...] = x
+        return y
+
+    block = n if decay == 1 else max(1, int(np.log(_MAX_BLOCK_GROWTH) / -np.log(decay)))
+    y[..., 0] = x[..., 0]
+    previous = x[..., 0]
+    start = 1
+    while start < n:
+        stop = min(start + block, n)
+        powers = decay ** np.arange(stop - start)
+        scaled = np.cumsum(x[..., start:stop] / powers, axis=-1)
+        y[..., start:stop] = powers * (decay * previous[..., None] + alpha * scaled)
+        previous = y[..., stop - 1]
+        start = stop
+    return y
+
+
+def ema(values, span=5):
+    """
+    Media móvil exponencial con factor alpha = 2 / (span + 1).
+
+    Equivale a `pd.Series(values).ewm(span=span, adjust=False).mean()`.
+    """
+    x = _as_float_array(values)
+    return _ewm(x, 2.0 / (span + 1))
+
+
+def rsi(values, window=14, method='wilder'):
+    """
+    Índice de Fuerza Relativa.
+
+    Parámetros:
+    - values: Precios de cierre.
+    - window: Número de variaciones diarias promediadas.
+    - method: 'wilder' para el suavizado de Wilder (alpha = 1/window, sembrado con la media
+      de las primeras `window` variaciones) o 'simple' para la media móvil de las últimas
+      `window` variaciones.
+
+    Retorna:
+    - Serie RSI en [0, 100]; vale 100 cuando no hay pérdidas en la ventana.
+    """
+    x = _as_float_array(values)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] <= window:
+        return out
+
+    delta = np.diff(x, axis=-1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    if method == 'wilder':
+        def smooth(series):
+            seed = series[..., :window].mean(axis=-1, keepdims=True)
+            return _ewm(np.concatenate([seed, series[..., window:]], axis=-1), 1.0 / window)
+    elif method == 'simple':
+        def smooth(series):
+            return sma(series, window)[..., window - 1:]
+    else:
+        raise ValueError(f"Método de RSI desconocido: {method}")
+
+    avg_gain = smooth(gain)
+    avg_loss = smooth(loss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values_rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out[..., window:] = np.where(avg_loss == 0, 100.0, values_rsi)
+    return out
+
+
+def rolling_std(values, window=20, ddof=0):
+    """
+    Volatilidad: desviación estándar móvil de `window` días.
+
+    Con ddof=0 equivale a `np.std` sobre cada ventana. Se calcula en dos pasadas (media y
+    luego desviaciones) para evitar la cancelación numérica de la fórmula E[x²] - E[x]².
+    """
+    x = _as_float_array(values)
+    if not _check_window(x, window):
+        return np.full(x.shape, np.nan)
+    mean = sma(x, window)[..., window - 1:]
+    squares = np.zeros_like(mean)
+    for _, view in _window_slices(x, window):
+        squares += (view - mean) ** 2
+    return _pad_front(np.sqrt(squares / (window - ddof)), window)
+
+
+def rolling_slope(values, window=10):
+    """
+    Pendiente de la regresión lineal por mínimos cuadrados sobre cada ventana de `window` días.
+
+    Equivale a `np.polyfit(range(window), ventana, 1)[0]`, expresada como un filtro lineal
+    con pesos (j - media) / sum((j - media)²).
+    """
+    x = _as_float_array(values)
+    if not _check_window(x, window) or window < 2:
+        return np.full(x.shape, np.nan)
+    offsets = np.arange(window) - (window - 1) / 2.0
+    weights = offsets / np.sum(offsets ** 2)
+    slope = np.zeros(x.shape[:-1] + (x.shape[-1] - window + 1,))
+    for j, view in _window_slices(x, window):
+        slope += weights[j] * view
+    return _pad_front(slope, window)
@@ -0,0 +1,39 @@
+"""
+Importación diferida de módulos pesados.
+
+views.py necesita pandas, NumPy y yfinance (a través de store, formats, etc.) solo en las vistas
+de datos. Importarlos al cargar el URLconf hace que manage.py, el arranque de cada worker y la
+recolección de pytest paguen toda la pila científica, incluso para login y home. lazy_import
+devuelve un sustituto que importa el módulo real en el primer acceso a un atributo.
+
+El test de presupuesto de importación (TestImportBudget en tests.py) vigila que el URLconf siga
+sin cargarlos.
+"""
+import importlib
+
+
+class LazyModule:
+    """
+    Sustituto de un módulo que lo importa en el primer acceso a un atributo.
+
+    importlib.import_module toma el lock de importación del módulo, así que dos hilos que
+    acceden a la vez ven el módulo ya inicializado.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<módulo diferido {self._name!r}>"
+
+
+def lazy_import(name):
+    """Módulo `name` importado en su primer uso (ver LazyModule)."""
+    return LazyModule(name)
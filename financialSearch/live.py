@@ -0,0 +1,219 @@
+"""
+Actualizaciones en vivo de precios e indicadores (Server-Sent Events sobre ASGI).
+
+Cada ticker con suscriptores tiene un único Feed: una tarea asyncio que consulta al proveedor
+cada LIVE_POLL_INTERVAL segundos y reparte las barras nuevas a todas las suscripciones del
+ticker, de modo que diez pestañas siguiendo AAPL generan una sola descarga por intervalo.
+
+Las suscripciones se agrupan en canales por fecha de inicio (la del rango del gráfico). Cada
+canal mantiene un IncrementalIndicators sembrado con las barras guardadas desde esa fecha, así
+que SMA_5, EMA_5, RSI y volatilidad coinciden con los de getReturns para el mismo rango y cada
+barra nueva cuesta O(1). Las barras anteriores a hoy se envían como definitivas (final=True);
+la de hoy, que aún puede cambiar, como provisional y sin modificar el estado del canal.
+
+El Hub vive en el event loop del proceso ASGI: con varios workers, cada uno tiene el suyo.
+"""
+import asyncio
+import copy
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics, store
+from .incremental import IncrementalIndicators
+
+ONE_DAY = timedelta(days=1)
+QUEUE_SIZE = 256
+
+
+class Channel:
+    """Suscripciones de un ticker con la misma fecha de inicio y su estado incremental."""
+
+    def __init__(self, start):
+        self.start = start
+        self.indicators = IncrementalIndicators()
+        self.last_date = start - ONE_DAY
+        self.provisional = None
+        self.queues = set()
+        self.ready = asyncio.Event()
+        # Error de la siembra (seed), para los suscriptores que la esperaban
+        self.error = None
+
+    def seed(self, columns):
+        """Incorpora las barras guardadas (PriceColumns) hasta ayer."""
+        for day, close in zip(columns.index.date, columns['Close']):
+            self.indicators.update(close)
+            self.last_date = day
+
+    def advance(self, ticker, frame, today):
+        """
+        Incorpora las barras descargadas posteriores a last_date.
+
+        Retorna:
+        - Lista de eventos a enviar: las barras definitivas nuevas y, si cambió, la provisional de hoy.
+        """
+        events = []
+        for day, close in zip(frame.index.date, frame['Close']):
+            if day <= self.last_date:
+                continue
+            if day < today:
+                events.append(event(ticker, day, self.indicators.update(close), final=True))
+                self.last_date = day
+                self.provisional = None
+            else:
+                message = event(ticker, day, copy.deepcopy(self.indicators).update(close), final=False)
+                if message != self.provisional:
+                    events.append(message)
+                    self.provisional = message
+        return events
+
+    def snapshot(self, ticker):
+        """
+        Eventos iniciales de una suscripción: los indicadores de la última barra definitiva y,
+        si ya se recibió, la barra provisional de hoy.
+        """
+        events = [{'type': 'snapshot', 'ticker': ticker, 'date': self.last_date.isoformat(), **self.indicators.values()}]
+        return events + ([self.provisional] if self.provisional else [])
+
+    def publish(self, message):
+        for queue in self.queues:
+            if queue.full():
+                # Un cliente lento pierde los eventos más antiguos en lugar de frenar al resto
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+def event(ticker, day, values, final):
+    return {'type': 'bar', 'ticker': ticker, 'date': day.isoformat(), 'final': final, **values}
+
+
+class Feed:
+    """Consulta periódica al proveedor de un ticker, compartida por todos sus canales."""
+
+    def __init__(self, ticker, interval):
+        self.ticker = ticker
+        self.interval = interval
+        self.channels = {}
+        self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                metrics.registry.increment('financialsearch_live_poll_errors_total', ticker=self.ticker)
+            await asyncio.sleep(self.interval)
+
+    async def poll(self):
+        channels = [channel for channel in self.channels.values() if channel.ready.is_set()]
+        if not channels:
+            return
+        today = date.today()
+        since = min(channel.last_date for channel in channels) + ONE_DAY
+        frame = await sync_to_async(store.fetch_upstream, thread_sensitive=False)(self.ticker, since, today)
+        metrics.registry.increment('financialsearch_live_polls_total')
+        if frame.empty:
+            return
+        await sync_to_async(store.save_bars)(self.ticker, frame, since, today)
+        for channel in channels:
+            for message in channel.advance(self.ticker, frame, today):
+                channel.publish(message)
+
+
+class Hub:
+    """Registro de feeds y canales activos del proceso."""
+
+    def __init__(self):
+        self.feeds = {}
+
+    async def subscribe(self, ticker, start):
+        """
+        Suscribe un cliente a las barras de `ticker` con indicadores calculados desde `start`.
+
+        Retorna:
+        - asyncio.Queue con los eventos (empieza con los de Channel.snapshot).
+
+        Lanza:
+        - El error de la siembra del canal (store.get_columns), también a los suscriptores que
+          esperaban esa siembra. Si la cancelaron (el primer cliente se desconectó), los que
+          esperaban vuelven a intentarlo con un canal nuevo.
+        """
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        while True:
+            feed = self.feeds.get(ticker)
+            if feed is None:
+                feed = self.feeds[ticker] = Feed(ticker, getattr(settings, 'LIVE_POLL_INTERVAL', 60))
+            channel = feed.channels.get(start)
+            if channel is None:
+                channel = feed.channels[start] = Channel(start)
+                channel.queues.add(queue)
+                try:
+                    yesterday = date.today() - ONE_DAY
+                    columns = await sync_to_async(store.get_columns)(ticker, start, yesterday) if start <= yesterday else None
+                    if columns is not None:
+                        channel.seed(columns)
+                except BaseException as error:
+                    channel.error = error
+                    self._detach(feed, channel)
+                    raise
+                finally:
+                    channel.ready.set()
+                break
+
+            channel.queues.add(queue)
+            try:
+                await channel.ready.wait()
+            except BaseException:
+                self.unsubscribe(ticker, start, queue)
+                raise
+            if channel.error is None:
+                break
+            channel.queues.discard(queue)
+            if not isinstance(channel.error, asyncio.CancelledError):
+                raise channel.error
+
+        for message in channel.snapshot(ticker):
+            queue.put_nowait(message)
+        if feed.task is None:
+            feed.task = asyncio.ensure_future(feed.run())
+        return queue
+
+    def _detach(self, feed, channel):
+        """Retira un canal cuya siembra falló, con todas sus suscripciones."""
+        if feed.channels.get(channel.start) is channel:
+            del feed.channels[channel.start]
+        if not feed.channels and self.feeds.get(feed.ticker) is feed:
+            del self.feeds[feed.ticker]
+            if feed.task is not None:
+                feed.task.cancel()
+
+    def unsubscribe(self, ticker, start, queue):
+        """Retira la suscripción; el feed se detiene al irse su último suscriptor."""
+        feed = self.feeds.get(ticker)
+        if feed is None or start not in feed.channels:
+            return
+        channel = feed.channels[start]
+        channel.queues.discard(queue)
+        if not channel.queues:
+            del feed.channels[start]
+        if not feed.channels:
+            del self.feeds[ticker]
+            if feed.task is not None:
+                feed.task.cancel()
+
+    def stats(self):
+        return {
+            'feeds': len(self.feeds),
+            'subscribers': sum(len(channel.queues) for feed in self.feeds.values() for channel in feed.channels.values()),
+        }
+
+
+hub = Hub()
+
+metrics.registry.register_gauge(
+    'financialsearch_live_connections',
+    lambda: {(('kind', kind),): value for kind, value in hub.stats().items()},
+    'Feeds de consulta al proveedor y suscriptores conectados al canal en vivo.')
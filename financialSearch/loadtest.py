@@ -0,0 +1,228 @@
+"""
+Generador de carga de extremo a extremo para getReturns.
+
+Cada hilo inicia sesión con su propio cliente a través de user_login y luego lanza búsquedas
+hasta agotar el plan. Hay dos tipos de cliente:
+
+- El cliente de pruebas de Django (por defecto), que llama a las vistas dentro del propio
+  proceso. El comando load_test configura providers.SyntheticProvider como proveedor de
+  mercado, una fuente sintética y determinista, de modo que la prueba mide la aplicación
+  (sesiones, almacén, análisis, serialización) y no la red. No pasa por un servidor WSGI/ASGI
+  ni por sockets, y todos los hilos comparten el GIL y las cachés del mismo proceso, así que
+  no sirve para comparar servidores ni número de workers.
+- HttpClient, que envía peticiones HTTP reales a un servidor en marcha (load_test --url).
+"""
+import http.cookiejar
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection
+from django.test import Client
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_weighted(spec, cast=str):
+    """
+    Interpreta una lista 'valor:peso,valor:peso' (el peso por defecto es 1).
+
+    Retorna:
+    - Tupla (valores, pesos).
+
+    Lanza:
+    - ValueError si algún valor o peso no es válido.
+    """
+    values, weights = [], []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        value, _, weight = item.strip().partition(':')
+        values.append(cast(value))
+        weights.append(float(weight) if weight else 1.0)
+    if not values or any(weight <= 0 for weight in weights):
+        raise ValueError(f"Lista ponderada inválida: {spec!r}.")
+    return values, weights
+
+
+def build_plan(count, tickers, ticker_weights, ranges, range_weights, today, jitter=30, seed=0):
+    """
+    Genera las búsquedas de la prueba.
+
+    Parámetros:
+    - count: Número de búsquedas.
+    - tickers, ticker_weights: Mezcla de tickers y su peso relativo.
+    - ranges, range_weights: Longitudes de rango en días y su peso relativo.
+    - today: Fecha de referencia; cada búsqueda termina entre today - jitter y today - 1.
+    - seed: Semilla para que el plan sea reproducible.
+
+    Retorna:
+    - Lista de diccionarios {'brand', 'from', 'to'} con fechas 'YYYY-MM-DD'.
+    """
+    rng = random.Random(seed)
+    plan = []
+    for _ in range(count):
+        brand = rng.choices(tickers, ticker_weights)[0]
+        days = rng.choices(ranges, range_weights)[0]
+        end = today - timedelta(days=rng.randint(1, max(1, jitter)))
+        plan.append({'brand': brand, 'from': (end - timedelta(days=days)).isoformat(), 'to': end.isoformat()})
+    return plan
+
+
+class HttpResponse:
+    """Código de estado y cabeceras de una respuesta de HttpClient."""
+
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+    def get(self, header, default=None):
+        return self.headers.get(header, default) if self.headers is not None else default
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Como el cliente de Django: las redirecciones (el 302 del login) se devuelven sin seguirlas
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """
+    Cliente HTTP real (urllib) con sus propias cookies, con la interfaz post(path, data) del
+    cliente de pruebas de Django.
+
+    Obtiene la cookie CSRF con un GET a /login y la envía en la cabecera X-CSRFToken de cada
+    POST. Los errores de conexión se devuelven como respuestas con código 0.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return None
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                return HttpResponse(response.status, response.headers)
+        except urllib.error.HTTPError as error:
+            error.read()
+            return HttpResponse(error.code, error.headers)
+        except (urllib.error.URLError, OSError):
+            return HttpResponse(0, None)
+
+    def post(self, path, data):
+        if self._csrf_token() is None:
+            self._open(urllib.request.Request(self.base_url + '/login'))
+        url = self.base_url + path
+        request = urllib.request.Request(
+            url, data=urllib.parse.urlencode(data).encode(), method='POST',
+            headers={'X-CSRFToken': self._csrf_token() or '', 'Referer': url})
+        return self._open(request)
+
+
+def run(plan, concurrency, username, password, path='/getReturns', base_url=None):
+    """
+    Ejecuta el plan con `concurrency` hilos, cada uno con su propia sesión.
+
+    Con base_url, cada hilo usa un HttpClient contra ese servidor; si no, el cliente de pruebas
+    de Django dentro del proceso.
+
+    Retorna:
+    - Tupla (resultados, segundos): lista de (latencia en s, código de estado, cabecera
+      Server-Timing) por búsqueda y duración total de la prueba.
+
+    Lanza:
+    - RuntimeError si algún hilo no puede iniciar sesión.
+    """
+    pending = queue.Queue()
+    for search in plan:
+        pending.put(search)
+    results, errors = [], []
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker():
+        # Los errores de las vistas se cuentan como respuestas 500 en lugar de cortar el hilo
+        client = HttpClient(base_url) if base_url else Client(raise_request_exception=False)
+        try:
+            try:
+                response = client.post('/login', {'username': username, 'password': password})
+                if response.status_code == 0:
+                    errors.append(f"No se pudo conectar con {base_url}.")
+                elif response.status_code != 302:
+                    errors.append("No se pudo iniciar sesión con el usuario de la prueba.")
+            except Exception as error:
+                errors.append(f"No se pudo iniciar sesión: {error}")
+            ready.wait()
+            if errors:
+                return
+            local = []
+            while True:
+                try:
+                    search = pending.get_nowait()
+                except queue.Empty:
+                    break
+                started = time.perf_counter()
+                response = client.post(path, search)
+                local.append((time.perf_counter() - started, response.status_code, response.get('Server-Timing', '')))
+            with lock:
+                results.extend(local)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, name=f'load-{i}') for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(errors[0])
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    """
+    Resume los resultados de `run`.
+
+    Retorna:
+    - Diccionario con 'requests', 'elapsed_s', 'throughput' (búsquedas/s), 'statuses'
+      ({código: cantidad}), 'latency_ms' ({'p50', 'p95', 'p99', 'max', 'mean'}) y 'stages_ms'
+      (duración media de cada etapa de Server-Timing).
+    """
+    latencies = np.array([latency for latency, _, _ in results]) * 1000
+    stages = defaultdict(list)
+    for _, _, server_timing in results:
+        for entry in filter(None, server_timing.split(', ')):
+            stage, _, duration = entry.partition(';dur=')
+            stages[stage].append(float(duration))
+
+    latency_ms = {}
+    if len(latencies):
+        latency_ms = {f'p{p}': float(np.percentile(latencies, p)) for p in PERCENTILES}
+        latency_ms.update(max=float(latencies.max()), mean=float(latencies.mean()))
+    return {
+        'requests': len(results),
+        'elapsed_s': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'statuses': dict(sorted(Counter(status for _, status, _ in results).items())),
+        'latency_ms': latency_ms,
+        'stages_ms': {stage: float(np.mean(values)) for stage, values in stages.items()},
+    }
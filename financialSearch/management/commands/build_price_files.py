@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financialSearch import pricefiles, store
+from financialSearch.models import PriceBar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera los archivos columnares de precios (PRICE_FILES_DIR) a partir de las barras ya "
+        "guardadas en el almacén local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tickers', nargs='*',
+            help="Tickers a generar (por defecto, todos los que tienen barras guardadas).")
+
+    def handle(self, *args, **options):
+        if pricefiles.directory() is None:
+            raise CommandError("Los archivos de precios están desactivados (PRICE_FILES_DIR = None).")
+
+        tickers = options['tickers'] or list(
+            PriceBar.objects.order_by('ticker').values_list('ticker', flat=True).distinct())
+        started = time.perf_counter()
+        for ticker in tickers:
+            store.write_price_file(ticker)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(tickers)} archivos de precios generados en {elapsed:.2f} s ({pricefiles.directory()})."))
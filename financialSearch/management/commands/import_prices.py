@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financialSearch import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa al almacén local archivos históricos de precios (CSV, CSV comprimido o Parquet) "
+        "leyéndolos por trozos, validando y descartando duplicados. Los tickers importados ya no "
+        "se piden al proveedor de datos en el rango importado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Archivos o carpetas a importar.")
+        parser.add_argument(
+            '--ticker', default=None,
+            help="Ticker de los archivos sin columna Ticker/Symbol (por defecto, el nombre del archivo).")
+        parser.add_argument(
+            '--chunksize', type=int, default=importer.CHUNK_ROWS,
+            help=f"Filas leídas por trozo (por defecto {importer.CHUNK_ROWS}).")
+        parser.add_argument('--workers', type=int, default=4, help="Archivos leídos en paralelo (por defecto 4).")
+
+    def handle(self, *args, **options):
+        if options['chunksize'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunksize y --workers deben ser al menos 1.")
+        try:
+            files = importer.discover(options['paths'])
+        except ValueError as error:
+            raise CommandError(error)
+        if not files:
+            raise CommandError("No se encontraron archivos CSV o Parquet.")
+
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        summary = importer.import_files(
+            files, options['ticker'], options['chunksize'], options['workers'], progress=self.progress)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['files'] - len(summary['errors'])} de {summary['files']} archivos importados en {elapsed:.2f} s: "
+            f"{summary['rows']} filas leídas ({summary['rows'] / elapsed if elapsed else 0:.0f}/s), "
+            f"{summary['inserted']} barras nuevas, {summary['rejected']} filas descartadas, "
+            f"{len(summary['tickers'])} tickers."))
+        for path, message in summary['errors'].items():
+            self.stderr.write(f"{path}: {message}")
+        if summary['errors']:
+            raise CommandError(f"{len(summary['errors'])} archivos no se pudieron importar.")
+
+    def progress(self, path, rows):
+        if self.verbosity > 1:
+            self.stdout.write(f"{path}: {rows} filas")
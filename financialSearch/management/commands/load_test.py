@@ -0,0 +1,153 @@
+import logging
+import os
+import secrets
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from financialSearch import loadtest
+from financialSearch.cache import analysis_cache
+from financialSearch.tickers import TICKERS
+
+LOAD_USER = 'loadtest'
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: inicia sesión por /login y lanza búsquedas concurrentes a getReturns. "
+        "Informa rendimiento y latencias p50/p95/p99. Sin --url, usa el cliente de pruebas de Django "
+        "dentro de este proceso contra una fuente de mercado sintética, con la configuración de "
+        "mainApp/settings.py (sesiones, base de datos, cachés) sobre una base de datos de prueba que "
+        "se crea y se borra en cada ejecución (DATABASES['default']['TEST']['NAME']); no pasa por un servidor ni por la red, así que no mide el servidor WSGI/ASGI ni "
+        "el número de workers. Con --url envía peticiones HTTP reales a un servidor en marcha, con "
+        "su propia base de datos y su proveedor de mercado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Búsquedas a lanzar (por defecto 500).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Clientes simultáneos (por defecto 8).")
+        parser.add_argument(
+            '--tickers', default='',
+            help="Mezcla de tickers 'AAPL:5,MSFT:2,...' (peso opcional); por defecto los del desplegable por igual.")
+        parser.add_argument(
+            '--ranges', default='30:3,90:3,365:2,1825:1',
+            help="Longitudes de rango en días con su peso, 'días:peso,...' (por defecto 30:3,90:3,365:2,1825:1).")
+        parser.add_argument(
+            '--jitter', type=int, default=30,
+            help="Cada búsqueda termina entre hoy - jitter y ayer (por defecto 30 días).")
+        parser.add_argument(
+            '--latency', type=float, default=50,
+            help="Latencia simulada del proveedor de datos en milisegundos (por defecto 50).")
+        parser.add_argument(
+            '--endpoint', choices=('getReturns', 'getReturnsAsync'), default='getReturns',
+            help="Vista a probar (por defecto getReturns).")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla del plan de búsquedas.")
+        parser.add_argument(
+            '--no-test-db', action='store_true',
+            help="Usa la base de datos configurada tal cual en lugar de crear una de prueba.")
+        parser.add_argument(
+            '--url',
+            help="URL base de un servidor en marcha (p. ej. http://127.0.0.1:8000); las búsquedas se "
+                 "envían por HTTP con --username y --password.")
+        parser.add_argument('--username', default=LOAD_USER, help="Usuario del servidor para --url.")
+        parser.add_argument(
+            '--password', default=os.environ.get('LOAD_TEST_PASSWORD'),
+            help="Contraseña del usuario para --url (por defecto la variable LOAD_TEST_PASSWORD).")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests y --concurrency deben ser al menos 1.")
+        try:
+            if options['tickers']:
+                tickers, ticker_weights = loadtest.parse_weighted(options['tickers'])
+            else:
+                tickers, ticker_weights = [symbol for symbol, _ in TICKERS], [1.0] * len(TICKERS)
+            ranges, range_weights = loadtest.parse_weighted(options['ranges'], int)
+        except ValueError as error:
+            raise CommandError(error)
+
+        plan = loadtest.build_plan(
+            options['requests'], tickers, ticker_weights, ranges, range_weights,
+            date.today(), options['jitter'], options['seed'])
+
+        path = f"/{options['endpoint']}"
+        if options['url']:
+            if not options['password']:
+                raise CommandError("--url requiere --password o la variable LOAD_TEST_PASSWORD.")
+            summary = self.run_plan(plan, options['concurrency'], options['username'], options['password'],
+                                    path, options['url'].rstrip('/'))
+            self.report(summary, options)
+            return
+
+        with tempfile.TemporaryDirectory(prefix='load_test_') as workdir:
+            old_config = None
+            if not options['no_test_db']:
+                old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'},
+                                             serialized_aliases=set())
+            try:
+                # El cliente de pruebas de Django se presenta como 'testserver'
+                with override_settings(PRICE_FILES_DIR=Path(workdir) / 'price_files',
+                                       ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                                       MARKET_DATA_PROVIDER={
+                                           'BACKEND': 'financialSearch.providers.SyntheticProvider',
+                                           'OPTIONS': {'latency': options['latency'] / 1000},
+                                       },
+                                       # La fuente sintética no tiene cuota: sin límite de ritmo
+                                       # se mide el servidor y no la cubeta de tokens
+                                       MARKET_DATA_RATE_LIMIT=None):
+                    summary = self.run_load(plan, options['concurrency'], path)
+            finally:
+                if old_config is not None:
+                    teardown_databases(old_config, verbosity=0)
+
+        self.report(summary, options)
+
+    def run_load(self, plan, concurrency, path):
+        password = secrets.token_urlsafe(16)
+        user, _ = User.objects.get_or_create(username=LOAD_USER)
+        user.set_password(password)
+        user.save()
+        analysis_cache.clear()
+        # Los errores 500 se cuentan en el resumen; sus trazas solo ensuciarían la salida
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            return self.run_plan(plan, concurrency, LOAD_USER, password, path)
+        finally:
+            request_logger.setLevel(previous_level)
+
+    def run_plan(self, plan, concurrency, username, password, path, base_url=None):
+        try:
+            results, elapsed = loadtest.run(plan, concurrency, username, password, path, base_url)
+        except RuntimeError as error:
+            raise CommandError(error)
+        return loadtest.summarize(results, elapsed)
+
+    def report(self, summary, options):
+        if options['url']:
+            self.stdout.write(f"Servidor: {options['url']}")
+        else:
+            database = settings.DATABASES['default']
+            self.stdout.write(
+                f"Configuración: sesiones {settings.SESSION_ENGINE}, base de datos {database['ENGINE']} "
+                f"{database.get('OPTIONS') or ''}".rstrip())
+        self.stdout.write(
+            f"{summary['requests']} búsquedas a /{options['endpoint']} con {options['concurrency']} clientes "
+            f"en {summary['elapsed_s']:.2f} s: {summary['throughput']:.1f} búsquedas/s")
+        self.stdout.write("Estados: " + ', '.join(f"{status}={count}" for status, count in summary['statuses'].items()))
+        latency = summary['latency_ms']
+        self.stdout.write(
+            f"Latencia (ms): p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  "
+            f"máx {latency['max']:.1f}  media {latency['mean']:.1f}")
+        if summary['stages_ms']:
+            self.stdout.write("Etapas (ms, media): " + ', '.join(
+                f"{stage} {duration:.1f}" for stage, duration in summary['stages_ms'].items()))
+        failed = sum(count for status, count in summary['statuses'].items() if status != 200)
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} búsquedas no devolvieron 200."))
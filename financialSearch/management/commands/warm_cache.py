@@ -0,0 +1,54 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from financialSearch.tickers import TICKERS
+from financialSearch.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Precarga en el almacén local el histórico reciente de un universo de tickers y calcula su "
+        "análisis e indicadores incrementales. Con --interval se repite periódicamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tickers', nargs='*',
+            help="Tickers a precargar (por defecto, los del desplegable de index.html).")
+        parser.add_argument('--days', type=int, default=365, help="Días de histórico hasta hoy (por defecto 365).")
+        parser.add_argument('--workers', type=int, default=None, help="Descargas simultáneas máximas.")
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Segundos entre ejecuciones; 0 (por defecto) ejecuta una sola vez.")
+
+    def handle(self, *args, **options):
+        tickers = options['tickers'] or [symbol for symbol, _ in TICKERS]
+        while True:
+            self.run_once(tickers, options['days'], options['workers'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def run_once(self, tickers, days, workers):
+        end = date.today()
+        start = end - timedelta(days=days)
+        started = time.perf_counter()
+        report = warm_up(tickers, start, end, workers)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{'Ticker':<8} {'Huecos':>6} {'Barras':>7} {'Descarga (ms)':>14} {'Análisis (ms)':>14}")
+        for row in report:
+            line = (
+                f"{row['ticker']:<8} {row['gaps']:>6} {row['bars']:>7} "
+                f"{row['fetch_s'] * 1000:>14.1f} {row['analysis_s'] * 1000:>14.1f}"
+            )
+            if row['error']:
+                self.stdout.write(self.style.ERROR(f"{line}  error: {row['error']}"))
+            else:
+                self.stdout.write(line)
+
+        failed = sum(1 for row in report if row['error'])
+        summary = f"{len(report) - failed}/{len(report)} tickers precargados en {elapsed:.2f} s ({start} a {end})."
+        self.stdout.write(self.style.SUCCESS(summary) if not failed else self.style.WARNING(summary))
@@ -0,0 +1,162 @@
+"""
+Métricas de tiempo por etapa de las peticiones y exposición en formato Prometheus.
+
+Cada etapa del camino caliente (descarga, indicadores, análisis, informe, serialización...)
+se mide con `timed(nombre)`. La duración se acumula en un registro global del proceso y, si
+hay una petición en curso (`request_timings()`), también en las duraciones de esa petición,
+que se devuelven al cliente en la cabecera Server-Timing.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Muestras recientes que se conservan por etapa para estimar los cuantiles
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = contextvars.ContextVar('financialsearch_request_timings', default=None)
+
+
+class Registry:
+    """Registro en memoria de duraciones por etapa y de contadores con etiquetas."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._count = defaultdict(int)
+        self._sum = defaultdict(float)
+        self._counters = defaultdict(float)
+        self._gauges = {}
+
+    def observe(self, stage, seconds, timings=None):
+        """
+        Registra una duración de `stage`.
+
+        `timings` (las duraciones de una petición) se actualiza bajo el mismo lock: las vistas
+        comparten ese diccionario con los hilos de sus pools de descarga y de cálculo.
+        """
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._count[stage] += 1
+            self._sum[stage] += seconds
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def increment(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def register_gauge(self, name, callback, help_text=''):
+        """Registra una métrica cuyo valor se obtiene al exportar: callback() -> {etiquetas: valor}."""
+        with self._lock:
+            self._gauges[name] = (callback, help_text)
+
+    def quantiles(self, stage):
+        with self._lock:
+            samples = sorted(self._samples[stage])
+        if not samples:
+            return {}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._count.clear()
+            self._sum.clear()
+            self._counters.clear()
+
+    def export(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+        lines = [
+            '# HELP financialsearch_stage_duration_seconds Duración de cada etapa de las peticiones.',
+            '# TYPE financialsearch_stage_duration_seconds summary',
+        ]
+        with self._lock:
+            totals = {stage: (self._count[stage], self._sum[stage]) for stage in sorted(self._count)}
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        for stage, (count, total) in totals.items():
+            for q, value in self.quantiles(stage).items():
+                lines.append(f'financialsearch_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'financialsearch_stage_duration_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'financialsearch_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f'# TYPE {name} counter')
+                declared.add(name)
+            lines.append(f'{name}{_labels(labels)} {value:g}')
+
+        for name, (callback, help_text) in gauges:
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in callback().items():
+                lines.append(f'{name}{_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = Registry()
+
+
+@contextmanager
+def timed(stage):
+    """Mide la duración del bloque como la etapa `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe(stage, elapsed, _current.get())
+
+
+@contextmanager
+def request_timings():
+    """Activa la recolección de duraciones de la petición en curso y la entrega como diccionario."""
+    timings = {}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def server_timing(timings):
+    """Valor de la cabecera Server-Timing (duraciones en milisegundos)."""
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items())
+
+
+def _cache_stats():
+    from .cache import analysis_cache, portfolio_cache
+    hits = registry.counter_value('financialsearch_store_lookups_total', result='hit')
+    misses = registry.counter_value('financialsearch_store_lookups_total', result='miss')
+    return {
+        (('cache', 'analysis'),): analysis_cache.stats()['hit_ratio'],
+        (('cache', 'portfolio'),): portfolio_cache.stats()['hit_ratio'],
+        (('cache', 'store'),): hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def _cache_size():
+    from .cache import analysis_cache, portfolio_cache
+    return {(('cache', 'analysis'),): len(analysis_cache), (('cache', 'portfolio'),): len(portfolio_cache)}
+
+
+registry.register_gauge(
+    'financialsearch_cache_hit_ratio', _cache_stats, 'Proporción de aciertos del almacén local y de las cachés de análisis y de canastas.')
+registry.register_gauge(
+    'financialsearch_cache_entries', _cache_size, 'Entradas guardadas en las cachés de análisis y de canastas.')
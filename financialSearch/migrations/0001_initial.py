@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchedRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(db_index=True, max_length=16)),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+            ],
+            options={
+                'ordering': ['ticker', 'start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=16)),
+                ('date', models.DateField()),
+                ('open', models.FloatField(null=True)),
+                ('high', models.FloatField(null=True)),
+                ('low', models.FloatField(null=True)),
+                ('close', models.FloatField()),
+                ('volume', models.FloatField(null=True)),
+            ],
+            options={
+                'ordering': ['ticker', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('ticker', 'date'), name='unique_price_bar')],
+            },
+        ),
+    ]
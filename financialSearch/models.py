@@ -1,3 +1,49 @@
 from django.db import models
 
-# Create your models here.
+
+class PriceBar(models.Model):
+    """Barra diaria OHLCV de un ticker ya descargada desde el proveedor de datos."""
+    ticker = models.CharField(max_length=16)
+    date = models.DateField()
+    open = models.FloatField(null=True)
+    high = models.FloatField(null=True)
+    low = models.FloatField(null=True)
+    close = models.FloatField()
+    volume = models.FloatField(null=True)
+
+    class Meta:
+        ordering = ['ticker', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date'], name='unique_price_bar'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} {self.date}: {self.close}"
+
+
+class FetchedRange(models.Model):
+    """
+    Rango de fechas (ambos extremos incluidos) que ya fue consultado al proveedor para un ticker.
+
+    Permite distinguir los días sin barras (fines de semana, festivos) de los días que todavía
+    no se han descargado, de modo que solo se pidan los huecos faltantes.
+    """
+    ticker = models.CharField(max_length=16, db_index=True)
+    start = models.DateField()
+    end = models.DateField()
+
+    class Meta:
+        ordering = ['ticker', 'start']
+
+    def __str__(self):
+        return f"{self.ticker} [{self.start} - {self.end}]"
+
+
+class IndicatorState(models.Model):
+    """Estado incremental de los indicadores de un ticker (ver financialSearch.incremental)."""
+    ticker = models.CharField(max_length=16, unique=True)
+    last_date = models.DateField()
+    state = models.JSONField()
+
+    def __str__(self):
+        return f"{self.ticker} @ {self.last_date}"
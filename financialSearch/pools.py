@@ -0,0 +1,57 @@
+"""
+Pool de procesos compartido para el cálculo vectorizado (backtest y screener).
+
+Crear un ProcessPoolExecutor en cada petición cuesta mucho más que los milisegundos de cálculo
+que reparte, y hacer fork dentro de un servidor con hilos puede heredar locks tomados. El pool
+se crea una sola vez por proceso, con un tamaño fijo, y sus workers se arrancan con
+forkserver (o spawn) en lugar de fork. Quien lo use solo debe repartir el trabajo cuando
+compense; por debajo de su umbral, conviene calcular en el proceso actual.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_pool = (None, None)
+_pool_lock = threading.Lock()
+
+
+def pool_size(max_workers=None):
+    """Procesos del pool: max_workers, o todos los núcleos si es None."""
+    return max_workers or os.cpu_count() or 1
+
+
+def get_pool(max_workers=None):
+    """Pool de procesos del proceso actual (se reutiliza mientras no cambie su tamaño)."""
+    global _pool
+    size = pool_size(max_workers)
+    with _pool_lock:
+        if _pool[0] != size:
+            if _pool[1] is not None:
+                _pool[1].shutdown(wait=False, cancel_futures=True)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = (size, ProcessPoolExecutor(max_workers=size, mp_context=context))
+        return _pool[1]
+
+
+def map_in_pool(function, items, max_workers=None, chunksize=1):
+    """
+    Aplica `function` a `items` en el pool compartido.
+
+    Si un worker muere (BrokenProcessPool), el pool se descarta para que la siguiente llamada
+    cree uno nuevo y esta llamada se resuelve en el proceso actual.
+
+    Retorna:
+    - Lista de resultados en el orden de `items`.
+    """
+    global _pool
+    executor = get_pool(max_workers)
+    try:
+        return list(executor.map(function, items, chunksize=chunksize))
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool[1] is executor:
+                _pool = (None, None)
+        return list(map(function, items))
@@ -0,0 +1,147 @@
+"""
+Análisis de canastas de acciones sobre una matriz alineada de rendimientos (fechas x tickers).
+
+Todas las funciones trabajan con arrays de NumPy: `returns` es una matriz T x N con los
+rendimientos diarios simples de N tickers en T fechas comunes, sin NaN.
+"""
+import numpy as np
+import pandas as pd
+
+# Sesiones bursátiles por año, para anualizar la volatilidad diaria
+TRADING_DAYS = 252
+
+
+def align_returns(closes):
+    """
+    Alinea los cierres de varios tickers y calcula sus rendimientos diarios.
+
+    Solo se conservan las fechas en las que todos los tickers con datos tienen cierre, de modo
+    que cada fila compare el mismo día en todos ellos.
+
+    Parámetros:
+    - closes: DataFrame (fechas x tickers) con NaN en los días sin barra.
+
+    Retorna:
+    - Tupla (dates, tickers, returns, missing): DatetimeIndex de las fechas de los rendimientos,
+      lista de tickers con datos, matriz T x N de rendimientos y lista de tickers sin datos.
+    """
+    missing = [ticker for ticker in closes.columns if closes[ticker].isna().all()]
+    closes = closes.drop(columns=missing).dropna()
+    values = closes.to_numpy(dtype=float)
+    returns = values[1:] / values[:-1] - 1 if len(values) > 1 else np.empty((0, values.shape[1]))
+    return closes.index[1:], list(closes.columns), returns, missing
+
+
+def covariance(returns, ddof=1):
+    """Matriz de covarianza N x N de las columnas de `returns`."""
+    centered = returns - returns.mean(axis=0)
+    return centered.T @ centered / (returns.shape[0] - ddof)
+
+
+def correlation(returns, cov=None):
+    """
+    Matriz de correlación N x N de las columnas de `returns` (o de su covarianza `cov` ya calculada).
+
+    Los tickers de varianza nula (precio constante) tienen correlación NaN con todos.
+    """
+    if cov is None:
+        cov = covariance(returns)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+    return np.clip(corr, -1.0, 1.0)
+
+
+def rolling_beta(returns, benchmark, window=20):
+    """
+    Beta móvil de cada columna de `returns` frente a la serie `benchmark`.
+
+    beta = cov(r, m) / var(m) en cada ventana de `window` días, calculada para todos los
+    tickers y ventanas a la vez con sumas acumuladas.
+
+    Retorna:
+    - Matriz (T - window + 1) x N; la fila i corresponde a la ventana que termina en i + window - 1.
+    """
+    if window < 2:
+        raise ValueError("La ventana debe ser de al menos 2 días.")
+    if returns.shape[0] < window:
+        return np.empty((0, returns.shape[1]))
+
+    def window_sums(values):
+        cumulative = np.cumsum(values, axis=0)
+        cumulative = np.concatenate([np.zeros((1,) + cumulative.shape[1:]), cumulative])
+        return cumulative[window:] - cumulative[:-window]
+
+    sum_r = window_sums(returns)
+    sum_m = window_sums(benchmark)
+    sum_rm = window_sums(returns * benchmark[:, None])
+    sum_mm = window_sums(benchmark * benchmark)
+    cov = sum_rm - sum_r * sum_m[:, None] / window
+    var = sum_mm - sum_m * sum_m / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(var[:, None] > 0, cov / var[:, None], np.nan)
+
+
+def portfolio_volatility(cov, weights, periods=TRADING_DAYS):
+    """
+    Volatilidad de una cartera con pesos `weights` a partir de la matriz de covarianza diaria.
+
+    Retorna:
+    - Diccionario con la desviación estándar diaria ('daily') y anualizada ('annualized').
+    """
+    daily = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    return {'daily': daily, 'annualized': daily * float(np.sqrt(periods))}
+
+
+def normalize_weights(weights, tickers, available):
+    """
+    Pesos de la cartera sobre los tickers con datos, normalizados para sumar 1.
+
+    Parámetros:
+    - weights: Lista de pesos en el orden de `tickers`, o None para pesos iguales.
+    - tickers: Tickers pedidos.
+    - available: Tickers con datos (subconjunto de `tickers`).
+
+    Lanza:
+    - ValueError si el número de pesos no coincide o los pesos disponibles no suman más de 0.
+    """
+    if weights is None:
+        return np.full(len(available), 1.0 / len(available))
+    if len(weights) != len(tickers):
+        raise ValueError("Debe indicar un peso por ticker.")
+    by_ticker = dict(zip(tickers, weights))
+    selected = np.array([by_ticker[ticker] for ticker in available], dtype=float)
+    if selected.sum() <= 0:
+        raise ValueError("Los pesos deben sumar un valor positivo.")
+    return selected / selected.sum()
+
+
+def analyze(dates, returns, weights, window=20, benchmark=None, benchmark_returns=None):
+    """
+    Correlación, covarianza, betas móviles y volatilidad de una canasta.
+
+    Parámetros:
+    - dates, returns: Fechas y matriz de rendimientos de align_returns.
+    - weights: Pesos normalizados de la cartera (uno por ticker).
+    - window: Ventana de las betas móviles.
+    - benchmark, benchmark_returns: Nombre y rendimientos (alineados con `returns`) de la
+      referencia de las betas; por defecto la propia cartera ponderada.
+
+    Retorna:
+    - Diccionario con 'correlation', 'covariance', 'rolling_beta' y 'volatility'.
+    """
+    cov = covariance(returns)
+    if benchmark_returns is None:
+        benchmark_returns = returns @ weights
+    return {
+        'correlation': correlation(returns, cov),
+        'covariance': cov,
+        'rolling_beta': {
+            'window': window,
+            'benchmark': benchmark or 'portfolio',
+            'dates': pd.DatetimeIndex(dates[window - 1:]).strftime('%Y-%m-%d').to_list(),
+            'values': rolling_beta(returns, benchmark_returns, window),
+        },
+        'volatility': portfolio_volatility(cov, weights),
+    }
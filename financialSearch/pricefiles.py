@@ -0,0 +1,191 @@
+"""
+Archivos columnares de precios por ticker, leídos con numpy.memmap.
+
+Cada ticker tiene un archivo <PRICE_FILES_DIR>/<TICKER>.prices con columnas de ancho fijo:
+
+    cabecera (16 bytes): b'FSPRICE1' + número de barras n (uint64, little endian)
+    day:    int32[n]   días desde 1970-01-01, en orden creciente (relleno hasta múltiplo de 8)
+    open, high, low, close, volume: float64[n] cada una (NaN si falta el dato)
+
+Los archivos se abren en modo lectura con memmap: un rango de fechas es un slice de cada
+columna (sin copia) y varios procesos que leen el mismo ticker comparten las páginas en la
+caché del sistema operativo. Se reescriben completos en un archivo temporal que luego
+reemplaza al anterior con os.replace, así que un lector nunca ve un archivo a medio escribir.
+
+Son una copia derivada de la tabla PriceBar: store.save_bars los regenera y el comando
+build_price_files los crea para el histórico ya guardado.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .cache import MemoCache
+from .tickers import is_valid_ticker
+
+MAGIC = b'FSPRICE1'
+HEADER_SIZE = 16
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+# Nombres de columna de yfinance / load_bars -> campos del archivo
+COLUMNS = {field.capitalize(): field for field in FIELDS}
+
+# Archivos ya abiertos (un mmap por archivo), sin expiración y con límite LRU de descriptores
+_open_files = MemoCache(maxsize=getattr(settings, 'PRICE_FILES_OPEN_MAX', 512), ttl=None)
+
+
+class PriceColumns:
+    """
+    Columnas de precios de un ticker (arrays o vistas de memmap) con la interfaz mínima de un
+    DataFrame de load_bars que usa views.build_returns: stock_data['Close'], .index y .empty.
+    """
+
+    def __init__(self, day, open, high, low, close, volume):
+        self.day = day
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_frame(cls, stock_data):
+        """Construye las columnas a partir de un DataFrame indexado por fecha (como el de load_bars)."""
+        day = stock_data.index.values.astype('datetime64[D]').astype(np.int32)
+        return cls(day, *(stock_data[column].to_numpy(dtype=float) for column in COLUMNS))
+
+    def __len__(self):
+        return len(self.day)
+
+    def __getitem__(self, column):
+        return getattr(self, COLUMNS.get(column, column))
+
+    @property
+    def empty(self):
+        return len(self.day) == 0
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.day.astype('datetime64[D]'), name='Date')
+
+    def between(self, start, end):
+        """Vistas (sin copia) de las barras con fecha en [start, end]."""
+        lo = np.searchsorted(self.day, epoch_day(start), side='left')
+        hi = np.searchsorted(self.day, epoch_day(end), side='right')
+        return PriceColumns(*(getattr(self, name)[lo:hi] for name in ('day',) + FIELDS))
+
+    def to_frame(self):
+        """DataFrame con columnas Open, High, Low, Close y Volume indexado por fecha (copia los datos)."""
+        return pd.DataFrame({column: np.array(self[column]) for column in COLUMNS}, index=self.index)
+
+
+def epoch_day(value):
+    """Días desde 1970-01-01 de una fecha (date, Timestamp o 'YYYY-MM-DD')."""
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def directory():
+    """Carpeta de los archivos de precios, o None si están desactivados (PRICE_FILES_DIR = None)."""
+    path = getattr(settings, 'PRICE_FILES_DIR', None)
+    return Path(path) if path else None
+
+
+def path_for(ticker):
+    """
+    Ruta del archivo de un ticker.
+
+    Lanza:
+    - ValueError: Si el símbolo no es un ticker válido o la ruta saldría de la carpeta.
+    """
+    folder = directory().resolve()
+    path = (folder / f'{ticker}.prices').resolve()
+    if not is_valid_ticker(ticker) or path.parent != folder:
+        raise ValueError(f"Ticker inválido para un archivo de precios: {ticker!r}")
+    return path
+
+
+def _offsets(count):
+    day_bytes = (4 * count + 7) // 8 * 8
+    return HEADER_SIZE, HEADER_SIZE + day_bytes
+
+
+def write(ticker, columns):
+    """
+    Escribe (o reemplaza de forma atómica) el archivo de un ticker.
+
+    Parámetros:
+    - ticker: Símbolo de la acción.
+    - columns: PriceColumns con los días en orden creciente y sin repetidos.
+    """
+    folder = directory()
+    folder.mkdir(parents=True, exist_ok=True)
+    count = len(columns)
+    day_offset, data_offset = _offsets(count)
+    handle, tmp_path = tempfile.mkstemp(dir=folder, prefix=f'.{ticker}.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(MAGIC + np.uint64(count).astype('<u8').tobytes())
+            output.write(np.asarray(columns.day, dtype='<i4').tobytes())
+            output.write(b'\0' * (data_offset - day_offset - 4 * count))
+            for field in FIELDS:
+                output.write(np.asarray(getattr(columns, field), dtype='<f8').tobytes())
+        os.replace(tmp_path, path_for(ticker))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read(ticker):
+    """
+    Abre el archivo de un ticker como columnas de memmap de solo lectura.
+
+    Los archivos abiertos se reutilizan mientras no cambien en disco (mismo inodo y fecha de
+    modificación), de modo que leer un ticker caliente solo cuesta un stat.
+
+    Retorna:
+    - PriceColumns, o None si los archivos están desactivados o el ticker no tiene archivo.
+    """
+    if directory() is None:
+        return None
+    return read_file(path_for(ticker))
+
+
+def read_file(path):
+    """
+    Abre un archivo de precios cualquiera (por ejemplo, de una carpeta de ReplayProvider).
+
+    Retorna:
+    - PriceColumns, o None si el archivo no existe.
+
+    Lanza:
+    - ValueError si el archivo no tiene el formato de precios.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _open_files.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with open(path, 'rb') as source:
+        header = source.read(HEADER_SIZE)
+    if header[:8] != MAGIC:
+        raise ValueError(f"{path} no es un archivo de precios.")
+    count = int(np.frombuffer(header[8:], dtype='<u8')[0])
+    if count == 0:
+        columns = PriceColumns(np.empty(0, dtype=np.int32), *(np.empty(0) for _ in FIELDS))
+    else:
+        # Un solo mapeo del archivo; cada columna es una vista sobre él
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        day_offset, data_offset = _offsets(count)
+        columns = PriceColumns(
+            raw[day_offset:day_offset + 4 * count].view('<i4'),
+            *(raw[data_offset + 8 * count * i:data_offset + 8 * count * (i + 1)].view('<f8')
+              for i in range(len(FIELDS))),
+        )
+    _open_files.set(path, (version, columns))
+    return columns
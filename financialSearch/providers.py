@@ -0,0 +1,181 @@
+"""
+Proveedores de datos de mercado intercambiables.
+
+El almacén (store.fetch_upstream) no llama a yfinance directamente, sino al proveedor
+configurado en settings.MARKET_DATA_PROVIDER:
+
+    MARKET_DATA_PROVIDER = {
+        'BACKEND': 'financialSearch.providers.YFinanceProvider',
+        'OPTIONS': {},
+    }
+
+Implementaciones:
+- YFinanceProvider: Yahoo Finance a través de yfinance (por defecto).
+- ReplayProvider: reproduce históricos guardados en archivos locales (CSV o .prices).
+- SyntheticProvider: genera precios deterministas sin red, para cargas y benchmarks offline.
+
+Todos implementan history(ticker, start, end) con ambos extremos incluidos y devuelven un
+DataFrame con columnas Open, High, Low, Close y Volume indexado por fecha.
+"""
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import pricefiles
+from .cache import MemoCache
+from .tickers import is_valid_ticker
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_PROVIDER = {'BACKEND': 'financialSearch.providers.YFinanceProvider', 'OPTIONS': {}}
+
+
+class MarketDataProvider(ABC):
+    """Interfaz de los proveedores de datos de mercado."""
+
+    @abstractmethod
+    def history(self, ticker, start, end):
+        """
+        Barras diarias de un ticker.
+
+        Parámetros:
+        - ticker: Símbolo de la acción.
+        - start, end: Fechas (date) del rango, ambos extremos incluidos.
+
+        Retorna:
+        - DataFrame con columnas OHLCV indexado por fecha; vacío si no hay datos.
+        """
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance. yfinance trata el final como exclusivo, por eso se pide hasta el día siguiente."""
+
+    def history(self, ticker, start, end):
+        # yfinance tarda más en importarse que pandas: solo se carga si se usa este proveedor
+        import yfinance as yf
+        return yf.Ticker(ticker).history(
+            start=datetime.combine(start, datetime.min.time()),
+            end=datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        )
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Reproduce históricos guardados en una carpeta local, un archivo por ticker:
+
+    - <TICKER>.prices: archivo columnar de financialSearch.pricefiles (leído con memmap).
+    - <TICKER>.csv o <TICKER>.csv.gz: CSV con columna Date y columnas OHLCV (como la
+      exportación de yfinance o de Yahoo Finance).
+
+    Los CSV leídos se conservan en una MemoCache de `cache_size` archivos, con la fecha de
+    modificación en la clave: un archivo reescrito se vuelve a leer. Los archivos que no existen
+    no se recuerdan, así que un ticker agregado después a la carpeta se encuentra.
+    """
+
+    def __init__(self, path, cache_size=64):
+        self.path = Path(path)
+        self._frames = MemoCache(maxsize=cache_size, ttl=None)
+
+    def history(self, ticker, start, end):
+        # Un símbolo que no es un ticker válido no puede tener archivo en la carpeta
+        if not is_valid_ticker(ticker):
+            return pd.DataFrame(columns=OHLCV)
+        # Los .prices se reutilizan en la caché de memmaps de pricefiles; solo se copia el rango
+        columns = pricefiles.read_file(self._file(f'{ticker}.prices'))
+        if columns is not None:
+            return columns.between(start, end).to_frame()
+        frame = self._load_csv(ticker)
+        if frame is None:
+            return pd.DataFrame(columns=OHLCV)
+        return frame.loc[pd.Timestamp(start):pd.Timestamp(end)]
+
+    def _file(self, name):
+        """Ruta de `name` dentro de la carpeta; lanza ValueError si la ruta saldría de ella."""
+        folder = self.path.resolve()
+        path = (folder / name).resolve()
+        if path.parent != folder:
+            raise ValueError(f"Archivo fuera de la carpeta de reproducción: {name!r}")
+        return path
+
+    def _load_csv(self, ticker):
+        for name in (f'{ticker}.csv', f'{ticker}.csv.gz'):
+            path = self._file(name)
+            try:
+                modified = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            return self._frames.get_or_compute((name, modified), lambda: self._read_csv(path))
+        return None
+
+    @staticmethod
+    def _read_csv(path):
+        frame = pd.read_csv(path, index_col='Date')
+        frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index, utc=True).date, name='Date')
+        return frame.reindex(columns=OHLCV).sort_index()
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Precios sintéticos deterministas: caminata aleatoria geométrica en días hábiles.
+
+    Los rendimientos de cada ticker se generan desde una fecha de origen fija con una semilla
+    derivada de `seed` y del símbolo, así que un mismo día tiene siempre el mismo precio sin
+    importar el rango pedido, y dos consultas que se solapan coinciden.
+
+    Parámetros:
+    - seed: Semilla global.
+    - volatility: Desviación estándar de los rendimientos diarios.
+    - latency: Segundos de espera por consulta, para simular la red.
+    """
+    ORIGIN = np.datetime64('1900-01-01', 'D')
+
+    def __init__(self, seed=0, volatility=0.02, latency=0.0):
+        self.seed = seed
+        self.volatility = volatility
+        self.latency = latency
+
+    def history(self, ticker, start, end):
+        if self.latency:
+            time.sleep(self.latency)
+        first = int((np.datetime64(start, 'D') - self.ORIGIN).astype(int))
+        last = int((np.datetime64(end, 'D') - self.ORIGIN).astype(int))
+        if last < max(first, 0):
+            return pd.DataFrame(columns=OHLCV)
+
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        shocks = rng.normal(0.0, self.volatility, size=(last + 1, 3))
+        close = 100 * np.exp(np.cumsum(shocks[:, 0]))[max(first, 0):]
+        spread = np.abs(shocks[max(first, 0):, 1:]) * close[:, None]
+
+        days = self.ORIGIN + np.arange(max(first, 0), last + 1)
+        open = close - spread[:, 0] * np.sign(shocks[max(first, 0):, 0])
+        frame = pd.DataFrame({
+            'Open': open,
+            'High': close + spread[:, 0],
+            'Low': np.minimum(open, close - spread[:, 1]),
+            'Close': close,
+            'Volume': np.round(1e6 * np.exp(shocks[max(first, 0):, 2] * 10)),
+        }, index=pd.DatetimeIndex(days, name='Date'))
+        return frame[frame.index.dayofweek < 5]
+
+
+_provider = (None, None)
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Instancia del proveedor configurado en MARKET_DATA_PROVIDER (se reutiliza mientras no cambie)."""
+    global _provider
+    config = getattr(settings, 'MARKET_DATA_PROVIDER', DEFAULT_PROVIDER)
+    key = (config['BACKEND'], repr(sorted(config.get('OPTIONS', {}).items())))
+    with _provider_lock:
+        if _provider[0] != key:
+            _provider = (key, import_string(config['BACKEND'])(**config.get('OPTIONS', {})))
+        return _provider[1]
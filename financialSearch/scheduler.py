@@ -0,0 +1,225 @@
+"""
+Planificador de descargas al proveedor de datos de mercado.
+
+Todas las descargas de store.fetch_upstream pasan por el planificador del proceso, que:
+
+- Agrupa las peticiones concurrentes (single-flight): si otra petición ya está descargando
+  un rango que se solapa con el pedido, se espera su resultado en lugar de repetir la
+  descarga, y solo se descargan los tramos que nadie está cubriendo. Cien búsquedas
+  simultáneas de AAPL producen una sola consulta al proveedor.
+- Limita el ritmo con una cubeta de tokens compartida (MARKET_DATA_RATE_LIMIT) para no
+  agotar la cuota del proveedor.
+- Reintenta los fallos con espera exponencial y jitter completo (MARKET_DATA_RETRIES).
+
+La descarga la hace el hilo de la primera petición; no hay hilos propios del planificador.
+Cada proceso (worker) tiene su propio planificador y su propia cubeta.
+"""
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from . import metrics
+
+ONE_DAY = timedelta(days=1)
+DEFAULT_RATE_LIMIT = {'RATE': 2.0, 'BURST': 10}
+DEFAULT_RETRIES = {'ATTEMPTS': 3, 'BACKOFF': 0.5, 'MAX_BACKOFF': 8.0}
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens: `rate` tokens por segundo con ráfagas de hasta `burst`.
+
+    reserve() reserva un token aunque la cubeta esté vacía (el saldo queda negativo) y espera
+    hasta que se reponga, así que los hilos se atienden en orden de llegada.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserva un token y retorna los segundos que hay que esperar para usarlo."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class Flight:
+    """Descarga en curso del rango [start, end] de un ticker."""
+
+    def __init__(self, ticker, start, end):
+        self.ticker = ticker
+        self.start = start
+        self.end = end
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class FetchScheduler:
+    """Agrupa, limita y reintenta las descargas al proveedor (ver el docstring del módulo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._waiting = {'token': 0, 'flight': 0}
+        self._bucket = (None, None)
+
+    def fetch(self, ticker, start, end, download):
+        """
+        Descarga el rango [start, end] de `ticker` reutilizando las descargas en curso.
+
+        Parámetros:
+        - ticker: Símbolo de la acción.
+        - start, end: Fechas (date) del rango, ambos extremos incluidos.
+        - download: Función download(ticker, inicio, fin) que consulta al proveedor.
+
+        Retorna:
+        - Lista de tuplas (inicio, fin, resultado) que cubren [start, end] en orden cronológico;
+          los tramos compartidos pueden extenderse fuera del rango pedido.
+
+        Lanza:
+        - La excepción de la descarga de cualquiera de los tramos tras agotar los reintentos.
+        """
+        owned, joined = self._plan(ticker, start, end)
+        metrics.registry.increment('financialsearch_upstream_segments_total', len(owned), role='leader')
+        metrics.registry.increment('financialsearch_upstream_segments_total', len(joined), role='coalesced')
+
+        # Primero los tramos propios y luego la espera: un hilo solo espera descargas que ya
+        # existían al planificar, así que no puede haber esperas circulares
+        for flight in owned:
+            self._run(flight, download)
+        for flight in joined:
+            self._wait(flight)
+
+        flights = sorted(owned + joined, key=lambda flight: flight.start)
+        for flight in flights:
+            if flight.error is not None:
+                raise flight.error
+        return [(flight.start, flight.end, flight.result) for flight in flights]
+
+    def _plan(self, ticker, start, end):
+        """Reparte [start, end] entre descargas en curso (joined) y tramos nuevos (owned)."""
+        owned, joined = [], []
+        with self._lock:
+            in_flight = self._flights.setdefault(ticker, [])
+            cursor = start
+            for flight in sorted(in_flight, key=lambda flight: flight.start):
+                if flight.end < cursor or flight.start > end:
+                    continue
+                if flight.start > cursor:
+                    owned.append(Flight(ticker, cursor, flight.start - ONE_DAY))
+                joined.append(flight)
+                cursor = max(cursor, flight.end + ONE_DAY)
+                if cursor > end:
+                    break
+            if cursor <= end:
+                owned.append(Flight(ticker, cursor, end))
+            in_flight.extend(owned)
+        return owned, joined
+
+    def _run(self, flight, download):
+        try:
+            flight.result = self._download(flight, download)
+        except Exception as error:
+            flight.error = error
+        finally:
+            with self._lock:
+                in_flight = self._flights[flight.ticker]
+                in_flight.remove(flight)
+                if not in_flight:
+                    del self._flights[flight.ticker]
+            flight.done.set()
+
+    def _download(self, flight, download):
+        """Consulta al proveedor respetando la cubeta de tokens y reintentando los fallos."""
+        retries = getattr(settings, 'MARKET_DATA_RETRIES', DEFAULT_RETRIES)
+        attempts = max(1, retries.get('ATTEMPTS', 1))
+        for attempt in range(attempts):
+            self._throttle()
+            try:
+                return download(flight.ticker, flight.start, flight.end)
+            except Exception:
+                metrics.registry.increment('financialsearch_upstream_errors_total')
+                if attempt == attempts - 1:
+                    raise
+            metrics.registry.increment('financialsearch_upstream_retries_total')
+            # Jitter completo: espera uniforme entre 0 y el tope exponencial
+            ceiling = min(retries.get('MAX_BACKOFF', 8.0), retries.get('BACKOFF', 0.5) * 2 ** attempt)
+            time.sleep(random.uniform(0, ceiling))
+
+    def _throttle(self):
+        bucket = self.bucket()
+        if bucket is None:
+            return
+        delay = bucket.reserve()
+        if delay:
+            metrics.registry.increment('financialsearch_upstream_throttled_seconds_total', delay)
+            self._count('token', 1)
+            try:
+                time.sleep(delay)
+            finally:
+                self._count('token', -1)
+
+    def _wait(self, flight):
+        self._count('flight', 1)
+        try:
+            flight.done.wait()
+        finally:
+            self._count('flight', -1)
+
+    def _count(self, kind, delta):
+        with self._lock:
+            self._waiting[kind] += delta
+
+    def bucket(self):
+        """Cubeta de MARKET_DATA_RATE_LIMIT (se reutiliza mientras no cambie; None sin límite)."""
+        config = getattr(settings, 'MARKET_DATA_RATE_LIMIT', DEFAULT_RATE_LIMIT)
+        key = None if config is None else (config['RATE'], config.get('BURST', 1))
+        with self._lock:
+            if self._bucket[0] != key:
+                self._bucket = (key, None if key is None else TokenBucket(*key))
+            return self._bucket[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': sum(len(flights) for flights in self._flights.values()),
+                'waiting_token': self._waiting['token'],
+                'waiting_flight': self._waiting['flight'],
+            }
+
+
+scheduler = FetchScheduler()
+
+
+def _queue_depth():
+    stats = scheduler.stats()
+    return {
+        (('state', 'in_flight'),): stats['in_flight'],
+        (('state', 'waiting_token'),): stats['waiting_token'],
+        (('state', 'waiting_flight'),): stats['waiting_flight'],
+    }
+
+
+def _coalescing_ratio():
+    leader = metrics.registry.counter_value('financialsearch_upstream_segments_total', role='leader')
+    coalesced = metrics.registry.counter_value('financialsearch_upstream_segments_total', role='coalesced')
+    return {(): coalesced / (leader + coalesced) if leader + coalesced else 0.0}
+
+
+metrics.registry.register_gauge(
+    'financialsearch_upstream_queue_depth', _queue_depth,
+    'Descargas al proveedor en curso y peticiones esperando un token o una descarga compartida.')
+metrics.registry.register_gauge(
+    'financialsearch_upstream_coalescing_ratio', _coalescing_ratio,
+    'Proporción de tramos pedidos al proveedor que se resolvieron con una descarga ya en curso.')
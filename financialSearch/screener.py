@@ -0,0 +1,160 @@
+"""
+Screener del universo de tickers con los indicadores de analyze_data.
+
+Para cada ticker se calculan, sobre el último día del histórico guardado, los mismos valores
+que compute_analysis (pendientes de largo y corto plazo, SMA_5, EMA_5, RSI, volatilidad y
+recomendación). Los tickers con el mismo número de barras se evalúan juntos como una matriz
+2-D; en universos grandes, los grupos se reparten en el pool de procesos compartido.
+
+Este módulo no usa el ORM, para que sus funciones se puedan ejecutar en un pool de procesos.
+"""
+import operator
+
+import numpy as np
+
+from . import indicators, pools
+
+SMA_WINDOW = 5
+MIN_VALID_DAYS = 20
+
+# 500 tickers se evalúan en ~20 ms en un solo proceso: el pool solo compensa en universos grandes
+PARALLEL_MIN_TICKERS = 2000
+
+# Campos numéricos de cada fila, filtrables con min_<campo> / max_<campo> y ordenables
+NUMERIC_FIELDS = (
+    'close', 'sma_5', 'ema_5', 'rsi_14', 'volatility_20', 'short_term_trend', 'long_term_trend',
+)
+SORT_FIELDS = ('ticker', 'recommendation', 'days') + NUMERIC_FIELDS
+
+
+def evaluate(close):
+    """
+    Indicadores del último día para una matriz de cierres de igual longitud.
+
+    Parámetros:
+    - close: Array 2-D (tickers x días) sin NaN.
+
+    Retorna:
+    - Diccionario {campo: array por ticker} con 'days' y los campos de NUMERIC_FIELDS y
+      'recommendation', o None si no hay suficientes días para el análisis.
+    """
+    close = np.asarray(close, dtype=float)
+    # build_returns pasa a compute_analysis la serie completa (la SMA_5 con sus NaN iniciales),
+    # así que todos los días cuentan para el análisis
+    days = close.shape[1]
+    if days < MIN_VALID_DAYS:
+        return None
+
+    # Solo hace falta la última ventana de cada indicador, salvo la EMA que depende de toda la serie
+    long_window = min(60, days)
+    long_term = indicators.rolling_slope(close[:, -long_window:], long_window)[:, -1]
+    short_term = indicators.rolling_slope(close[:, -10:], 10)[:, -1]
+    sma_5 = close[:, -SMA_WINDOW:].mean(axis=1)
+    ema_5 = indicators.ema(close, span=5)[:, -1]
+    rsi = indicators.rsi(close[:, -15:], 14, method='simple')[:, -1]
+    volatility = indicators.rolling_std(close[:, -20:], 20)[:, -1]
+
+    buy = (short_term > 0) & (sma_5 > ema_5) & (rsi < 70)
+    sell = (short_term < 0) & (sma_5 < ema_5) & (rsi > 30)
+    return {
+        'days': np.full(close.shape[0], days),
+        'close': close[:, -1],
+        'sma_5': sma_5,
+        'ema_5': ema_5,
+        'rsi_14': rsi,
+        'volatility_20': volatility,
+        'short_term_trend': short_term,
+        'long_term_trend': long_term,
+        'recommendation': np.where(buy, 'comprar', np.where(sell, 'vender', 'mantener')),
+    }
+
+
+def _evaluate_groups(groups):
+    """Evalúa una lista de grupos (tickers, matriz) y devuelve una fila por ticker."""
+    rows = []
+    for tickers, close in groups:
+        result = evaluate(close)
+        if result is None:
+            continue
+        columns = {field: values.tolist() for field, values in result.items()}
+        rows.extend({'ticker': ticker, **{field: values[i] for field, values in columns.items()}}
+                    for i, ticker in enumerate(tickers))
+    return rows
+
+
+def group_by_length(closes):
+    """
+    Agrupa las series de cierres por número de barras.
+
+    Parámetros:
+    - closes: DataFrame (fechas x tickers) con NaN en los días sin barra.
+
+    Retorna:
+    - Lista de tuplas (tickers, matriz tickers x días) con las barras de cada ticker en orden.
+    """
+    values = closes.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    tickers = np.asarray(closes.columns)
+    groups = []
+    for count in np.unique(counts[counts > 0]):
+        columns = np.flatnonzero(counts == count)
+        if present[:, columns].all():
+            matrix = values[:, columns].T
+        else:
+            matrix = np.stack([values[present[:, j], j] for j in columns])
+        groups.append((tickers[columns].tolist(), matrix))
+    return groups
+
+
+def screen(closes, max_workers=None, min_tickers=PARALLEL_MIN_TICKERS):
+    """
+    Calcula la fila del screener de cada ticker con histórico suficiente.
+
+    Con universos grandes, los grupos de igual longitud se trocean en partes similares y se
+    reparten en el pool de procesos compartido; si no, todo se evalúa en el proceso actual.
+
+    Parámetros:
+    - closes: DataFrame (fechas x tickers) de cierres.
+    - max_workers: Procesos del pool (por defecto os.cpu_count()); con 1 no se usa el pool.
+    - min_tickers: Tickers a partir de los cuales se usa el pool.
+
+    Retorna:
+    - Lista de filas {'ticker', 'days', 'recommendation', <campos numéricos>}.
+    """
+    groups = group_by_length(closes)
+    max_workers = pools.pool_size(max_workers)
+    tickers = sum(len(names) for names, _ in groups)
+    if max_workers <= 1 or tickers < max(min_tickers, 2 * max_workers):
+        return _evaluate_groups(groups)
+
+    # Cada grupo se parte en max_workers trozos para que todos los procesos reciban trabajo
+    parts = [[] for _ in range(max_workers)]
+    for names, matrix in groups:
+        for i, rows in enumerate(np.array_split(np.arange(len(names)), max_workers)):
+            if len(rows):
+                parts[i].append(([names[row] for row in rows], matrix[rows]))
+    return [row for rows in pools.map_in_pool(_evaluate_groups, parts, max_workers) for row in rows]
+
+
+def apply_filters(rows, recommendations=None, bounds=None, sort='ticker', limit=None):
+    """
+    Filtra y ordena las filas del screener.
+
+    Parámetros:
+    - recommendations: Recomendaciones aceptadas (por defecto todas).
+    - bounds: Diccionario {(campo, 'min'|'max'): valor} con límites inclusivos.
+    - sort: Campo de orden; con prefijo '-' en orden descendente. Los NaN quedan al final.
+    - limit: Máximo de filas devueltas.
+    """
+    if recommendations:
+        rows = [row for row in rows if row['recommendation'] in recommendations]
+    for (field, side), value in (bounds or {}).items():
+        compare = operator.ge if side == 'min' else operator.le
+        rows = [row for row in rows if compare(row[field], value)]
+
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    valid = [row for row in rows if row[field] == row[field]]
+    rows = sorted(valid, key=operator.itemgetter(field), reverse=descending) + [row for row in rows if row[field] != row[field]]
+    return rows[:limit] if limit else rows
@@ -0,0 +1,319 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from . import metrics, pricefiles, providers
+from .scheduler import scheduler
+from .models import FetchedRange, IndicatorState, PriceBar
+
+# Columnas OHLCV que se guardan localmente (nombres de yfinance -> campos del modelo)
+COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume',
+}
+
+ONE_DAY = timedelta(days=1)
+
+# Un lock por ticker para reescribir su archivo de precios (ver write_price_file)
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def missing_ranges(ticker, start, end):
+    """
+    Calcula los huecos del rango [start, end] que aún no se han consultado al proveedor.
+
+    Parámetros:
+    - ticker: Símbolo de la acción.
+    - start, end: Fechas (date) del rango solicitado, ambos extremos incluidos.
+
+    Retorna:
+    - Lista de tuplas (inicio, fin) con los sub-rangos que faltan, en orden cronológico.
+    """
+    if start > end:
+        return []
+
+    covered = FetchedRange.objects.filter(
+        ticker=ticker, start__lte=end, end__gte=start
+    ).order_by('start').values_list('start', 'end')
+
+    gaps = []
+    cursor = start
+    for range_start, range_end in covered:
+        if range_start > cursor:
+            gaps.append((cursor, range_start - ONE_DAY))
+        cursor = max(cursor, range_end + ONE_DAY)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    metrics.registry.increment('financialsearch_store_lookups_total', result='miss' if gaps else 'hit')
+    return gaps
+
+
+def fetch_upstream(ticker, start, end):
+    """
+    Descarga del proveedor configurado (MARKET_DATA_PROVIDER) las barras del rango
+    [start, end] (ambos incluidos) y recorta el resultado al rango solicitado.
+
+    La descarga pasa por el planificador (scheduler.py): las peticiones concurrentes de rangos
+    que se solapan comparten una sola consulta al proveedor, con límite de ritmo y reintentos.
+    """
+    with metrics.timed('upstream'):
+        segments = scheduler.fetch(ticker, start, end, download)
+    frames = [stock_data for _, _, stock_data in segments if not stock_data.empty]
+    if not frames:
+        return pd.DataFrame(columns=list(COLUMNS))
+
+    stock_data = frames[0] if len(frames) == 1 else pd.concat(frames)
+    in_range = (stock_data.index >= pd.Timestamp(start)) & (stock_data.index <= pd.Timestamp(end))
+    return stock_data[in_range]
+
+
+def download(ticker, start, end):
+    """Consulta al proveedor el rango [start, end] y normaliza las columnas y el índice."""
+    stock_data = providers.get_provider().history(ticker, start, end)
+    if stock_data.empty or 'Close' not in stock_data:
+        return pd.DataFrame(columns=list(COLUMNS))
+
+    stock_data = stock_data.reindex(columns=list(COLUMNS))
+    stock_data.index = pd.DatetimeIndex(stock_data.index.date, name='Date')
+    in_range = (stock_data.index >= pd.Timestamp(start)) & (stock_data.index <= pd.Timestamp(end))
+    return stock_data[in_range & stock_data['Close'].notna()]
+
+
+def save_bars(ticker, stock_data, start, end):
+    """
+    Guarda las barras descargadas y marca el rango [start, end] como consultado.
+
+    Los días a partir de hoy no se marcan como cubiertos: la barra del día aún puede cambiar
+    y las fechas futuras todavía no tienen datos. Por eso las barras de días aún no cubiertos
+    reemplazan a las guardadas (el cierre provisional de hoy se actualiza en cada descarga y el
+    definitivo lo sustituye cuando el día se cubre); las de días ya cubiertos son definitivas y
+    no se tocan.
+
+    Si se agrega o se corrige alguna barra anterior o igual a la última fecha del estado
+    incremental del ticker (un hueco antiguo), el estado se descarta: refresh_states solo
+    incorpora barras posteriores y lo reconstruirá con el histórico completo.
+    """
+    bars = [
+        PriceBar(
+            ticker=ticker,
+            date=index.date(),
+            **{field: (None if pd.isna(row[column]) else float(row[column])) for column, field in COLUMNS.items()},
+        )
+        for index, row in stock_data.iterrows()
+    ]
+
+    covered_end = min(end, date.today() - ONE_DAY)
+    final, provisional, changed = [], [], []
+    if bars:
+        # Se consulta fuera de la transacción: en SQLite, una lectura al inicio de una transacción
+        # diferida no puede pasar a escritura si otro hilo escribe ("database is locked"). Si
+        # otro guardado inserta las mismas fechas entretanto, solo se descarta el estado de más.
+        dates = [bar.date for bar in bars]
+        first, last = min(dates), max(dates)
+        stored = set(PriceBar.objects.filter(
+            ticker=ticker, date__gte=first, date__lte=last).values_list('date', flat=True))
+        covered = list(FetchedRange.objects.filter(
+            ticker=ticker, start__lte=last, end__gte=first).values_list('start', 'end'))
+        for bar in bars:
+            if any(range_start <= bar.date <= range_end for range_start, range_end in covered):
+                final.append(bar)
+                if bar.date not in stored:
+                    changed.append(bar.date)
+            else:
+                provisional.append(bar)
+                changed.append(bar.date)
+    with transaction.atomic():
+        if final:
+            PriceBar.objects.bulk_create(final, ignore_conflicts=True)
+        if provisional:
+            PriceBar.objects.bulk_create(
+                provisional, update_conflicts=True, unique_fields=['ticker', 'date'],
+                update_fields=list(COLUMNS.values()))
+        if changed:
+            IndicatorState.objects.filter(ticker=ticker, last_date__gte=min(changed)).delete()
+        if start <= covered_end:
+            _mark_covered(ticker, start, covered_end)
+    if bars and pricefiles.directory() is not None:
+        write_price_file(ticker, revised=bool(provisional))
+
+
+def _mark_covered(ticker, start, end):
+    """Fusiona el rango [start, end] con los rangos cubiertos que se solapan o son contiguos."""
+    neighbours = FetchedRange.objects.filter(
+        ticker=ticker, start__lte=end + ONE_DAY, end__gte=start - ONE_DAY
+    )
+    for fetched in neighbours:
+        start = min(start, fetched.start)
+        end = max(end, fetched.end)
+    neighbours.delete()
+    FetchedRange.objects.create(ticker=ticker, start=start, end=end)
+
+
+def load_bars(ticker, start, end):
+    """Lee del almacén local las barras del rango [start, end] como DataFrame indexado por fecha."""
+    rows = PriceBar.objects.filter(
+        ticker=ticker, date__gte=start, date__lte=end
+    ).order_by('date').values_list('date', *COLUMNS.values())
+
+    stock_data = pd.DataFrame.from_records(list(rows), columns=['Date', *COLUMNS])
+    stock_data.index = pd.DatetimeIndex(stock_data.pop('Date'), name='Date')
+    return stock_data
+
+
+def _file_lock(ticker):
+    with _file_locks_guard:
+        return _file_locks.setdefault(ticker, threading.Lock())
+
+
+def _stored_summary(ticker, start, end):
+    """Número de barras guardadas en [start, end] y la fecha de la última (None si no hay)."""
+    summary = PriceBar.objects.filter(
+        ticker=ticker, date__gte=start, date__lte=end).aggregate(count=Count('id'), last=Max('date'))
+    return summary['count'], summary['last']
+
+
+def _is_current(columns, count, last):
+    """Indica si las columnas tienen exactamente `count` barras y terminan en `last`."""
+    if len(columns) != count:
+        return False
+    return count == 0 or int(columns.day[-1]) == pricefiles.epoch_day(last)
+
+
+def write_price_file(ticker, revised=False):
+    """
+    Regenera el archivo de precios de un ticker con todas sus barras guardadas.
+
+    La lectura de la base de datos y el reemplazo del archivo se hacen bajo un lock por
+    ticker, así que dos save_bars concurrentes no pueden dejar en disco la copia más antigua:
+    el último en entrar lee después de que ambos guardaran sus barras. Si el archivo ya tiene
+    las mismas barras que la tabla (mismo número y misma última fecha), no se reescribe,
+    salvo con revised=True (se actualizaron barras ya guardadas).
+    """
+    with _file_lock(ticker):
+        current = pricefiles.read(ticker)
+        if (not revised and current is not None
+                and _is_current(current, *_stored_summary(ticker, date.min, date.max))):
+            return
+        pricefiles.write(ticker, pricefiles.PriceColumns.from_frame(load_bars(ticker, date.min, date.max)))
+
+
+def load_columns(ticker, start, end):
+    """
+    Lee las barras del rango [start, end] como PriceColumns.
+
+    Si el ticker tiene archivo de precios, las columnas son vistas de memmap sin copia; si no,
+    se leen de la base de datos. El archivo es una copia derivada que otro proceso puede estar
+    regenerando: si en el rango no tiene las mismas barras que la tabla (número y última
+    fecha), se leen de la base de datos.
+    """
+    columns = pricefiles.read(ticker)
+    if columns is not None:
+        columns = columns.between(start, end)
+        if _is_current(columns, *_stored_summary(ticker, start, end)):
+            return columns
+    return pricefiles.PriceColumns.from_frame(load_bars(ticker, start, end))
+
+
+def _fill_missing(ticker, start, end):
+    """Descarga y guarda, uno tras otro, los huecos de [start, end] de un ticker."""
+    for gap_start, gap_end in missing_ranges(ticker, start, end):
+        save_bars(ticker, fetch_upstream(ticker, gap_start, gap_end), gap_start, gap_end)
+
+
+def get_columns(ticker, start, end):
+    """Como get_history, pero devuelve PriceColumns (ver load_columns)."""
+    _fill_missing(ticker, start, end)
+    return load_columns(ticker, start, end)
+
+
+def get_history(ticker, start, end):
+    """
+    Devuelve el histórico OHLCV de un ticker, descargando únicamente los huecos que faltan.
+
+    Parámetros:
+    - ticker: Símbolo de la acción.
+    - start, end: Fechas (date) del rango solicitado, ambos extremos incluidos.
+
+    Retorna:
+    - DataFrame con columnas Open, High, Low, Close y Volume indexado por fecha.
+    """
+    _fill_missing(ticker, start, end)
+    return load_bars(ticker, start, end)
+
+
+def get_histories(tickers, start, end, max_workers=None):
+    """
+    Devuelve el histórico de varios tickers descargando sus huecos de forma concurrente.
+
+    Solo las descargas se reparten en el pool de hilos; las lecturas y escrituras en la base
+    de datos se hacen en el hilo que llama. La latencia total queda así cerca de la del
+    ticker más lento en lugar de la suma de todos.
+
+    Parámetros:
+    - tickers: Lista de símbolos.
+    - start, end: Fechas (date) del rango solicitado, ambos extremos incluidos.
+    - max_workers: Máximo de descargas simultáneas (por defecto MARKET_DATA_MAX_WORKERS).
+
+    Retorna:
+    - Diccionario {ticker: DataFrame} en el mismo orden que `tickers`.
+    """
+    fill_gaps(tickers, start, end, max_workers)
+    return {ticker: load_bars(ticker, start, end) for ticker in tickers}
+
+
+def fill_gaps(tickers, start, end, max_workers=None):
+    """Descarga de forma concurrente y guarda los huecos de [start, end] de varios tickers."""
+    gaps = [(ticker, gap) for ticker in tickers for gap in missing_ranges(ticker, start, end)]
+    if gaps:
+        max_workers = max_workers or getattr(settings, 'MARKET_DATA_MAX_WORKERS', 8)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(gaps))) as executor:
+            fetched = list(executor.map(lambda item: fetch_upstream(item[0], *item[1]), gaps))
+        for (ticker, (gap_start, gap_end)), stock_data in zip(gaps, fetched):
+            save_bars(ticker, stock_data, gap_start, gap_end)
+
+
+def load_closes(tickers, start, end):
+    """
+    Lee en una sola consulta los cierres de varios tickers en [start, end].
+
+    Parámetros:
+    - tickers: Lista de símbolos, o None para todos los tickers del almacén.
+    - start, end: Fechas (date) del rango, ambos extremos incluidos.
+
+    Retorna:
+    - DataFrame (fechas x tickers) con NaN en los días sin barra de un ticker; las columnas
+      siguen el orden de `tickers`, incluidos los que no tienen ninguna barra (en orden
+      alfabético si tickers es None).
+    """
+    bars = PriceBar.objects.filter(date__gte=start, date__lte=end)
+    if tickers is not None:
+        bars = bars.filter(ticker__in=tickers)
+    rows = bars.order_by().values_list('date', 'ticker', 'close')
+
+    # Pivote con códigos enteros de fecha y ticker: más rápido que DataFrame.pivot en universos grandes
+    bars = pd.DataFrame.from_records(list(rows), columns=['Date', 'ticker', 'close'])
+    date_codes, days = pd.factorize(bars['Date'])
+    ticker_codes, symbols = pd.factorize(bars['ticker'])
+    matrix = np.full((len(days), len(symbols)), np.nan)
+    matrix[date_codes, ticker_codes] = bars['close'].to_numpy(dtype=float)
+
+    closes = pd.DataFrame(matrix, index=pd.DatetimeIndex(days, name='Date'), columns=symbols).sort_index()
+    return closes.reindex(columns=sorted(symbols) if tickers is None else list(tickers))
+
+
+def get_closes(tickers, start, end, max_workers=None):
+    """Matriz de cierres (fechas x tickers) descargando antes los huecos que falten."""
+    fill_gaps(tickers, start, end, max_workers)
+    return load_closes(tickers, start, end)
@@ -3,15 +3,26 @@ import pytest
 from django.test import Client
 from django.urls import reverse
 from django.contrib.auth.models import User
-from financialSearch.views import user_login, user_logout, home, getReturns, analyze_data
+from financialSearch.views import user_login, user_logout, home, getReturns, analyze_data, compute_analysis, render_analysis
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timezone
 from unittest.mock import patch, MagicMock
 import allure
 import numpy as np
 
 # --------------- Fixtures ---------------
 
+@pytest.fixture(autouse=True)
+def price_files_dir(settings, tmp_path):
+    """Cada prueba escribe sus archivos de precios en una carpeta temporal propia."""
+    settings.PRICE_FILES_DIR = tmp_path / 'price_files'
+    return settings.PRICE_FILES_DIR
+
+@pytest.fixture(autouse=True)
+def upstream_rate_limit(settings):
+    """Sin límite de ritmo al proveedor simulado, salvo en las pruebas que lo configuran."""
+    settings.MARKET_DATA_RATE_LIMIT = None
+
 @pytest.fixture
 def client():
     """Simula un navegador web sin sesión activa."""
@@ -381,4 +392,2107 @@ class TestAnalyzeData:
         analysis = analyze_data(sma_5, dates, close_prices)
         
         assert "No hay suficientes datos" in analysis
-        assert "20 días" in analysis
\ No newline at end of file
+        assert "20 días" in analysis
+
+# --------------- Almacén Local de Precios ---------------
+
+@pytest.fixture
+def counting_yfinance(monkeypatch):
+    """Mock de yfinance que registra cada rango solicitado al proveedor."""
+    calls = []
+
+    class CountingTicker:
+        def history(self, start, end):
+            calls.append((start, end))
+            dates = pd.date_range(start=start, end=end, freq='D')
+            return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+    monkeypatch.setattr('yfinance.Ticker', lambda x: CountingTicker())
+    return calls
+
+@allure.feature("Almacén Local de Precios")
+class TestPriceStore:
+
+    @allure.story("Consulta Repetida")
+    @allure.title("Una consulta repetida se sirve desde el almacén sin llamar a yfinance")
+    @allure.description("Verifica que la segunda consulta del mismo rango no genere ninguna llamada al proveedor y devuelva las mismas barras.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_repeated_range_is_served_locally(self, counting_yfinance):
+        from financialSearch import store
+        first = store.get_history('AAPL', date(2023, 1, 1), date(2023, 1, 31))
+        second = store.get_history('AAPL', date(2023, 1, 1), date(2023, 1, 31))
+        assert len(counting_yfinance) == 1
+        assert len(first) == 31
+        assert first['Close'].tolist() == second['Close'].tolist()
+
+    @allure.story("Rangos Solapados")
+    @allure.title("Un rango solapado solo descarga los huecos faltantes")
+    @allure.description("Comprueba que al ampliar un rango ya consultado por ambos extremos solo se pidan a yfinance los días que faltan.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_overlapping_range_fetches_only_gaps(self, counting_yfinance):
+        from financialSearch import store
+        store.get_history('AAPL', date(2023, 1, 10), date(2023, 1, 20))
+        assert store.missing_ranges('AAPL', date(2023, 1, 1), date(2023, 1, 31)) == [
+            (date(2023, 1, 1), date(2023, 1, 9)),
+            (date(2023, 1, 21), date(2023, 1, 31)),
+        ]
+        data = store.get_history('AAPL', date(2023, 1, 1), date(2023, 1, 31))
+        assert len(counting_yfinance) == 3
+        assert len(data) == 31
+        assert store.missing_ranges('AAPL', date(2023, 1, 1), date(2023, 1, 31)) == []
+
+    @allure.story("Vista con Almacén")
+    @allure.title("POST /getReturns repetido no vuelve a descargar el histórico")
+    @allure.description("Asegura que dos búsquedas idénticas en /getReturns produzcan una única descarga desde yfinance.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_get_returns_uses_store(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'MSFT'}
+        first = logged_in_client.post('/getReturns', data)
+        second = logged_in_client.post('/getReturns', data)
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert len(counting_yfinance) == 1
+
+    @allure.story("Barra del Día")
+    @allure.title("La barra provisional de hoy se actualiza cuando el proveedor la corrige")
+    @allure.description("Comprueba que una segunda consulta reemplace el cierre de hoy guardado antes, que una barra provisional de un día ya pasado se sustituya al cubrir ese día y que las barras de días cubiertos no cambien.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_provisional_bar_is_revised(self, monkeypatch, price_files_dir):
+        from datetime import timedelta
+        from financialSearch import pricefiles, store
+        from financialSearch.models import PriceBar
+        closes = {'value': 100.0}
+
+        class RevisingTicker:
+            def history(self, start, end):
+                dates = pd.date_range(start=start, end=end, freq='D')
+                return pd.DataFrame({'Close': closes['value']}, index=dates)
+
+        monkeypatch.setattr('yfinance.Ticker', lambda x: RevisingTicker())
+        today = date.today()
+        week_ago = today - timedelta(days=7)
+        assert store.get_history('AAPL', week_ago, today)['Close'].iloc[-1] == 100.0
+        closes['value'] = 150.0
+        store.save_bars('AAPL', store.fetch_upstream('AAPL', week_ago, today), week_ago, today)
+        history = store.get_history('AAPL', week_ago, today)
+        assert history['Close'].iloc[-1] == 150.0
+        assert history['Close'].iloc[:-1].tolist() == [100.0] * 7
+        assert pricefiles.read('AAPL').close[-1] == 150.0
+
+        # Barra guardada cuando su día aún no había terminado y que ningún rango cubre
+        yesterday = today - timedelta(days=1)
+        PriceBar.objects.filter(ticker='TSLA').delete()
+        PriceBar.objects.create(ticker='TSLA', date=yesterday, close=42.0)
+        store.get_history('TSLA', yesterday, yesterday)
+        assert PriceBar.objects.get(ticker='TSLA', date=yesterday).close == 150.0
+        assert store.missing_ranges('TSLA', yesterday, yesterday) == []
+
+
+# --------------- Caché de Análisis ---------------
+
+@pytest.fixture
+def clear_analysis_cache():
+    """Vacía la caché de análisis antes y después de la prueba."""
+    from financialSearch.cache import analysis_cache
+    analysis_cache.clear()
+    yield analysis_cache
+    analysis_cache.clear()
+
+@allure.feature("Caché de Análisis")
+class TestMemoCache:
+
+    @allure.story("Expulsión LRU")
+    @allure.title("La caché expulsa la entrada usada hace más tiempo al superar su tamaño")
+    @allure.description("Verifica que al llenar la caché se descarte la entrada menos recientemente usada y se cuente la expulsión.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_lru_eviction(self):
+        from financialSearch.cache import MemoCache
+        cache = MemoCache(maxsize=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    @allure.story("Expiración TTL")
+    @allure.title("Las entradas vencidas cuentan como fallo y se recalculan")
+    @allure.description("Comprueba con un reloj simulado que una entrada deja de servirse al cumplirse su tiempo de vida.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_ttl_expiry(self):
+        from financialSearch.cache import MemoCache
+        now = [0.0]
+        cache = MemoCache(maxsize=10, ttl=60, timer=lambda: now[0])
+        assert cache.get_or_compute('k', lambda: 'v1') == 'v1'
+        now[0] = 59
+        assert cache.get_or_compute('k', lambda: 'v2') == 'v1'
+        now[0] = 61
+        assert cache.get_or_compute('k', lambda: 'v3') == 'v3'
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    @allure.story("Análisis Memorizado")
+    @allure.title("Búsquedas idénticas reutilizan el análisis calculado")
+    @allure.description("Asegura que dos POST idénticos a /getReturns calculen analyze_data una sola vez y registren un acierto en la caché.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_returns_reuses_analysis(self, logged_in_client, counting_yfinance, clear_analysis_cache):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        with patch('financialSearch.views.analyze_data', wraps=analyze_data) as spy:
+            first = logged_in_client.post('/getReturns', data)
+            second = logged_in_client.post('/getReturns', data)
+        assert first.json()['analysis'] == second.json()['analysis']
+        assert spy.call_count == 1
+        assert clear_analysis_cache.hits == 1 and clear_analysis_cache.misses == 1
+
+
+# --------------- Consulta por Lotes ---------------
+
+@allure.feature("Consulta por Lotes")
+class TestBatchReturns:
+
+    @allure.story("Varios Tickers")
+    @allure.title("POST /getBatchReturns devuelve serie y análisis de cada ticker")
+    @allure.description("Verifica que el endpoint por lotes responda con los datos y el análisis de todos los tickers pedidos en un solo payload.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_batch_returns_payload(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brands': 'AAPL,MSFT,KO'}
+        response = logged_in_client.post('/getBatchReturns', data)
+        assert response.status_code == 200
+        json_data = response.json()
+        assert list(json_data['results']) == ['AAPL', 'MSFT', 'KO']
+        for brand, payload in json_data['results'].items():
+            assert payload['brand'] == brand
+            assert len(payload['data']) == 59
+            assert 'Tendencia de Precios' in payload['analysis']
+        assert json_data['errors'] == {}
+
+    @allure.story("Descarga Concurrente")
+    @allure.title("La latencia del lote se acerca a la del ticker más lento")
+    @allure.description("Comprueba con un proveedor lento simulado que las descargas de varios tickers se hagan en paralelo y no en secuencia.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_batch_fetches_concurrently(self, logged_in_client, monkeypatch):
+        import time
+
+        class SlowTicker:
+            def history(self, start, end):
+                time.sleep(0.3)
+                dates = pd.date_range(start=start, end=end, freq='D')
+                return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+        monkeypatch.setattr('yfinance.Ticker', lambda x: SlowTicker())
+        data = {'from': '2023-01-01', 'to': '2023-01-31', 'brands': ['AAPL', 'MSFT', 'KO', 'PG', 'V', 'WMT']}
+        started = time.perf_counter()
+        response = logged_in_client.post('/getBatchReturns', data)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200
+        assert len(response.json()['results']) == 6
+        assert elapsed < 6 * 0.3 * 0.7
+
+    @allure.story("Ticker sin Datos")
+    @allure.title("Los tickers sin datos se reportan como error sin afectar al resto")
+    @allure.description("Asegura que un ticker sin barras aparezca en 'errors' mientras los demás se devuelven normalmente.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_batch_reports_missing_tickers(self, logged_in_client, monkeypatch):
+        class PartialTicker:
+            def __init__(self, symbol):
+                self.symbol = symbol
+
+            def history(self, start, end):
+                if self.symbol == 'INVALID':
+                    return pd.DataFrame()
+                dates = pd.date_range(start=start, end=end, freq='D')
+                return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+        monkeypatch.setattr('yfinance.Ticker', PartialTicker)
+        data = {'from': '2023-01-01', 'to': '2023-01-31', 'brands': 'AAPL,INVALID'}
+        json_data = logged_in_client.post('/getBatchReturns', data).json()
+        assert list(json_data['results']) == ['AAPL']
+        assert 'INVALID' in json_data['errors']
+
+    @allure.story("Validación de Parámetros")
+    @allure.title("POST /getBatchReturns responde 400 ante fechas faltantes o mal formadas")
+    @allure.description("Verifica que la falta de 'from'/'to' y una fecha inválida devuelvan 400 con el mensaje correspondiente en lugar de un error del servidor.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_batch_validates_dates(self, logged_in_client, counting_yfinance):
+        response = logged_in_client.post('/getBatchReturns', {'to': '2023-01-31', 'brands': 'AAPL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Faltan campos requeridos.'}
+        response = logged_in_client.post('/getBatchReturns', {'from': '2023-13-01', 'to': '2023-01-31', 'brands': 'AAPL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Formato de fecha inválido.'}
+        assert counting_yfinance == []
+
+
+# --------------- Vista Asíncrona ---------------
+
+@pytest.fixture
+def slow_yfinance(monkeypatch):
+    """Mock de yfinance que simula una latencia de red de 0.2 s por descarga."""
+    import time
+
+    class SlowTicker:
+        def history(self, start, end):
+            time.sleep(0.2)
+            dates = pd.date_range(start=start, end=end, freq='D')
+            return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+    monkeypatch.setattr('yfinance.Ticker', lambda x: SlowTicker())
+
+@allure.feature("Vista Asíncrona")
+class TestAsyncReturns:
+
+    @allure.story("Equivalencia con la Vista Síncrona")
+    @allure.title("POST /getReturnsAsync devuelve lo mismo que /getReturns")
+    @allure.description("Verifica que la versión asíncrona produzca exactamente el mismo payload que la vista síncrona.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_async_matches_sync(self, logged_in_client, counting_yfinance):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+        async_response = async_to_sync(async_client.post)('/getReturnsAsync', data)
+        sync_response = logged_in_client.post('/getReturns', data)
+        assert async_response.status_code == 200
+        assert async_response.json() == sync_response.json()
+
+    @allure.story("Errores")
+    @allure.title("POST /getReturnsAsync sin datos devuelve 404 y GET devuelve 405")
+    @allure.description("Comprueba que la vista asíncrona conserve los códigos de error de la vista síncrona.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_async_errors(self, logged_in_client, counting_yfinance):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+        response = async_to_sync(async_client.post)('/getReturnsAsync', {'from': '2023-01-05', 'to': '2023-01-01', 'brand': 'AAPL'})
+        assert response.status_code == 404
+        assert async_to_sync(async_client.get)('/getReturnsAsync').status_code == 405
+
+    @allure.story("Errores")
+    @allure.title("POST /getReturnsAsync valida los campos y el formato de las fechas")
+    @allure.description("Verifica que la vista asíncrona responda 400 con el mismo mensaje que las demás consultas cuando falta un campo o una fecha no tiene el formato YYYY-MM-DD, sin llamar al proveedor.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_async_validates_dates(self, logged_in_client, counting_yfinance):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+        for data in ({'to': '2023-01-31', 'brand': 'AAPL'}, {'from': '2023-01-01', 'brand': 'AAPL'},
+                     {'from': '2023-01-01', 'to': '2023-01-31'}):
+            response = async_to_sync(async_client.post)('/getReturnsAsync', data)
+            assert response.status_code == 400
+            assert response.json() == {'error': 'Faltan campos requeridos.'}
+        response = async_to_sync(async_client.post)('/getReturnsAsync', {'from': '2023-13-01', 'to': '2023-01-31', 'brand': 'AAPL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Formato de fecha inválido.'}
+        assert counting_yfinance == []
+
+    @allure.story("Rendimiento bajo Concurrencia")
+    @allure.title("Las búsquedas asíncronas concurrentes descargan del proveedor en paralelo")
+    @allure.description("Lanza 10 búsquedas a la vez contra un proveedor lento y verifica que varias descargas estén en curso simultáneamente en lugar de atenderse en serie.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_async_downloads_overlap(self, logged_in_client, monkeypatch):
+        import asyncio
+        import threading
+        import time
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from financialSearch.tickers import TICKERS
+        brands = [symbol for symbol, _ in TICKERS[:10]]
+        lock = threading.Lock()
+        active = {'now': 0, 'max': 0}
+
+        class OverlapTicker:
+            def history(self, start, end):
+                with lock:
+                    active['now'] += 1
+                    active['max'] = max(active['max'], active['now'])
+                time.sleep(0.1)
+                with lock:
+                    active['now'] -= 1
+                dates = pd.date_range(start=start, end=end, freq='D')
+                return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+        monkeypatch.setattr('yfinance.Ticker', lambda x: OverlapTicker())
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+
+        async def burst():
+            return await asyncio.gather(*(
+                async_client.post('/getReturnsAsync', {'from': '2023-04-01', 'to': '2023-06-30', 'brand': brand})
+                for brand in brands
+            ))
+
+        responses = async_to_sync(burst)()
+        assert all(response.status_code == 200 for response in responses)
+        assert active['max'] > 1
+
+    @allure.story("Rendimiento bajo Concurrencia")
+    @allure.title("La vista asíncrona atiende peticiones concurrentes con mucho más throughput que la síncrona")
+    @allure.description("Compara el throughput de 10 búsquedas con un proveedor lento: la vista síncrona en un worker las atiende en serie y la asíncrona las mantiene en curso a la vez.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.benchmark
+    @pytest.mark.django_db
+    def test_async_throughput_vs_sync(self, logged_in_client, slow_yfinance):
+        import asyncio
+        import time
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from financialSearch.tickers import TICKERS
+        brands = [symbol for symbol, _ in TICKERS[:10]]
+
+        started = time.perf_counter()
+        for brand in brands:
+            logged_in_client.post('/getReturns', {'from': '2023-01-01', 'to': '2023-03-31', 'brand': brand})
+        sync_throughput = len(brands) / (time.perf_counter() - started)
+
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+
+        async def burst():
+            return await asyncio.gather(*(
+                async_client.post('/getReturnsAsync', {'from': '2023-04-01', 'to': '2023-06-30', 'brand': brand})
+                for brand in brands
+            ))
+
+        started = time.perf_counter()
+        responses = async_to_sync(burst)()
+        async_throughput = len(brands) / (time.perf_counter() - started)
+
+        allure.attach(
+            f"sync: {sync_throughput:.1f} req/s\nasync: {async_throughput:.1f} req/s",
+            name="throughput", attachment_type=allure.attachment_type.TEXT)
+        assert all(response.status_code == 200 for response in responses)
+        assert async_throughput > 3 * sync_throughput
+
+
+# --------------- Indicadores Vectorizados ---------------
+
+@pytest.fixture
+def random_walk():
+    """Serie de precios de 500 días generada con una caminata aleatoria reproducible."""
+    rng = np.random.default_rng(42)
+    return 100 + np.cumsum(rng.normal(size=500))
+
+@allure.feature("Indicadores Vectorizados")
+class TestIndicators:
+
+    @allure.story("Equivalencia con pandas y NumPy")
+    @allure.title("SMA, EMA, volatilidad y pendientes coinciden con las implementaciones de referencia")
+    @allure.description("Compara cada serie del módulo de indicadores con pandas rolling/ewm, np.std y np.polyfit.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_matches_reference_implementations(self, random_walk):
+        from financialSearch import indicators
+        series = pd.Series(random_walk)
+        np.testing.assert_allclose(indicators.sma(random_walk, 5), series.rolling(5).mean(), equal_nan=True)
+        np.testing.assert_allclose(indicators.ema(random_walk, 5), series.ewm(span=5, adjust=False).mean())
+        np.testing.assert_allclose(indicators.rolling_std(random_walk, 20)[-1], np.std(random_walk[-20:]))
+        slopes = indicators.rolling_slope(random_walk, 10)
+        for end in (10, 250, 500):
+            assert slopes[end - 1] == pytest.approx(np.polyfit(range(10), random_walk[end - 10:end], 1)[0])
+        assert np.isnan(slopes[:9]).all()
+
+    @allure.story("RSI de Wilder")
+    @allure.title("El RSI de Wilder coincide con la recurrencia clásica")
+    @allure.description("Verifica el RSI suavizado de Wilder contra una implementación iterativa de referencia.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_wilder_rsi(self, random_walk):
+        from financialSearch import indicators
+        delta = np.diff(random_walk)
+        gain, loss = np.maximum(delta, 0), np.maximum(-delta, 0)
+        avg_gain, avg_loss = gain[:14].mean(), loss[:14].mean()
+        expected = [100 - 100 / (1 + avg_gain / avg_loss)]
+        for i in range(14, len(delta)):
+            avg_gain = (avg_gain * 13 + gain[i]) / 14
+            avg_loss = (avg_loss * 13 + loss[i]) / 14
+            expected.append(100 - 100 / (1 + avg_gain / avg_loss))
+        result = indicators.rsi(random_walk, 14)
+        assert np.isnan(result[:14]).all()
+        np.testing.assert_allclose(result[14:], expected)
+        assert indicators.rsi(np.arange(30.0), 14)[-1] == 100
+
+    @allure.story("Universo Completo")
+    @allure.title("Un array tickers x días produce lo mismo que cada ticker por separado")
+    @allure.description("Comprueba que todas las funciones acepten matrices 2-D y calculen cada fila de forma independiente.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_two_dimensional_input(self, random_walk):
+        from financialSearch import indicators
+        universe = np.vstack([random_walk, random_walk * 2, random_walk[::-1]])
+        for function in (indicators.sma, indicators.ema, indicators.rsi, indicators.rolling_std, indicators.rolling_slope):
+            result = function(universe)
+            assert result.shape == universe.shape
+            for row in range(universe.shape[0]):
+                np.testing.assert_allclose(result[row], function(universe[row]), equal_nan=True)
+
+
+# --------------- Indicadores Incrementales ---------------
+
+@allure.feature("Indicadores Incrementales")
+class TestIncrementalIndicators:
+
+    @allure.story("Equivalencia con el Cálculo Completo")
+    @allure.title("Avanzar barra a barra da los mismos indicadores que recalcular todo el histórico")
+    @allure.description("Verifica que SMA_5, EMA_5, RSI de Wilder y volatilidad incrementales coincidan con el motor vectorizado en cada barra.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_matches_full_recompute(self, random_walk):
+        from financialSearch import indicators
+        from financialSearch.incremental import IncrementalIndicators
+        state = IncrementalIndicators()
+        streamed = [state.update(close) for close in random_walk]
+        expected = {
+            'sma_5': indicators.sma(random_walk, 5),
+            'ema_5': indicators.ema(random_walk, 5),
+            'rsi_14': indicators.rsi(random_walk, 14),
+            'volatility_20': indicators.rolling_std(random_walk, 20),
+        }
+        for name, series in expected.items():
+            values = np.array([np.nan if bar[name] is None else bar[name] for bar in streamed])
+            np.testing.assert_allclose(values, series, rtol=1e-9, equal_nan=True)
+
+    @allure.story("Persistencia")
+    @allure.title("El estado serializado continúa exactamente donde se quedó")
+    @allure.description("Comprueba que to_dict/from_dict conserven el estado y que la siguiente barra produzca el mismo resultado.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_state_roundtrip(self, random_walk):
+        import json
+        from financialSearch.incremental import IncrementalIndicators
+        state = IncrementalIndicators()
+        for close in random_walk[:100]:
+            state.update(close)
+        restored = IncrementalIndicators.from_dict(json.loads(json.dumps(state.to_dict())))
+        assert restored.update(random_walk[100]) == state.update(random_walk[100])
+
+    @allure.story("Actualización Diaria")
+    @allure.title("refresh_states solo procesa las barras nuevas de cada ticker")
+    @allure.description("Asegura que la actualización guarde un estado por ticker y que, al llegar una barra nueva, avance solo esa barra.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_refresh_states(self, counting_yfinance):
+        from financialSearch import incremental, indicators, store
+        from financialSearch.models import IndicatorState, PriceBar
+        store.get_histories(['AAPL', 'MSFT'], date(2023, 1, 1), date(2023, 3, 31))
+        first = incremental.refresh_states(['AAPL', 'MSFT', 'KO'])
+        assert set(first) == {'AAPL', 'MSFT'}
+        assert IndicatorState.objects.get(ticker='AAPL').last_date == date(2023, 3, 31)
+
+        PriceBar.objects.create(ticker='AAPL', date=date(2023, 4, 1), close=50.0)
+        with patch.object(incremental.IncrementalIndicators, 'update', autospec=True,
+                          side_effect=incremental.IncrementalIndicators.update) as update:
+            second = incremental.refresh_states(['AAPL', 'MSFT'])
+        assert update.call_count == 1
+        closes = list(PriceBar.objects.filter(ticker='AAPL').values_list('close', flat=True))
+        assert second['AAPL']['ema_5'] == pytest.approx(indicators.ema(closes, 5)[-1])
+        assert second['MSFT'] == first['MSFT']
+
+    @allure.story("Relleno de Huecos Antiguos")
+    @allure.title("Guardar barras anteriores al estado lo descarta y refresh_states lo reconstruye")
+    @allure.description("Verifica que al rellenar un hueco previo a la última fecha del estado se elimine el estado guardado, que volver a guardar barras existentes no lo elimine y que los indicadores reconstruidos incluyan el hueco.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_backfill_invalidates_state(self, counting_yfinance):
+        from financialSearch import incremental, indicators, store
+        from financialSearch.models import IndicatorState, PriceBar
+        store.get_history('AAPL', date(2023, 2, 1), date(2023, 3, 31))
+        incremental.refresh_states(['AAPL'])
+        store.save_bars('AAPL', store.fetch_upstream('AAPL', date(2023, 3, 1), date(2023, 3, 31)), date(2023, 3, 1), date(2023, 3, 31))
+        assert IndicatorState.objects.filter(ticker='AAPL').exists()
+
+        store.get_history('AAPL', date(2023, 1, 1), date(2023, 3, 31))
+        assert not IndicatorState.objects.filter(ticker='AAPL').exists()
+        values = incremental.refresh_states(['AAPL'])['AAPL']
+        closes = list(PriceBar.objects.filter(ticker='AAPL').order_by('date').values_list('close', flat=True))
+        assert len(closes) == 90
+        assert values['ema_5'] == pytest.approx(indicators.ema(closes, 5)[-1])
+
+    @allure.story("Barra del Día")
+    @allure.title("refresh_states no guarda en el estado la barra provisional de hoy")
+    @allure.description("Comprueba que el estado persistido termine ayer, que los valores retornados incluyan el cierre de hoy y que, si ese cierre cambia, los valores sigan coincidiendo con el cálculo completo.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_today_bar_is_not_persisted(self):
+        from datetime import timedelta
+        from financialSearch import incremental, indicators
+        from financialSearch.models import IndicatorState, PriceBar
+        today = date.today()
+        PriceBar.objects.bulk_create([
+            PriceBar(ticker='AAPL', date=today - timedelta(days=days), close=100.0 + days % 7) for days in range(30, 0, -1)])
+        PriceBar.objects.create(ticker='AAPL', date=today, close=80.0)
+        closes = lambda: list(PriceBar.objects.filter(ticker='AAPL').values_list('close', flat=True))
+
+        values = incremental.refresh_states(['AAPL'])['AAPL']
+        assert IndicatorState.objects.get(ticker='AAPL').last_date == today - timedelta(days=1)
+        assert values['close'] == 80.0
+        assert values['ema_5'] == pytest.approx(indicators.ema(closes(), 5)[-1])
+
+        PriceBar.objects.filter(ticker='AAPL', date=today).update(close=120.0)
+        values = incremental.refresh_states(['AAPL'])['AAPL']
+        assert values['close'] == 120.0
+        assert values['ema_5'] == pytest.approx(indicators.ema(closes(), 5)[-1])
+        assert values['rsi_14'] == pytest.approx(indicators.rsi(closes(), 14)[-1])
+
+    @allure.story("Guardados Concurrentes")
+    @allure.title("save_bars concurrentes no fallan con 'database is locked'")
+    @allure.description("Lanza varios hilos que rellenan huecos a la vez sobre la base de pruebas en archivo y verifica que ningún guardado falle y que todas las barras queden guardadas.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_saves(self, settings):
+        import threading
+        from django.db import connection
+        from financialSearch import store
+        from financialSearch.models import PriceBar
+        settings.MARKET_DATA_PROVIDER = {'BACKEND': 'financialSearch.providers.SyntheticProvider', 'OPTIONS': {}}
+        tickers = ['AAPL', 'MSFT', 'TSLA', 'GOOGL']
+        start = threading.Barrier(len(tickers))
+        errors = []
+
+        def fill(ticker):
+            try:
+                start.wait()
+                for month in range(1, 7):
+                    store.get_history(ticker, date(2023, month, 1), date(2023, month, 28))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=fill, args=(ticker,)) for ticker in tickers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert PriceBar.objects.values('ticker').distinct().count() == len(tickers)
+
+
+# --------------- Formatos de Respuesta ---------------
+
+@allure.feature("Formatos de Respuesta")
+class TestResponseFormats:
+
+    @allure.story("Formato Columnar")
+    @allure.title("format=columnar devuelve arrays paralelos con fechas en epoch")
+    @allure.description("Verifica que el formato columnar contenga las mismas series que el formato por filas, con las fechas como enteros de segundos desde epoch.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_columnar_matches_rows(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        rows = logged_in_client.post('/getReturns', data).json()
+        columnar = logged_in_client.post('/getReturns', {**data, 'format': 'columnar'}).json()
+        assert columnar['analysis'] == rows['analysis']
+        assert columnar['data']['close'] == [item['close'] for item in rows['data']]
+        assert columnar['data']['sma_5'] == [item['sma_5'] for item in rows['data']]
+        assert columnar['data']['date'][0] == 1672531200  # 2023-01-01T00:00:00Z
+        assert [datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d') for ts in columnar['data']['date']] == [item['date'] for item in rows['data']]
+
+    @allure.story("Formato Binario")
+    @allure.title("Accept: application/x-msgpack devuelve el payload columnar en MessagePack")
+    @allure.description("Comprueba la negociación por cabecera Accept y que el binario decodificado coincida con el JSON columnar.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_msgpack_negotiation(self, logged_in_client, counting_yfinance):
+        pytest.importorskip('msgpack')
+        from financialSearch import formats
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        response = logged_in_client.post('/getReturns', data, HTTP_ACCEPT='application/x-msgpack')
+        assert response['Content-Type'] == 'application/x-msgpack'
+        columnar = logged_in_client.post('/getReturns', {**data, 'format': 'columnar'})
+        assert formats.decode(response) == columnar.json()
+        assert len(response.content) < len(columnar.content)
+
+    @allure.story("Formato Desconocido")
+    @allure.title("Un formato desconocido devuelve 400")
+    @allure.description("Asegura que la vista rechace formatos no soportados con un mensaje de error.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.django_db
+    def test_unknown_format(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL', 'format': 'xml'}
+        response = logged_in_client.post('/getReturns', data)
+        assert response.status_code == 400
+        assert response.json()['error'] == 'Formato no soportado.'
+
+
+# --------------- Reducción de Puntos ---------------
+
+@allure.feature("Reducción de Puntos")
+class TestDownsampling:
+
+    @allure.story("LTTB")
+    @allure.title("LTTB conserva los extremos y el pico de cada cubeta")
+    @allure.description("Verifica que la reducción devuelva el número pedido de índices crecientes, con el primer y el último punto, y que conserve un pico aislado.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_lttb_indices(self, random_walk):
+        from financialSearch.downsample import lttb_indices
+        series = random_walk.copy()
+        series[237] = series.max() + 50
+        keep = lttb_indices(series, 50)
+        assert len(keep) == 50
+        assert keep[0] == 0 and keep[-1] == len(series) - 1
+        assert np.all(np.diff(keep) > 0)
+        assert 237 in keep
+        assert lttb_indices(series[:40], 50).tolist() == list(range(40))
+
+    @allure.story("Parámetro max_points")
+    @allure.title("POST /getReturns con max_points reduce la serie sin cambiar el análisis")
+    @allure.description("Comprueba que la serie devuelta tenga max_points barras alineadas y que el análisis sea el de la resolución completa.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_returns_max_points(self, logged_in_client, counting_yfinance):
+        data = {'from': '2020-01-01', 'to': '2022-12-31', 'brand': 'AAPL'}
+        full = logged_in_client.post('/getReturns', data).json()
+        reduced = logged_in_client.post('/getReturns', {**data, 'max_points': 100}).json()
+        assert len(reduced['data']) == 100
+        assert reduced['analysis'] == full['analysis']
+        by_date = {item['date']: item for item in full['data']}
+        assert all(by_date[item['date']] == item for item in reduced['data'])
+
+    @allure.story("Parámetro Inválido")
+    @allure.title("max_points inválido devuelve 400")
+    @allure.description("Asegura que valores no numéricos o menores que 3 sean rechazados.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.parametrize("max_points", ['abc', '2', '-5'])
+    @pytest.mark.django_db
+    def test_invalid_max_points(self, logged_in_client, counting_yfinance, max_points):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL', 'max_points': max_points}
+        response = logged_in_client.post('/getReturns', data)
+        assert response.status_code == 400
+        assert response.json()['error'] == 'max_points debe ser un entero mayor o igual a 3.'
+
+
+# --------------- Series de Indicadores ---------------
+
+@allure.feature("Series de Indicadores")
+class TestIndicatorSeries:
+
+    @allure.story("Series por Defecto")
+    @allure.title("POST /getReturns incluye EMA, variación, RSI y volatilidad calculados en el servidor")
+    @allure.description("Verifica que cada barra traiga las series precalculadas y que coincidan con el motor de indicadores.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_default_series(self, logged_in_client, counting_yfinance):
+        from financialSearch import indicators
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        rows = logged_in_client.post('/getReturns', data).json()['data']
+        assert set(rows[0]) == {'date', 'close', 'sma_5', 'ema_5', 'diff', 'rsi_14', 'volatility_20'}
+        closes = np.array([row['close'] for row in rows])
+        assert rows[0]['diff'] is None
+        assert [row['diff'] for row in rows[1:]] == pytest.approx(np.diff(closes).tolist())
+        assert [row['ema_5'] for row in rows] == pytest.approx(indicators.ema(closes, 5).tolist())
+        assert rows[18]['volatility_20'] is None and rows[19]['volatility_20'] == pytest.approx(np.std(closes[:20]))
+
+    @allure.story("Selección de Campos")
+    @allure.title("fields= limita las series devueltas")
+    @allure.description("Comprueba que el selector de campos devuelva solo la fecha y las series pedidas, también en formato columnar.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_fields_selector(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL', 'fields': 'close,rsi_14'}
+        rows = logged_in_client.post('/getReturns', data).json()['data']
+        assert set(rows[0]) == {'date', 'close', 'rsi_14'}
+        columnar = logged_in_client.post('/getReturns', {**data, 'format': 'columnar'}).json()['data']
+        assert set(columnar) == {'date', 'close', 'rsi_14'}
+
+    @allure.story("Campo Desconocido")
+    @allure.title("fields con una serie inexistente devuelve 400")
+    @allure.description("Asegura que la vista informe los campos desconocidos y los disponibles.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.django_db
+    def test_unknown_field(self, logged_in_client, counting_yfinance):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL', 'fields': 'close,macd'}
+        response = logged_in_client.post('/getReturns', data)
+        assert response.status_code == 400
+        assert 'macd' in response.json()['error']
+
+
+# --------------- Precarga del Universo ---------------
+
+@allure.feature("Precarga del Universo")
+class TestWarmCacheCommand:
+
+    @allure.story("Comando warm_cache")
+    @allure.title("manage.py warm_cache precarga el universo y reporta tiempos por ticker")
+    @allure.description("Verifica que el comando descargue el histórico de cada ticker del desplegable, cree su estado incremental e imprima una fila de tiempos por ticker.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_warm_cache_default_universe(self, counting_yfinance):
+        from io import StringIO
+        from django.core.management import call_command
+        from financialSearch.models import IndicatorState
+        from financialSearch.tickers import TICKERS
+        out = StringIO()
+        call_command('warm_cache', '--days', '90', stdout=out)
+        output = out.getvalue()
+        assert len(counting_yfinance) == len(TICKERS)
+        assert all(symbol in output for symbol, _ in TICKERS)
+        assert f"{len(TICKERS)}/{len(TICKERS)} tickers precargados" in output
+        assert IndicatorState.objects.count() == len(TICKERS)
+
+    @allure.story("Primera Búsqueda tras la Precarga")
+    @allure.title("Tras la precarga, la primera búsqueda no descarga nada")
+    @allure.description("Comprueba que una búsqueda interactiva dentro del rango precargado se sirva del almacén local sin llamar a yfinance.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_first_search_after_warm_up_is_local(self, logged_in_client, counting_yfinance):
+        from io import StringIO
+        from datetime import timedelta
+        from django.core.management import call_command
+        call_command('warm_cache', 'AAPL', 'MSFT', '--days', '90', stdout=StringIO())
+        calls = len(counting_yfinance)
+        yesterday = date.today() - timedelta(days=1)
+        data = {'from': (yesterday - timedelta(days=60)).isoformat(), 'to': yesterday.isoformat(), 'brand': 'MSFT'}
+        response = logged_in_client.post('/getReturns', data)
+        assert response.status_code == 200
+        assert len(counting_yfinance) == calls
+
+
+# --------------- Métricas de Rendimiento ---------------
+
+@pytest.fixture
+def clear_metrics():
+    """Reinicia el registro de métricas del proceso."""
+    from financialSearch.metrics import registry
+    registry.reset()
+    yield registry
+    registry.reset()
+
+@allure.feature("Métricas de Rendimiento")
+class TestMetrics:
+
+    @allure.story("Cabecera Server-Timing")
+    @allure.title("POST /getReturns devuelve la duración de cada etapa en Server-Timing")
+    @allure.description("Verifica que la respuesta incluya las etapas de descarga, SMA, análisis, informe, serialización y total.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_server_timing_header(self, logged_in_client, counting_yfinance, clear_analysis_cache, clear_metrics):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        response = logged_in_client.post('/getReturns', data)
+        stages = {entry.split(';')[0] for entry in response['Server-Timing'].split(', ')}
+        assert {'fetch', 'upstream', 'sma', 'analysis', 'render', 'serialize', 'total'} <= stages
+        assert all(';dur=' in entry for entry in response['Server-Timing'].split(', '))
+
+    @allure.story("Endpoint de Métricas")
+    @allure.title("GET /metrics expone cuantiles por etapa y la proporción de aciertos de las cachés")
+    @allure.description("Comprueba que tras dos búsquedas idénticas /metrics publique p50/p95/p99 por etapa y una proporción de aciertos de 0.5 para el almacén y la caché de análisis.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_metrics_endpoint(self, logged_in_client, counting_yfinance, clear_analysis_cache, clear_metrics):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        logged_in_client.post('/getReturns', data)
+        logged_in_client.post('/getReturns', data)
+        response = Client().get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        for quantile in ('0.5', '0.95', '0.99'):
+            assert f'financialsearch_stage_duration_seconds{{stage="fetch",quantile="{quantile}"}}' in body
+        assert 'financialsearch_stage_duration_seconds_count{stage="total"} 2' in body
+        assert 'financialsearch_cache_hit_ratio{cache="analysis"} 0.5' in body
+        assert 'financialsearch_cache_hit_ratio{cache="store"} 0.5' in body
+
+    @allure.story("Concurrencia")
+    @allure.title("Las duraciones medidas desde varios hilos no se pierden")
+    @allure.description("Mide la misma etapa desde ocho hilos que comparten las duraciones de una petición y verifica el conteo del registro y el acumulado de la petición.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_concurrent_observations(self, clear_metrics):
+        import contextvars
+        from concurrent.futures import ThreadPoolExecutor
+        from financialSearch import metrics
+
+        def measure(_):
+            for _ in range(500):
+                with metrics.timed('upstream'):
+                    pass
+
+        with metrics.request_timings() as timings:
+            context = contextvars.copy_context()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda i: context.copy().run(measure, i), range(8)))
+        assert 'financialsearch_stage_duration_seconds_count{stage="upstream"} 4000' in clear_metrics.export()
+        assert timings['upstream'] == pytest.approx(clear_metrics._sum['upstream'])
+
+    @allure.story("Vista Asíncrona")
+    @allure.title("POST /getReturnsAsync también devuelve Server-Timing")
+    @allure.description("Asegura que las etapas ejecutadas en los pools de la vista asíncrona se reporten en la cabecera.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.django_db
+    def test_async_server_timing(self, logged_in_client, counting_yfinance, clear_analysis_cache, clear_metrics):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        async_client = AsyncClient()
+        async_client.cookies = logged_in_client.cookies
+        response = async_to_sync(async_client.post)('/getReturnsAsync', {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'})
+        stages = {entry.split(';')[0] for entry in response['Server-Timing'].split(', ')}
+        assert {'fetch', 'upstream', 'analysis', 'render', 'serialize', 'total'} <= stages
+
+
+# --------------- Análisis Estructurado ---------------
+
+@allure.feature("Análisis Estructurado")
+class TestStructuredAnalysis:
+
+    @allure.story("Resultado Estructurado")
+    @allure.title("compute_analysis devuelve los indicadores y la recomendación como números")
+    @allure.description("Verifica que el resultado estructurado tenga el período, las pendientes, los indicadores y la recomendación, y que analyze_data genere el informe a partir de él.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_compute_analysis(self, uptrend_data):
+        result = compute_analysis(uptrend_data['sma_5'], uptrend_data['dates'], uptrend_data['close_prices'])
+        assert (result['start'], result['end']) == (uptrend_data['dates'][0], uptrend_data['dates'][-1])
+        assert result['days'] == len(uptrend_data['dates'])
+        assert result['short_term_trend'] > 0 and result['long_term_trend'] > 0
+        assert isinstance(result['rsi_14'], float) and isinstance(result['volatility_20'], float)
+        assert result['recommendation'] in ('comprar', 'vender', 'mantener')
+        assert render_analysis(result) == analyze_data(
+            uptrend_data['sma_5'], uptrend_data['dates'], uptrend_data['close_prices'])
+
+    @allure.story("Resultado Estructurado")
+    @allure.title("compute_analysis con datos insuficientes devuelve un error")
+    @allure.description("Comprueba que con menos de 20 días el resultado estructurado sea {'error': mensaje} y el informe sea el mismo mensaje.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_compute_analysis_insufficient_data(self):
+        result = compute_analysis([100.0] * 10, [f"2023-01-{i + 1:02d}" for i in range(10)], [100.0] * 10)
+        assert set(result) == {'error'}
+        assert render_analysis(result) == result['error']
+
+    @allure.story("Parámetro analysis")
+    @allure.title("POST /getReturns con analysis=structured o both devuelve el diccionario")
+    @allure.description("Verifica los tres modos: html (por defecto), structured (diccionario en 'analysis') y both (informe en 'analysis' y diccionario en 'analysis_data').")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_analysis_modes(self, logged_in_client, counting_yfinance, clear_analysis_cache):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        html = logged_in_client.post('/getReturns', data).json()
+        structured = logged_in_client.post('/getReturns', {**data, 'analysis': 'structured'}).json()
+        both = logged_in_client.post('/getReturns', {**data, 'analysis': 'both'}).json()
+        assert html['analysis'].startswith('<h3>') and 'analysis_data' not in html
+        assert structured['analysis']['recommendation'] in ('comprar', 'vender', 'mantener')
+        assert 'analysis_data' not in structured
+        assert both['analysis'] == html['analysis'] and both['analysis_data'] == structured['analysis']
+
+    @allure.story("Parámetro analysis")
+    @allure.title("Un modo de análisis desconocido devuelve 400")
+    @allure.description("Asegura que analysis=pdf se rechace con un error en español.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.django_db
+    def test_invalid_analysis_mode(self, logged_in_client, counting_yfinance):
+        response = logged_in_client.post('/getReturns', {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL', 'analysis': 'pdf'})
+        assert response.status_code == 400
+        assert 'Modo de análisis no soportado' in response.json()['error']
+
+
+# --------------- Respuestas Cacheables ---------------
+
+@allure.feature("Respuestas Cacheables")
+class TestCachedReturns:
+
+    @allure.story("URL Canónica")
+    @allure.title("GET /returns/<ticker> redirige las consultas no canónicas")
+    @allure.description("Verifica que parámetros desordenados o con valores por defecto se redirijan con 301 a la URL canónica.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_redirects_to_canonical_query(self, logged_in_client, counting_yfinance):
+        response = logged_in_client.get('/returns/AAPL?to=2023-02-28&analysis=html&from=2023-1-1&fields=sma_5,close,sma_5')
+        assert response.status_code == 301
+        assert response['Location'] == '/returns/AAPL?fields=sma_5,close&from=2023-01-01&to=2023-02-28'
+        assert counting_yfinance == []
+
+    @allure.story("Rango Cerrado")
+    @allure.title("Un rango histórico se sirve con ETag fuerte, Last-Modified y caché de larga duración")
+    @allure.description("Comprueba las cabeceras de caché de un rango cerrado y que If-None-Match e If-Modified-Since se respondan con 304 sin cuerpo.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_closed_range_is_cacheable(self, logged_in_client, counting_yfinance, clear_analysis_cache):
+        url = '/returns/AAPL?from=2023-01-01&to=2023-02-28'
+        response = logged_in_client.get(url)
+        assert response.status_code == 200
+        assert response.json()['data'][-1]['date'] == '2023-02-28'
+        etag = response['ETag']
+        assert etag.startswith('"') and not etag.startswith('W/')
+        assert response['Last-Modified'] == 'Wed, 01 Mar 2023 00:00:00 GMT'
+        cache_control = {directive.strip() for directive in response['Cache-Control'].split(',')}
+        assert {'public', 'max-age=31536000', 'immutable'} <= cache_control
+
+        not_modified = logged_in_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert not_modified.status_code == 304
+        assert not_modified.content == b''
+        assert not_modified['ETag'] == etag
+        assert logged_in_client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+        assert logged_in_client.get(url, HTTP_IF_NONE_MATCH='"otro"').status_code == 200
+        assert len(counting_yfinance) == 1
+
+    @allure.story("Rango Abierto")
+    @allure.title("Un rango que incluye hoy se cachea poco tiempo")
+    @allure.description("Asegura que si el rango llega hasta hoy la respuesta use RETURNS_OPEN_MAX_AGE y no se marque como inmutable.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_open_range_has_short_lifetime(self, logged_in_client, counting_yfinance, settings):
+        settings.RETURNS_OPEN_MAX_AGE = 30
+        today = date.today()
+        response = logged_in_client.get(f'/returns/AAPL?from={date(today.year - 1, 1, 1).isoformat()}&to={today.isoformat()}')
+        assert response.status_code == 200
+        cache_control = {directive.strip() for directive in response['Cache-Control'].split(',')}
+        assert 'max-age=30' in cache_control and 'immutable' not in cache_control
+
+    @allure.story("Validación")
+    @allure.title("GET /returns/<ticker> valida los parámetros y el método")
+    @allure.description("Verifica los errores 400 por fechas faltantes o inválidas y 405 para POST.")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.django_db
+    def test_validation(self, logged_in_client, counting_yfinance):
+        assert logged_in_client.get('/returns/AAPL?from=2023-01-01').json() == {'error': 'Faltan campos requeridos.'}
+        response = logged_in_client.get('/returns/AAPL?from=ayer&to=2023-02-28')
+        assert response.status_code == 400 and response.json() == {'error': 'Formato de fecha inválido.'}
+        assert logged_in_client.post('/returns/AAPL?from=2023-01-01&to=2023-02-28').status_code == 405
+
+
+# --------------- Análisis de Canastas ---------------
+
+@pytest.fixture
+def clear_portfolio_cache():
+    """Vacía la caché de matrices alineadas antes y después de cada prueba."""
+    from financialSearch.cache import portfolio_cache
+    portfolio_cache.clear()
+    yield portfolio_cache
+    portfolio_cache.clear()
+
+@pytest.fixture
+def basket_closes():
+    """Cierres sintéticos de tres tickers con un día faltante en uno de ellos."""
+    rng = np.random.default_rng(7)
+    index = pd.date_range('2023-01-01', periods=60)
+    closes = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, (60, 3)), axis=0)), index=index, columns=['AAA', 'BBB', 'CCC'])
+    closes.iloc[10, 1] = np.nan
+    return closes
+
+@allure.feature("Análisis de Canastas")
+class TestPortfolio:
+
+    @allure.story("Matriz Alineada")
+    @allure.title("align_returns conserva solo las fechas comunes y separa los tickers sin datos")
+    @allure.description("Verifica que la matriz de rendimientos descarte los días incompletos y coincida con pct_change de pandas.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_align_returns(self, basket_closes):
+        from financialSearch import portfolio
+        basket_closes['DDD'] = np.nan
+        dates, tickers, returns, missing = portfolio.align_returns(basket_closes)
+        expected = basket_closes[['AAA', 'BBB', 'CCC']].dropna().pct_change().dropna()
+        assert tickers == ['AAA', 'BBB', 'CCC'] and missing == ['DDD']
+        assert list(dates) == list(expected.index)
+        assert np.allclose(returns, expected.to_numpy())
+
+    @allure.story("Estadísticas de la Canasta")
+    @allure.title("Covarianza, correlación, betas móviles y volatilidad coinciden con pandas")
+    @allure.description("Compara los cálculos vectorizados con cov, corr y rolling de pandas y con la desviación estándar de la cartera.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_statistics_match_pandas(self, basket_closes):
+        from financialSearch import portfolio
+        dates, tickers, returns, _ = portfolio.align_returns(basket_closes)
+        frame = pd.DataFrame(returns, columns=tickers)
+        weights = np.array([0.5, 0.3, 0.2])
+        result = portfolio.analyze(dates, returns, weights, window=10)
+        market = frame @ weights
+        betas = frame.rolling(10).cov(market).div(market.rolling(10).var(), axis=0).dropna()
+        assert np.allclose(result['covariance'], frame.cov().to_numpy())
+        assert np.allclose(result['correlation'], frame.corr().to_numpy())
+        assert np.allclose(result['rolling_beta']['values'], betas.to_numpy())
+        assert len(result['rolling_beta']['dates']) == len(betas)
+        assert result['volatility']['daily'] == pytest.approx(market.std())
+
+    @allure.story("Endpoint de Canastas")
+    @allure.title("POST /getPortfolio devuelve las matrices y reutiliza la matriz alineada")
+    @allure.description("Asegura que la respuesta tenga matrices N x N y que repetir la consulta no vuelva a leer el almacén ni a llamar a yfinance.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_portfolio(self, logged_in_client, counting_yfinance, clear_portfolio_cache):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brands': 'AAPL,MSFT,GOOGL', 'weights': '2,1,1', 'window': '5'}
+        response = logged_in_client.post('/getPortfolio', data)
+        assert response.status_code == 200
+        body = response.json()
+        assert body['tickers'] == ['AAPL', 'MSFT', 'GOOGL'] and body['missing'] == []
+        assert body['weights'] == [0.5, 0.25, 0.25]
+        assert len(body['correlation']) == len(body['covariance'][0]) == 3
+        assert body['rolling_beta']['benchmark'] == 'portfolio'
+        assert len(body['rolling_beta']['values']) == body['observations'] - 4
+        assert body['volatility']['annualized'] >= 0
+        assert len(counting_yfinance) == 3
+
+        with patch('financialSearch.store.load_closes') as load_closes:
+            assert logged_in_client.post('/getPortfolio', data).json() == body
+        load_closes.assert_not_called()
+        assert clear_portfolio_cache.hits == 1
+
+    @allure.story("Endpoint de Canastas")
+    @allure.title("POST /getPortfolio valida pesos y benchmark")
+    @allure.description("Comprueba el 400 por número de pesos incorrecto o pesos no finitos y que un benchmark externo se use para las betas sin entrar en la cartera.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_get_portfolio_weights_and_benchmark(self, logged_in_client, counting_yfinance, clear_portfolio_cache):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brands': 'AAPL,MSFT'}
+        response = logged_in_client.post('/getPortfolio', {**data, 'weights': '1'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Debe indicar un peso por ticker.'}
+        for weights in ('nan,1', 'inf,1', '1,-inf'):
+            response = logged_in_client.post('/getPortfolio', {**data, 'weights': weights})
+            assert response.status_code == 400
+            assert response.json() == {'error': 'Los pesos deben ser números y la ventana un entero mayor o igual a 2.'}
+
+        body = logged_in_client.post('/getPortfolio', {**data, 'benchmark': 'SPY'}).json()
+        assert body['tickers'] == ['AAPL', 'MSFT']
+        assert body['rolling_beta']['benchmark'] == 'SPY'
+        assert logged_in_client.get('/getPortfolio').status_code == 405
+
+    @allure.story("Validación de Parámetros")
+    @allure.title("POST /getPortfolio responde 400 ante fechas faltantes o mal formadas")
+    @allure.description("Verifica que la falta de 'from'/'to' y una fecha inválida devuelvan 400 con el mensaje correspondiente en lugar de un error del servidor.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_get_portfolio_validates_dates(self, logged_in_client, counting_yfinance, clear_portfolio_cache):
+        response = logged_in_client.post('/getPortfolio', {'from': '2023-01-01', 'brands': 'AAPL,MSFT'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Faltan campos requeridos.'}
+        response = logged_in_client.post('/getPortfolio', {'from': '01/01/2023', 'to': '2023-02-28', 'brands': 'AAPL,MSFT'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Formato de fecha inválido.'}
+        assert counting_yfinance == []
+
+
+# --------------- Backtest ---------------
+
+@allure.feature("Backtest")
+class TestBacktest:
+
+    @allure.story("Señales")
+    @allure.title("La señal de cada barra coincide con la recomendación de compute_analysis")
+    @allure.description("Verifica que la regla vectorizada dé, en cada día, la misma recomendación que el análisis calculado con el histórico hasta ese día.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_signals_match_analysis(self):
+        from financialSearch import backtest, indicators
+        rng = np.random.default_rng(11)
+        close = np.abs(100 + np.cumsum(rng.normal(0, 2, 80))) + 1
+        dates = pd.date_range('2023-01-01', periods=80).strftime('%Y-%m-%d').tolist()
+        codes = {'comprar': backtest.BUY, 'vender': backtest.SELL, 'mantener': backtest.HOLD}
+        signal = backtest.signals(close)
+        for t in range(len(close)):
+            # Igual que build_returns: arrays de NumPy con la SMA_5 y sus NaN iniciales
+            prefix = close[:t + 1]
+            result = compute_analysis(indicators.sma(prefix, 5), dates[:t + 1], prefix)
+            assert signal[t] == codes.get(result.get('recommendation'), backtest.HOLD)
+
+    @allure.story("Simulación")
+    @allure.title("Las posiciones se mantienen hasta la siguiente señal y se mide el drawdown")
+    @allure.description("Comprueba el arrastre de la última señal (largo/fuera o largo/corto) y el cálculo del drawdown máximo.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_positions_and_drawdown(self):
+        from financialSearch import backtest
+        signal = np.array([0, 1, 0, 0, -1, 0, 1])
+        assert backtest.positions(signal).tolist() == [0, 1, 1, 1, 0, 0, 1]
+        assert backtest.positions(signal, allow_short=True).tolist() == [0, 1, 1, 1, -1, -1, 1]
+        assert backtest.max_drawdown(np.array([1.0, 1.2, 0.9, 1.3, 1.04])) == pytest.approx(-0.25)
+
+    @allure.story("Pool de Procesos")
+    @allure.title("run_many en un pool de procesos da el mismo resultado que en serie")
+    @allure.description("Asegura que repartir los tickers entre procesos no cambie las métricas de ninguno y que las peticiones reutilicen el mismo pool.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_run_many_process_pool(self):
+        from financialSearch import backtest
+        rng = np.random.default_rng(5)
+        closes = {f'T{i}': np.abs(100 + np.cumsum(rng.normal(0, 1, 300))) + 1 for i in range(6)}
+        serial = backtest.run_many(closes, max_workers=1)
+        assert backtest.run_many(closes, max_workers=2, min_tickers=1) == serial
+        assert backtest.run_many(closes, max_workers=2) == serial
+        for result in serial.values():
+            assert result['max_drawdown'] <= 0 and 0 <= result['exposure'] <= 1
+            assert result['hit_rate'] is None or 0 <= result['hit_rate'] <= 1
+
+        from financialSearch import pools
+        assert pools.get_pool(2) is pools.get_pool(2)
+
+    @allure.story("Endpoint de Backtest")
+    @allure.title("POST /getBacktest devuelve las métricas por ticker")
+    @allure.description("Verifica la respuesta con rendimiento, drawdown y tasa de acierto, y el 400 por un costo inválido.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_backtest(self, logged_in_client, counting_yfinance, settings):
+        settings.BACKTEST_MAX_WORKERS = 1
+        data = {'from': '2023-01-01', 'to': '2023-06-30', 'brands': 'AAPL,MSFT'}
+        response = logged_in_client.post('/getBacktest', data)
+        assert response.status_code == 200
+        body = response.json()
+        assert list(body['results']) == ['AAPL', 'MSFT'] and body['errors'] == {}
+        assert {'total_return', 'buy_and_hold_return', 'max_drawdown', 'hit_rate', 'trades'} <= set(body['results']['AAPL'])
+        assert body['results']['AAPL']['bars'] == 181
+        response = logged_in_client.post('/getBacktest', {**data, 'cost': 'alto'})
+        assert response.status_code == 400
+
+    @allure.story("Validación de Parámetros")
+    @allure.title("POST /getBacktest responde 400 ante fechas faltantes o mal formadas")
+    @allure.description("Verifica que la falta de 'from'/'to' y una fecha inválida devuelvan 400 con el mensaje correspondiente en lugar de un error del servidor.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_get_backtest_validates_dates(self, logged_in_client, counting_yfinance):
+        response = logged_in_client.post('/getBacktest', {'brands': 'AAPL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Faltan campos requeridos.'}
+        response = logged_in_client.post('/getBacktest', {'from': '2023-01-01', 'to': 'ayer', 'brands': 'AAPL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Formato de fecha inválido.'}
+        assert counting_yfinance == []
+
+
+# --------------- Screener ---------------
+
+@pytest.fixture
+def stored_universe(db):
+    """Almacén con cuatro tickers: dos alcistas, uno bajista y uno con histórico insuficiente."""
+    from financialSearch.models import PriceBar
+    rng = np.random.default_rng(3)
+    days = pd.date_range('2023-01-01', periods=90)
+    paths = {
+        'UP1': 100 + np.arange(90) * 0.5 + rng.normal(0, 1, 90),
+        'UP2': 50 + np.arange(90) * 0.3 + rng.normal(0, 1, 90),
+        'DOWN': 200 - np.arange(90) * 0.8 + rng.normal(0, 1, 90),
+        'NEW': 10 + rng.normal(0, 1, 90),
+    }
+    PriceBar.objects.bulk_create([
+        PriceBar(ticker=ticker, date=day.date(), close=float(close))
+        for ticker, closes in paths.items()
+        for day, close in list(zip(days, closes))[-10 if ticker == 'NEW' else 0:]
+    ])
+    return paths
+
+@allure.feature("Screener")
+class TestScreener:
+
+    @allure.story("Indicadores del Universo")
+    @allure.title("Cada fila del screener coincide con compute_analysis")
+    @allure.description("Verifica que los indicadores y la recomendación del screener sean los del análisis del mismo histórico, y que se omitan los tickers sin datos suficientes.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_rows_match_analysis(self, stored_universe):
+        from financialSearch import indicators, screener, store
+        closes = store.load_closes(None, date(2023, 1, 1), date(2023, 3, 31))
+        assert list(closes.columns) == ['DOWN', 'NEW', 'UP1', 'UP2']
+        rows = {row['ticker']: row for row in screener.screen(closes, max_workers=1)}
+        assert set(rows) == {'DOWN', 'UP1', 'UP2'}
+        fields = ('sma_5', 'ema_5', 'rsi_14', 'volatility_20', 'short_term_trend', 'long_term_trend')
+        for ticker, row in rows.items():
+            # Igual que build_returns: arrays de NumPy con la SMA_5 y sus NaN iniciales
+            close = closes[ticker].dropna().to_numpy()
+            expected = compute_analysis(indicators.sma(close, 5), closes.index.strftime('%Y-%m-%d').tolist(), close)
+            assert row['recommendation'] == expected['recommendation'] and row['days'] == expected['days']
+            for field in fields:
+                assert row[field] == pytest.approx(expected[field])
+
+        # Históricos cortos (20 a 40 barras), donde las ventanas de 20 días abarcan casi toda la serie
+        rng = np.random.default_rng(5)
+        dates = pd.date_range('2023-01-01', periods=40).strftime('%Y-%m-%d').tolist()
+        for days in range(20, 41):
+            close = np.abs(100 + np.cumsum(rng.normal(0, 2, (8, days)), axis=1)) + 1
+            result = screener.evaluate(close)
+            for i, series in enumerate(close):
+                expected = compute_analysis(indicators.sma(series, 5), dates[:days], series)
+                assert result['recommendation'][i] == expected['recommendation']
+                for field in fields:
+                    assert result[field][i] == pytest.approx(expected[field])
+
+    @allure.story("Pool de Procesos")
+    @allure.title("El screener en un pool de procesos da las mismas filas que en serie")
+    @allure.description("Asegura que repartir los grupos de tickers entre procesos no cambie el resultado.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_process_pool(self):
+        from financialSearch import screener
+        rng = np.random.default_rng(9)
+        closes = pd.DataFrame(
+            100 + np.cumsum(rng.normal(0, 1, (80, 12)), axis=0),
+            index=pd.date_range('2023-01-01', periods=80), columns=[f'T{i}' for i in range(12)])
+        closes.iloc[:5, 3] = np.nan
+        serial = sorted(screener.screen(closes, max_workers=1), key=lambda row: row['ticker'])
+        parallel = sorted(screener.screen(closes, max_workers=2, min_tickers=1), key=lambda row: row['ticker'])
+        assert serial == parallel and len(serial) == 12
+
+    @allure.story("Endpoint del Screener")
+    @allure.title("POST /getScreener filtra y ordena el universo guardado")
+    @allure.description("Comprueba los filtros por recomendación y límites min_/max_, el orden descendente y que no se llame a yfinance.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_screener(self, logged_in_client, stored_universe, counting_yfinance, settings):
+        settings.SCREENER_MAX_WORKERS = 1
+        response = logged_in_client.post('/getScreener', {'to': '2023-03-31', 'sort': '-short_term_trend'})
+        assert response.status_code == 200
+        body = response.json()
+        assert (body['universe'], body['screened'], body['matched']) == (4, 3, 3)
+        trends = [row['short_term_trend'] for row in body['results']]
+        assert trends == sorted(trends, reverse=True)
+
+        body = logged_in_client.post('/getScreener', {'to': '2023-03-31', 'max_long_term_trend': '0'}).json()
+        assert [row['ticker'] for row in body['results']] == ['DOWN']
+        body = logged_in_client.post('/getScreener', {'to': '2023-03-31', 'brands': 'UP1,UP2', 'limit': '1'}).json()
+        assert body['universe'] == 2 and [row['ticker'] for row in body['results']] == ['UP1']
+        assert counting_yfinance == []
+
+        assert logged_in_client.post('/getScreener', {'sort': 'precio'}).status_code == 400
+        assert logged_in_client.post('/getScreener', {'min_rsi_14': 'bajo'}).status_code == 400
+
+
+# --------------- Archivos de Precios ---------------
+
+@allure.feature("Archivos de Precios")
+class TestPriceFiles:
+
+    @allure.story("Formato Columnar")
+    @allure.title("Un archivo de precios se lee con memmap y los rangos son vistas sin copia")
+    @allure.description("Verifica la ida y vuelta de las columnas, que un rango de fechas comparta memoria con el archivo y que reescribir el archivo lo reemplace.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_round_trip_and_zero_copy(self, price_files_dir):
+        from financialSearch import pricefiles
+        index = pd.date_range('2023-01-02', periods=7, freq='B')
+        frame = pd.DataFrame({
+            'Open': np.arange(7.0), 'High': np.arange(7.0) + 2, 'Low': np.arange(7.0) - 1,
+            'Close': np.arange(7.0) + 1, 'Volume': [np.nan] * 7,
+        }, index=index)
+        pricefiles.write('AAPL', pricefiles.PriceColumns.from_frame(frame))
+        columns = pricefiles.read('AAPL')
+        assert isinstance(columns.close.base, np.memmap)
+        pd.testing.assert_frame_equal(columns.to_frame(), frame, check_names=False, check_freq=False, check_index_type=False)
+
+        window = columns.between(date(2023, 1, 4), date(2023, 1, 9))
+        assert window.index.strftime('%Y-%m-%d').tolist() == ['2023-01-04', '2023-01-05', '2023-01-06', '2023-01-09']
+        assert np.shares_memory(window['Close'], columns.close)
+        assert pricefiles.read('AAPL') is columns
+        assert pricefiles.read('MSFT') is None
+
+        pricefiles.write('AAPL', pricefiles.PriceColumns.from_frame(frame.iloc[:2]))
+        assert len(pricefiles.read('AAPL')) == 2
+        assert sorted(path.name for path in price_files_dir.iterdir()) == ['AAPL.prices']
+
+    @allure.story("Almacén con Archivos")
+    @allure.title("getReturns sirve el histórico desde el archivo de precios")
+    @allure.description("Asegura que save_bars genere el archivo y que la segunda consulta lea el rango del archivo sin consultar las barras en la base de datos.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_get_returns_reads_price_file(self, logged_in_client, counting_yfinance, clear_analysis_cache, price_files_dir):
+        data = {'from': '2023-01-01', 'to': '2023-02-28', 'brand': 'AAPL'}
+        first = logged_in_client.post('/getReturns', data)
+        assert (price_files_dir / 'AAPL.prices').exists()
+        with patch('financialSearch.store.load_bars') as load_bars:
+            second = logged_in_client.post('/getReturns', {**data, 'from': '2023-01-15'})
+        load_bars.assert_not_called()
+        expected = [(row['date'], row['close']) for row in first.json()['data'] if row['date'] >= '2023-01-15']
+        assert [(row['date'], row['close']) for row in second.json()['data']] == expected
+
+    @allure.story("Comando build_price_files")
+    @allure.title("build_price_files genera los archivos del histórico ya guardado")
+    @allure.description("Comprueba que el comando cree un archivo por ticker con las mismas barras que el almacén.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_build_price_files_command(self, stored_universe, price_files_dir):
+        from io import StringIO
+        from django.core.management import call_command
+        from financialSearch import pricefiles, store
+        output = StringIO()
+        call_command('build_price_files', stdout=output)
+        assert '4 archivos de precios generados' in output.getvalue()
+        columns = pricefiles.read('UP1')
+        expected = store.load_bars('UP1', date(2023, 1, 1), date(2023, 3, 31))
+        assert np.array_equal(columns.close, expected['Close'].to_numpy())
+
+    @allure.story("Escrituras Concurrentes")
+    @allure.title("Dos save_bars concurrentes no dejan en disco un archivo con barras perdidas")
+    @allure.description("Intercala dos guardados del mismo ticker de modo que el primero lea la tabla antes de que el segundo guarde, y comprueba que el archivo final y load_columns tengan todas las barras; un archivo desfasado se ignora en favor de la base de datos.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_saves_keep_all_bars(self, price_files_dir):
+        import threading
+        from financialSearch import pricefiles, store
+
+        def bars(first, last):
+            days = pd.bdate_range(first, last)
+            return pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': np.arange(1.0, len(days) + 1), 'Volume': 10.0},
+                                index=pd.DatetimeIndex(days, name='Date'))
+
+        january, february = bars('2023-01-02', '2023-01-31'), bars('2023-02-01', '2023-02-28')
+        first_read, second_saved = threading.Event(), threading.Event()
+        original = store.load_bars
+
+        def stale_load_bars(*args):
+            # El primer guardado lee su copia y se detiene hasta que el segundo haya terminado
+            stock_data = original(*args)
+            if not first_read.is_set():
+                first_read.set()
+                second_saved.wait(timeout=1)
+            return stock_data
+
+        def second():
+            first_read.wait(timeout=5)
+            store.save_bars('RACE', february, date(2023, 2, 1), date(2023, 2, 28))
+            second_saved.set()
+
+        with patch('financialSearch.store.load_bars', side_effect=stale_load_bars):
+            threads = [
+                threading.Thread(target=store.save_bars, args=('RACE', january, date(2023, 1, 1), date(2023, 1, 31))),
+                threading.Thread(target=second),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        expected = len(january) + len(february)
+        assert len(pricefiles.read('RACE')) == expected
+        assert len(store.load_columns('RACE', date(2023, 1, 1), date(2023, 2, 28))) == expected
+
+        pricefiles.write('RACE', pricefiles.PriceColumns.from_frame(january))
+        columns = store.load_columns('RACE', date(2023, 1, 15), date(2023, 2, 28))
+        assert len(columns) == len(store.load_bars('RACE', date(2023, 1, 15), date(2023, 2, 28)))
+
+    @allure.story("Validación de Tickers")
+    @allure.title("Los tickers con formato inválido se rechazan antes de llegar al almacén y a los archivos")
+    @allure.description("Verifica que un ticker con separadores de ruta responda 400 en las vistas sin guardar barras ni crear archivos fuera de la carpeta, y que path_for no salga de PRICE_FILES_DIR.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_invalid_tickers_rejected(self, logged_in_client, price_files_dir, settings):
+        from financialSearch import pricefiles
+        from financialSearch.models import PriceBar
+        settings.MARKET_DATA_PROVIDER = {'BACKEND': 'financialSearch.providers.SyntheticProvider', 'OPTIONS': {}}
+        dates = {'from': '2023-01-01', 'to': '2023-02-28'}
+        for brand in ('../escaped', 'AAPL/X', 'AA$PL'):
+            response = logged_in_client.post('/getReturns', {**dates, 'brand': brand})
+            assert response.status_code == 400
+            assert response.json() == {'error': 'Ticker inválido.'}
+        assert logged_in_client.post('/getBatchReturns', {**dates, 'brands': 'AAPL,../x'}).status_code == 400
+        assert logged_in_client.get('/export', {**dates, 'brands': '../x'}).status_code == 400
+        assert logged_in_client.get('/returns/AA$PL', dates).status_code == 400
+        assert not PriceBar.objects.exists()
+        assert not (price_files_dir.parent / 'escaped.prices').exists()
+
+        assert pricefiles.path_for('BRK.B') == price_files_dir.resolve() / 'BRK.B.prices'
+        for ticker in ('../escaped', 'A/B', ''):
+            with pytest.raises(ValueError):
+                pricefiles.path_for(ticker)
+
+    @allure.story("Validación de Tickers")
+    @allure.title("Los tickers en minúsculas o con espacios se normalizan en lugar de rechazarse")
+    @allure.description("Comprueba que brand=aapl, /returns/aapl y brands=' msft ,aapl' respondan 200 y se guarden en mayúsculas.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_lowercase_tickers_normalized(self, logged_in_client, settings, clear_analysis_cache):
+        from financialSearch.models import PriceBar
+        settings.MARKET_DATA_PROVIDER = {'BACKEND': 'financialSearch.providers.SyntheticProvider', 'OPTIONS': {}}
+        dates = {'from': '2023-01-01', 'to': '2023-02-28'}
+        response = logged_in_client.post('/getReturns', {**dates, 'brand': ' aapl '})
+        assert response.status_code == 200
+        assert response.json() == logged_in_client.post('/getReturns', {**dates, 'brand': 'AAPL'}).json()
+        assert logged_in_client.get('/returns/aapl', dates).status_code == 200
+        batch = logged_in_client.post('/getBatchReturns', {**dates, 'brands': ' msft ,aapl'})
+        assert batch.status_code == 200
+        assert set(PriceBar.objects.values_list('ticker', flat=True).distinct()) == {'AAPL', 'MSFT'}
+
+
+# --------------- Prueba de Carga ---------------
+
+@allure.feature("Prueba de Carga")
+class TestLoadTest:
+
+    @allure.story("Plan de Búsquedas")
+    @allure.title("El plan respeta la mezcla de tickers y rangos y es reproducible")
+    @allure.description("Verifica que build_plan use solo los tickers y longitudes pedidos, termine antes de hoy y genere el mismo plan con la misma semilla.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_build_plan(self):
+        from financialSearch import loadtest
+        tickers, ticker_weights = loadtest.parse_weighted('AAPL:3,MSFT')
+        ranges, range_weights = loadtest.parse_weighted('30:1,365:1', int)
+        assert (tickers, ticker_weights, ranges) == (['AAPL', 'MSFT'], [3.0, 1.0], [30, 365])
+        today = date(2024, 6, 1)
+        plan = loadtest.build_plan(200, tickers, ticker_weights, ranges, range_weights, today, jitter=10, seed=1)
+        assert plan == loadtest.build_plan(200, tickers, ticker_weights, ranges, range_weights, today, jitter=10, seed=1)
+        assert {search['brand'] for search in plan} == {'AAPL', 'MSFT'}
+        for search in plan:
+            start, end = date.fromisoformat(search['from']), date.fromisoformat(search['to'])
+            assert (end - start).days in (30, 365) and date(2024, 5, 22) <= end < today
+        with pytest.raises(ValueError):
+            loadtest.parse_weighted('AAPL:0')
+
+    @allure.story("Resumen")
+    @allure.title("summarize calcula rendimiento, percentiles y etapas")
+    @allure.description("Comprueba el cálculo de búsquedas por segundo, percentiles de latencia, conteo de estados y promedio de etapas de Server-Timing.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_summarize(self):
+        from financialSearch import loadtest
+        results = [(i / 1000, 200, f'fetch;dur={i}.0, total;dur={2 * i}.0') for i in range(1, 101)]
+        results.append((0.5, 404, ''))
+        summary = loadtest.summarize(results, elapsed=2.0)
+        assert summary['requests'] == 101 and summary['throughput'] == 50.5
+        assert summary['statuses'] == {200: 100, 404: 1}
+        assert summary['latency_ms']['p50'] == pytest.approx(51.0)
+        assert summary['latency_ms']['max'] == pytest.approx(500.0)
+        assert summary['stages_ms'] == {'fetch': 50.5, 'total': 101.0}
+
+    @allure.story("Comando load_test")
+    @allure.title("load_test inicia sesión, lanza las búsquedas e informa latencias")
+    @allure.description("Ejecuta el comando contra la fuente sintética y verifica que todas las búsquedas respondan 200 y que se informen p50/p95/p99.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_load_test_command(self, clear_analysis_cache):
+        from io import StringIO
+        from django.core.management import call_command
+        output = StringIO()
+        call_command(
+            'load_test', '--requests', '12', '--concurrency', '1', '--latency', '0',
+            '--tickers', 'AAPL:2,MSFT', '--ranges', '30,90', '--no-test-db', stdout=output)
+        report = output.getvalue()
+        assert '12 búsquedas a /getReturns con 1 clientes' in report
+        assert 'Estados: 200=12' in report
+        assert 'p50' in report and 'p95' in report and 'p99' in report
+
+    @allure.story("Comando load_test")
+    @allure.title("load_test con varios clientes simultáneos no produce errores")
+    @allure.description("Ejecuta el comando con 4 clientes concurrentes sobre la base de pruebas en archivo y verifica que todas las búsquedas respondan 200; los guardados concurrentes no deben fallar con 'database is locked'.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_load_test_concurrent(self, clear_analysis_cache):
+        from io import StringIO
+        from django.core.management import call_command
+        output = StringIO()
+        call_command(
+            'load_test', '--requests', '60', '--concurrency', '4', '--latency', '5', '--no-test-db', stdout=output)
+        report = output.getvalue()
+        assert '60 búsquedas a /getReturns con 4 clientes' in report
+        assert 'Estados: 200=60\n' in report
+        assert 'no devolvieron 200' not in report
+
+    @allure.story("Comando load_test")
+    @allure.title("load_test --url envía peticiones HTTP reales a un servidor en marcha")
+    @allure.description("Levanta un servidor real, ejecuta el comando con --url y comprueba el inicio de sesión con CSRF, que todas las búsquedas respondan 200 y que un servidor inalcanzable se informe como error.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_load_test_against_server(self, live_server, settings, clear_analysis_cache):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        settings.MARKET_DATA_PROVIDER = {'BACKEND': 'financialSearch.providers.SyntheticProvider', 'OPTIONS': {}}
+        User.objects.create_user(username='carga', password='secreta123')
+        output = StringIO()
+        call_command(
+            'load_test', '--url', live_server.url, '--username', 'carga', '--password', 'secreta123',
+            '--requests', '6', '--concurrency', '1', '--tickers', 'AAPL', '--ranges', '30', stdout=output)
+        report = output.getvalue()
+        assert f'Servidor: {live_server.url}' in report
+        assert 'Estados: 200=6' in report
+
+        with pytest.raises(CommandError, match='iniciar sesión'):
+            call_command('load_test', '--url', live_server.url, '--username', 'carga', '--password', 'otra',
+                         '--requests', '1', '--concurrency', '1', stdout=StringIO())
+        with pytest.raises(CommandError, match='conectar'):
+            call_command('load_test', '--url', 'http://127.0.0.1:9', '--password', 'x',
+                         '--requests', '1', '--concurrency', '1', stdout=StringIO())
+
+
+# --------------- Proveedores de Datos ---------------
+
+@allure.feature("Proveedores de Datos")
+class TestProviders:
+
+    @allure.story("Proveedor Sintético")
+    @allure.title("SyntheticProvider es determinista y coherente entre rangos solapados")
+    @allure.description("Verifica que el mismo día tenga el mismo precio en consultas distintas, que solo haya días hábiles y que la semilla cambie la serie.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_synthetic_provider(self):
+        from financialSearch.providers import SyntheticProvider
+        provider = SyntheticProvider(seed=1)
+        wide = provider.history('AAPL', date(2023, 1, 1), date(2023, 3, 31))
+        narrow = provider.history('AAPL', date(2023, 2, 1), date(2023, 2, 28))
+        assert list(wide.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+        assert (wide.index.dayofweek < 5).all() and wide.index[0] == pd.Timestamp('2023-01-02')
+        pd.testing.assert_frame_equal(wide.loc['2023-02-01':'2023-02-28'], narrow)
+        assert ((wide['Low'] <= wide[['Open', 'Close']].min(axis=1)) & (wide['High'] >= wide[['Open', 'Close']].max(axis=1))).all()
+        assert not np.allclose(narrow['Close'], SyntheticProvider(seed=2).history('AAPL', date(2023, 2, 1), date(2023, 2, 28))['Close'])
+        assert provider.history('AAPL', date(2023, 2, 1), date(2023, 1, 1)).empty
+
+    @allure.story("Proveedor de Reproducción")
+    @allure.title("ReplayProvider reproduce CSV y archivos de precios locales")
+    @allure.description("Comprueba que el proveedor lea el rango pedido de un CSV con formato de yfinance y de un archivo .prices, y que un ticker sin archivo no tenga datos.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_replay_provider(self, tmp_path, settings):
+        from financialSearch import pricefiles
+        from financialSearch.providers import ReplayProvider
+        frame = pd.DataFrame({
+            'Open': [1.0, 2.0, 3.0], 'High': [2.0, 3.0, 4.0], 'Low': [0.5, 1.5, 2.5],
+            'Close': [1.5, 2.5, 3.5], 'Volume': [10.0, 20.0, 30.0],
+        }, index=pd.DatetimeIndex(['2023-01-02', '2023-01-03', '2023-01-04'], name='Date'))
+        frame.tz_localize('America/New_York').to_csv(tmp_path / 'AAPL.csv')
+        settings.PRICE_FILES_DIR = tmp_path
+        pricefiles.write('MSFT', pricefiles.PriceColumns.from_frame(frame))
+
+        provider = ReplayProvider(tmp_path)
+        for ticker in ('AAPL', 'MSFT'):
+            replayed = provider.history(ticker, date(2023, 1, 3), date(2023, 1, 4))
+            assert replayed.index.strftime('%Y-%m-%d').tolist() == ['2023-01-03', '2023-01-04']
+            assert replayed['Close'].tolist() == [2.5, 3.5]
+        assert provider.history('GOOGL', date(2023, 1, 3), date(2023, 1, 4)).empty
+
+    @allure.story("Proveedor de Reproducción")
+    @allure.title("ReplayProvider no recuerda archivos faltantes y acota su caché")
+    @allure.description("Verifica que un CSV agregado después de una consulta sin datos se lea, que la caché no pase de cache_size archivos, que no se lean archivos fuera de la carpeta y que la interfaz exija implementar history.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_replay_provider_cache(self, tmp_path):
+        from financialSearch.providers import MarketDataProvider, ReplayProvider
+        frame = pd.DataFrame({'Close': [1.5, 2.5]}, index=pd.DatetimeIndex(['2023-01-02', '2023-01-03'], name='Date'))
+        provider = ReplayProvider(tmp_path, cache_size=2)
+        assert provider.history('AAPL', date(2023, 1, 2), date(2023, 1, 3)).empty
+        for ticker in ('AAPL', 'MSFT', 'KO'):
+            frame.to_csv(tmp_path / f'{ticker}.csv')
+            assert provider.history(ticker, date(2023, 1, 2), date(2023, 1, 3))['Close'].tolist() == [1.5, 2.5]
+        assert len(provider._frames) == 2
+        with pytest.raises(TypeError):
+            MarketDataProvider()
+
+        # Un CSV fuera de la carpeta no se alcanza con un ticker con separadores de ruta
+        outside = tmp_path / 'replay'
+        outside.mkdir()
+        assert ReplayProvider(outside).history('../AAPL', date(2023, 1, 2), date(2023, 1, 3)).empty
+
+    @allure.story("Configuración")
+    @allure.title("getReturns usa el proveedor configurado en MARKET_DATA_PROVIDER")
+    @allure.description("Asegura que con el proveedor sintético configurado la búsqueda responda sin llamar a yfinance y que cambiar la configuración cambie de proveedor.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_provider_from_settings(self, logged_in_client, counting_yfinance, clear_analysis_cache, settings):
+        from financialSearch import providers
+        settings.MARKET_DATA_PROVIDER = {
+            'BACKEND': 'financialSearch.providers.SyntheticProvider', 'OPTIONS': {'seed': 3},
+        }
+        provider = providers.get_provider()
+        assert isinstance(provider, providers.SyntheticProvider) and provider.seed == 3
+        assert providers.get_provider() is provider
+
+        response = logged_in_client.post('/getReturns', {'brand': 'AAPL', 'from': '2023-01-01', 'to': '2023-03-31'})
+        assert response.status_code == 200
+        assert counting_yfinance == []
+        expected = provider.history('AAPL', date(2023, 1, 1), date(2023, 3, 31))['Close']
+        assert [row['close'] for row in response.json()['data']] == pytest.approx(expected.tolist())
+
+        settings.MARKET_DATA_PROVIDER = {'BACKEND': 'financialSearch.providers.YFinanceProvider'}
+        assert isinstance(providers.get_provider(), providers.YFinanceProvider)
+
+
+# --------------- Importación Masiva ---------------
+
+@allure.feature("Importación Masiva")
+class TestBulkImport:
+
+    @allure.story("Validación")
+    @allure.title("normalize descarta filas inválidas y duplicados")
+    @allure.description("Verifica el reconocimiento de columnas sin distinguir mayúsculas, las fechas con zona horaria y el descarte de cierres no positivos, High < Low, volumen negativo y barras repetidas.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_normalize(self):
+        from financialSearch import importer
+        chunk = pd.DataFrame({
+            'date': ['2023-01-03 00:00:00-05:00', '2023-01-04', '2023-01-04', 'ayer', '2023-01-05', '2023-01-06', '2023-01-09'],
+            'Symbol': [' aapl', 'AAPL', 'AAPL', 'AAPL', 'AAPL', 'AAPL', None],
+            'CLOSE': ['1.5', 2.0, 9.0, 3.0, -1.0, 4.0, 5.0],
+            'High': [2.0, 3.0, 3.0, 4.0, 1.0, 1.0, 6.0],
+            'Low': [1.0, 1.0, 1.0, 1.0, 0.5, 2.0, 4.0],
+        })
+        clean, rejected = importer.normalize(chunk)
+        assert rejected == 4
+        assert clean['Ticker'].tolist() == ['AAPL', 'AAPL']
+        assert clean['Date'].dt.strftime('%Y-%m-%d').tolist() == ['2023-01-03', '2023-01-04']
+        assert clean['Close'].tolist() == [1.5, 2.0] and clean['Volume'].isna().all()
+        with pytest.raises(ValueError):
+            importer.normalize(chunk.drop(columns='Symbol'))
+
+    @allure.story("Comando import_prices")
+    @allure.title("import_prices carga archivos por trozos y evita consultas al proveedor")
+    @allure.description("Importa un CSV con varios tickers y un CSV por ticker en trozos pequeños, y comprueba las barras guardadas, los archivos de precios y que getReturns no llame a yfinance en el rango importado.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_import_command(self, tmp_path, price_files_dir, logged_in_client, counting_yfinance, clear_analysis_cache):
+        from io import StringIO
+        from django.core.management import call_command
+        from financialSearch.models import PriceBar
+        dates = pd.bdate_range('2023-01-02', '2023-03-31')
+        archive = pd.DataFrame({
+            'Date': np.tile(dates.strftime('%Y-%m-%d'), 2),
+            'Ticker': ['MSFT'] * len(dates) + ['GOOGL'] * len(dates),
+            'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': np.arange(1.0, 2 * len(dates) + 1), 'Volume': 100.0,
+        })
+        archive = pd.concat([archive, archive.iloc[:5]])
+        (tmp_path / 'archive').mkdir()
+        archive.to_csv(tmp_path / 'archive' / 'bulk.csv.gz', index=False)
+        archive[archive['Ticker'] == 'MSFT'].drop(columns='Ticker').assign(Close=lambda frame: frame['Close'] + 1000).to_csv(
+            tmp_path / 'archive' / 'tsla.csv', index=False)
+        PriceBar.objects.create(ticker='MSFT', date=date(2023, 1, 2), close=42.0)
+
+        output = StringIO()
+        call_command('import_prices', str(tmp_path / 'archive'), '--chunksize', '17', '--workers', '2', stdout=output)
+        assert f'{3 * len(dates) + 10} filas leídas' in output.getvalue()
+        assert f'{3 * len(dates) - 1} barras nuevas' in output.getvalue()
+        assert PriceBar.objects.get(ticker='MSFT', date=date(2023, 1, 2)).close == 42.0
+        assert PriceBar.objects.filter(ticker='TSLA').count() == len(dates)
+        assert sorted(path.name for path in price_files_dir.iterdir()) == ['GOOGL.prices', 'MSFT.prices', 'TSLA.prices']
+
+        response = logged_in_client.post('/getReturns', {'brand': 'GOOGL', 'from': '2023-01-15', 'to': '2023-03-15'})
+        assert response.status_code == 200
+        assert counting_yfinance == []
+
+    @allure.story("Comando import_prices")
+    @allure.title("import_prices informa los archivos que no se pudieron importar")
+    @allure.description("Asegura que un archivo sin columna Close se informe como error sin impedir la importación del resto.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db(transaction=True)
+    def test_import_errors(self, tmp_path):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from financialSearch.models import PriceBar
+        pd.DataFrame({'Date': ['2023-01-03'], 'Price': [1.0]}).to_csv(tmp_path / 'AAPL.csv', index=False)
+        pd.DataFrame({'Date': ['2023-01-03'], 'Close': [1.0]}).to_csv(tmp_path / 'MSFT.csv', index=False)
+        with pytest.raises(CommandError):
+            call_command('import_prices', str(tmp_path / 'AAPL.csv'), str(tmp_path / 'MSFT.csv'), stderr=StringIO(), stdout=StringIO())
+        assert list(PriceBar.objects.values_list('ticker', flat=True)) == ['MSFT']
+        with pytest.raises(CommandError):
+            call_command('import_prices', str(tmp_path / 'nada.csv'))
+
+
+# --------------- Exportación en Streaming ---------------
+
+@allure.feature("Exportación en Streaming")
+class TestExport:
+
+    @allure.story("CSV")
+    @allure.title("exportReturns transmite CSV de varios tickers con indicadores")
+    @allure.description("Verifica que la respuesta sea en streaming, que los tickers se lean a medida que se genera el cuerpo y que las columnas de indicadores coincidan con las de getReturns.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_export_csv(self, logged_in_client, counting_yfinance, clear_analysis_cache):
+        import io
+        response = logged_in_client.get('/export', {
+            'brands': 'AAPL,MSFT', 'from': '2023-01-01', 'to': '2023-03-31', 'fields': 'sma_5,rsi_14,close'})
+        assert response.status_code == 200 and response.streaming
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert response['Content-Disposition'] == 'attachment; filename="returns_2023-01-01_2023-03-31.csv"'
+        assert counting_yfinance == []
+
+        exported = pd.read_csv(io.StringIO(b''.join(response.streaming_content).decode()))
+        assert list(exported.columns) == ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume', 'sma_5', 'rsi_14']
+        assert len(counting_yfinance) == 2
+        assert exported['ticker'].value_counts().to_dict() == {'AAPL': 90, 'MSFT': 90}
+
+        data = logged_in_client.post('/getReturns', {
+            'brand': 'MSFT', 'from': '2023-01-01', 'to': '2023-03-31', 'fields': 'sma_5,rsi_14'}).json()['data']
+        msft = exported[exported['ticker'] == 'MSFT']
+        assert msft['date'].tolist() == [row['date'] for row in data]
+        np.testing.assert_allclose(msft['sma_5'], [np.nan if row['sma_5'] is None else row['sma_5'] for row in data])
+        np.testing.assert_allclose(msft['rsi_14'], [np.nan if row['rsi_14'] is None else row['rsi_14'] for row in data])
+        assert msft['open'].isna().all()
+
+    @allure.story("NDJSON")
+    @allure.title("exportReturns transmite NDJSON por negociación de contenido")
+    @allure.description("Comprueba que la cabecera Accept elija NDJSON, que cada línea sea un objeto JSON con null en los valores faltantes y que los tickers sin datos se omitan.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_export_ndjson(self, logged_in_client, mock_yfinance):
+        import json
+        response = logged_in_client.get(
+            '/export', {'brands': ['AAPL'], 'from': '2023-01-01', 'to': '2023-01-05', 'fields': 'sma_5'},
+            HTTP_ACCEPT='application/x-ndjson')
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert rows[0] == {'ticker': 'AAPL', 'date': '2023-01-01', 'open': None, 'high': None, 'low': None,
+                           'close': 100.0, 'volume': None, 'sma_5': None}
+        assert len(rows) == 5 and rows[-1]['sma_5'] == pytest.approx(102.0)
+
+    @allure.story("Validación")
+    @allure.title("exportReturns valida los parámetros antes de transmitir")
+    @allure.description("Asegura respuestas 400/405 para fechas faltantes o inválidas, formatos y campos desconocidos y métodos no permitidos.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.django_db
+    def test_export_validation(self, logged_in_client):
+        base = {'brands': 'AAPL', 'from': '2023-01-01', 'to': '2023-01-05'}
+        assert logged_in_client.get('/export', {'brands': 'AAPL'}).status_code == 400
+        assert logged_in_client.get('/export', {**base, 'from': '01/01/2023'}).status_code == 400
+        assert logged_in_client.get('/export', {**base, 'format': 'xlsx'}).status_code == 400
+        assert logged_in_client.get('/export', {**base, 'fields': 'macd'}).status_code == 400
+        assert logged_in_client.post('/export', base).status_code == 405
+
+
+# --------------- Canal en Vivo ---------------
+
+@allure.feature("Canal en Vivo")
+class TestLiveUpdates:
+
+    @allure.story("Indicadores Incrementales")
+    @allure.title("Un canal avanza con barras definitivas y reenvía la provisional solo si cambia")
+    @allure.description("Verifica que las barras anteriores a hoy actualicen el estado incremental, que la de hoy no lo modifique y que un cierre repetido no genere eventos.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_channel_advance(self):
+        from financialSearch.incremental import IncrementalIndicators
+        from financialSearch.live import Channel
+        today = date(2024, 3, 8)
+        channel = Channel(date(2024, 3, 1))
+        frame = pd.DataFrame({'Close': [10.0, 11.0, 12.0]}, index=pd.to_datetime(['2024-03-06', '2024-03-07', '2024-03-08']))
+
+        events = channel.advance('AAPL', frame, today)
+        assert [(e['date'], e['final'], e['close']) for e in events] == [
+            ('2024-03-06', True, 10.0), ('2024-03-07', True, 11.0), ('2024-03-08', False, 12.0)]
+        assert channel.last_date == date(2024, 3, 7) and channel.indicators.count == 2
+        assert channel.advance('AAPL', frame, today) == []
+
+        changed = frame.assign(Close=[10.0, 11.0, 13.0])
+        events = channel.advance('AAPL', changed, today)
+        expected = IncrementalIndicators()
+        for close in (10.0, 11.0, 13.0):
+            values = expected.update(close)
+        assert len(events) == 1 and events[0]['ema_5'] == pytest.approx(values['ema_5'])
+
+    @allure.story("Server-Sent Events")
+    @allure.title("Las conexiones de un ticker comparten una sola consulta periódica al proveedor")
+    @allure.description("Abre dos streams de /live/AAPL, comprueba el snapshot contra getReturns, que ambos reciban la barra de hoy de la misma consulta y que el feed se detenga al cerrarse.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    @pytest.mark.django_db
+    def test_live_stream_fan_out(self, logged_in_client, counting_yfinance, clear_analysis_cache, settings):
+        import asyncio
+        import json
+        from datetime import timedelta
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from financialSearch import live, metrics
+        settings.LIVE_POLL_INTERVAL = 0.02
+        today = date.today()
+        start = today - timedelta(days=60)
+        metrics.registry.reset()
+
+        async def read_event(stream):
+            while True:
+                chunk = await anext(stream)
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if not chunk.startswith(':'):
+                    name, data = chunk.strip().split('\n')
+                    return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+        async def scenario():
+            streams = []
+            for _ in range(2):
+                client = AsyncClient()
+                client.cookies = logged_in_client.cookies
+                response = await client.get('/live/AAPL', {'from': start.isoformat()})
+                assert response['Content-Type'] == 'text/event-stream'
+                streams.append(response.streaming_content)
+            received = [[await read_event(stream), await read_event(stream)] for stream in streams]
+            stats = live.hub.stats()
+            await asyncio.sleep(0.1)
+            for stream in streams:
+                await stream.aclose()
+            return received, stats
+
+        received, stats = async_to_sync(scenario)()
+        assert stats == {'feeds': 1, 'subscribers': 2}
+        assert live.hub.stats() == {'feeds': 0, 'subscribers': 0}
+        assert received[0] == received[1]
+        (snapshot_type, snapshot), (bar_type, bar) = received[0]
+        assert (snapshot_type, bar_type) == ('snapshot', 'bar')
+        assert bar['date'] == today.isoformat() and bar['final'] is False
+
+        yesterday = today - timedelta(days=1)
+        data = logged_in_client.post('/getReturns', {
+            'brand': 'AAPL', 'from': start.isoformat(), 'to': yesterday.isoformat(), 'fields': 'close,sma_5,ema_5'}).json()['data']
+        assert snapshot['date'] == data[-1]['date'] == yesterday.isoformat()
+        assert snapshot['sma_5'] == pytest.approx(data[-1]['sma_5']) and snapshot['ema_5'] == pytest.approx(data[-1]['ema_5'])
+
+        polls = [call for call in counting_yfinance if call[1].date() == today + timedelta(days=1)]
+        assert len(polls) == metrics.registry.counter_value('financialsearch_live_polls_total') >= 1
+
+    @allure.story("Siembra del Canal")
+    @allure.title("Si la siembra falla, los suscriptores que la esperaban reciben el error")
+    @allure.description("Hace fallar store.get_columns mientras un segundo suscriptor espera el mismo canal y verifica que ambos reciban el error sin quedarse colgados, que el canal se retire y que una nueva suscripción funcione.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_seed_failure_releases_waiters(self, monkeypatch):
+        import asyncio
+        import threading
+        from datetime import timedelta
+        from asgiref.sync import async_to_sync
+        from financialSearch import live
+        started, release = threading.Event(), threading.Event()
+
+        def failing_columns(ticker, start, end):
+            started.set()
+            release.wait(5)
+            raise ConnectionError('proveedor caído')
+
+        monkeypatch.setattr('financialSearch.store.get_columns', failing_columns)
+        hub = live.Hub()
+        start = date.today() - timedelta(days=30)
+
+        async def scenario():
+            first = asyncio.ensure_future(hub.subscribe('AAPL', start))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(hub.subscribe('AAPL', start))
+            await asyncio.sleep(0.05)
+            assert hub.stats() == {'feeds': 1, 'subscribers': 2}
+            release.set()
+            results = await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), 5)
+            stats = hub.stats()
+
+            monkeypatch.setattr('financialSearch.store.get_columns',
+                                lambda ticker, start, end: pd.DataFrame({'Close': []}, index=pd.DatetimeIndex([])))
+            queue = await hub.subscribe('AAPL', start)
+            snapshot = queue.get_nowait()
+            hub.unsubscribe('AAPL', start, queue)
+            return results, stats, snapshot
+
+        results, stats, snapshot = async_to_sync(scenario)()
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert stats == {'feeds': 0, 'subscribers': 0}
+        assert snapshot['type'] == 'snapshot'
+        assert hub.stats() == {'feeds': 0, 'subscribers': 0}
+
+
+# --------------- Presupuesto de Importación ---------------
+
+# Módulos que no deben cargarse al arrancar: solo los necesitan las vistas de datos
+HEAVY_MODULES = ('numpy', 'pandas', 'yfinance', 'financialSearch.store')
+# Suma de los tiempos propios de -X importtime del arranque completo (Django incluido, ~370 ms
+# medidos); volver a importar pandas o yfinance al cargar el URLconf lo supera con holgura
+IMPORT_BUDGET_MS = 900
+
+WORKER_BOOT = """
+import os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mainApp.settings')
+from mainApp.{server} import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print('cargados:' + ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+CHECK_BOOT = """
+import os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mainApp.settings')
+from django.core.management import execute_from_command_line
+execute_from_command_line(['manage.py', 'check'])
+print('cargados:' + ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def cold_import(code):
+    """
+    Ejecuta `code` en un intérprete nuevo con -X importtime.
+
+    Retorna:
+    - Tupla (módulos pesados cargados, suma en ms de los tiempos propios de importación).
+    """
+    import subprocess
+    import sys
+    from django.conf import settings as django_settings
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=django_settings.BASE_DIR, capture_output=True, text=True, timeout=120, check=True)
+    loaded = [name for name in result.stdout.splitlines()[-1].removeprefix('cargados:').split(',') if name]
+    total_us = sum(
+        int(line.split('|')[0].split(':')[1])
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and 'self [us]' not in line)
+    return loaded, total_us / 1000
+
+
+@allure.feature("Presupuesto de Importación")
+class TestImportBudget:
+
+    @allure.story("manage.py check")
+    @allure.title("manage.py check arranca sin cargar pandas, NumPy ni yfinance")
+    @allure.description("Ejecuta check en un proceso nuevo y verifica que el URLconf no importe la pila científica.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_manage_check_cold_start(self):
+        loaded, _ = cold_import(CHECK_BOOT.format(heavy=HEAVY_MODULES))
+        assert loaded == []
+
+    @allure.story("Arranque de Workers")
+    @allure.title("Los workers WSGI y ASGI resuelven el URLconf sin cargar la pila científica")
+    @allure.description("Carga la aplicación y las rutas como lo hace un worker al arrancar y verifica los módulos importados.")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.parametrize('server', ['wsgi', 'asgi'])
+    def test_worker_cold_start(self, server):
+        loaded, _ = cold_import(WORKER_BOOT.format(server=server, heavy=HEAVY_MODULES))
+        assert loaded == []
+
+    @allure.story("Presupuesto de Tiempo")
+    @allure.title("El arranque de check y de los workers importa dentro del presupuesto de tiempo")
+    @allure.description("Mide con -X importtime el arranque de check y de los workers WSGI/ASGI y compara la suma con IMPORT_BUDGET_MS. Depende de la carga de la máquina, por eso va con los benchmarks (pytest -m benchmark).")
+    @allure.severity(allure.severity_level.MINOR)
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('boot', ['check', 'wsgi', 'asgi'])
+    def test_cold_start_budget(self, boot):
+        code = CHECK_BOOT if boot == 'check' else WORKER_BOOT.replace('{server}', boot)
+        _, total_ms = cold_import(code.format(heavy=HEAVY_MODULES))
+        assert total_ms < IMPORT_BUDGET_MS
+
+    @allure.story("Importación Diferida")
+    @allure.title("lazy_import carga el módulo en el primer acceso a un atributo")
+    @allure.description("Verifica que el sustituto no importe el módulo al crearse y que luego exponga sus atributos.")
+    @allure.severity(allure.severity_level.MINOR)
+    def test_lazy_import(self):
+        import sys
+        from financialSearch.lazy import lazy_import
+        module = lazy_import('financialSearch.tests_lazy_probe')
+        assert 'financialSearch.tests_lazy_probe' not in sys.modules
+        with pytest.raises(ModuleNotFoundError):
+            module.anything
+        json_module = lazy_import('json')
+        assert json_module.dumps([1]) == '[1]'
+
+
+# --------------- Planificador de Descargas ---------------
+
+@pytest.fixture
+def blocking_download():
+    """
+    Descarga simulada que se bloquea hasta que la prueba la libera y registra cada rango pedido.
+    Devuelve un objeto con calls, started (Event del primer inicio) y release (Event para terminar).
+    """
+    import threading
+
+    class BlockingDownload:
+        def __init__(self):
+            self.calls = []
+            self.started = threading.Event()
+            self.release = threading.Event()
+
+        def __call__(self, ticker, start, end):
+            self.calls.append((ticker, start, end))
+            self.started.set()
+            self.release.wait(5)
+            return (start, end)
+
+    return BlockingDownload()
+
+@allure.feature("Planificador de Descargas")
+class TestFetchScheduler:
+
+    @allure.story("Single-flight")
+    @allure.title("Las peticiones concurrentes de rangos solapados comparten una descarga")
+    @allure.description("Mientras una descarga está en curso, diez peticiones del mismo rango la esperan y una que la excede solo descarga el tramo que falta; las métricas muestran la cola y la proporción de agrupamiento.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_concurrent_requests_are_coalesced(self, blocking_download, clear_metrics):
+        import threading
+        import time
+        from financialSearch.scheduler import FetchScheduler
+        scheduler = FetchScheduler()
+        results = {}
+
+        def request(name, start, end):
+            results[name] = scheduler.fetch('AAPL', start, end, blocking_download)
+
+        threads = [threading.Thread(target=request, args=('leader', date(2024, 1, 1), date(2024, 1, 31)))]
+        threads[0].start()
+        assert blocking_download.started.wait(5)
+        threads += [threading.Thread(target=request, args=(i, date(2024, 1, 10), date(2024, 1, 20))) for i in range(10)]
+        threads.append(threading.Thread(target=request, args=('wider', date(2024, 1, 15), date(2024, 2, 10))))
+        for thread in threads[1:]:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while len(blocking_download.calls) < 2 or scheduler.stats()['waiting_flight'] < 10:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # 'wider' descarga primero su tramo propio (febrero) y después espera el de enero
+        assert scheduler.stats() == {'in_flight': 2, 'waiting_token': 0, 'waiting_flight': 10}
+
+        blocking_download.release.set()
+        for thread in threads:
+            thread.join(5)
+        assert sorted(blocking_download.calls) == [
+            ('AAPL', date(2024, 1, 1), date(2024, 1, 31)), ('AAPL', date(2024, 2, 1), date(2024, 2, 10))]
+        assert results[3] == [(date(2024, 1, 1), date(2024, 1, 31), (date(2024, 1, 1), date(2024, 1, 31)))]
+        assert [segment[:2] for segment in results['wider']] == [
+            (date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 10))]
+        assert scheduler.stats()['in_flight'] == 0
+        assert clear_metrics.counter_value('financialsearch_upstream_segments_total', role='coalesced') == 11
+        assert 'financialsearch_upstream_coalescing_ratio 0.846154' in clear_metrics.export()
+
+    @allure.story("Reintentos")
+    @allure.title("Los fallos se reintentan y el error final llega a todas las peticiones agrupadas")
+    @allure.description("Verifica que un fallo transitorio se reintente hasta obtener datos y que, agotados los intentos, el error se propague y el rango quede libre.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_retries_with_backoff(self, settings, clear_metrics):
+        from financialSearch.scheduler import FetchScheduler
+        settings.MARKET_DATA_RETRIES = {'ATTEMPTS': 3, 'BACKOFF': 0.001, 'MAX_BACKOFF': 0.002}
+        scheduler = FetchScheduler()
+        failures = iter([ConnectionError('throttled'), ConnectionError('throttled')])
+
+        def flaky(ticker, start, end):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return 'ok'
+
+        assert scheduler.fetch('AAPL', date(2024, 1, 1), date(2024, 1, 5), flaky)[0][2] == 'ok'
+        assert clear_metrics.counter_value('financialsearch_upstream_retries_total') == 2
+
+        def broken(ticker, start, end):
+            raise ConnectionError('caído')
+
+        with pytest.raises(ConnectionError):
+            scheduler.fetch('AAPL', date(2024, 1, 1), date(2024, 1, 5), broken)
+        assert clear_metrics.counter_value('financialsearch_upstream_errors_total') == 5
+        assert scheduler.stats()['in_flight'] == 0
+
+    @allure.story("Cubeta de Tokens")
+    @allure.title("La cubeta permite ráfagas y luego espacia las descargas según RATE")
+    @allure.description("Comprueba que las primeras BURST reservas no esperen y que las siguientes esperen 1/RATE segundos acumulados.")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_token_bucket(self, settings):
+        from financialSearch.scheduler import FetchScheduler, TokenBucket
+        bucket = TokenBucket(rate=10, burst=2)
+        delays = [bucket.reserve() for _ in range(4)]
+        assert delays[:2] == [0.0, 0.0]
+        assert delays[2] == pytest.approx(0.1, abs=0.01) and delays[3] == pytest.approx(0.2, abs=0.01)
+
+        settings.MARKET_DATA_RATE_LIMIT = {'RATE': 50.0, 'BURST': 1}
+        scheduler = FetchScheduler()
+        assert scheduler.bucket() is scheduler.bucket()
+        settings.MARKET_DATA_RATE_LIMIT = None
+        assert scheduler.bucket() is None
+
+    @allure.story("Almacén")
+    @allure.title("Búsquedas simultáneas del mismo ticker generan una sola consulta al proveedor")
+    @allure.description("Lanza ocho fetch_upstream concurrentes contra un proveedor lento y verifica una única llamada y el recorte de cada resultado a su rango.")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_store_coalesces_upstream(self, monkeypatch):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from financialSearch import store
+        calls = []
+        barrier = threading.Barrier(8)
+
+        class SlowTicker:
+            def history(self, start, end):
+                calls.append((start, end))
+                time.sleep(0.3)
+                dates = pd.date_range(start=start, end=end, freq='D')
+                return pd.DataFrame({'Close': [100.0 + i for i in range(len(dates))]}, index=dates)
+
+        monkeypatch.setattr('yfinance.Ticker', lambda x: SlowTicker())
+
+        def search(i):
+            barrier.wait()
+            return store.fetch_upstream('AAPL', date(2023, 1, 1), date(2023, 1, 31) if i else date(2023, 1, 10))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            frames = list(executor.map(search, range(8)))
+        assert len(calls) <= 2
+        assert all(len(frame) == 31 for frame in frames[1:])
+        assert frames[0].index.max() == pd.Timestamp('2023-01-10')
@@ -0,0 +1,35 @@
+import re
+
+# Universo de tickers ofrecidos en el desplegable de index.html (símbolo, nombre)
+TICKERS = [
+    ('AAPL', 'Apple Inc.'),
+    ('MSFT', 'Microsoft Corporation'),
+    ('AMZN', 'Amazon.com, Inc.'),
+    ('GOOGL', 'Alphabet Inc.'),
+    ('META', 'Meta Platforms, Inc.'),
+    ('TSLA', 'Tesla, Inc.'),
+    ('BRK.B', 'Berkshire Hathaway Inc.'),
+    ('NVDA', 'NVIDIA Corporation'),
+    ('V', 'Visa Inc.'),
+    ('WMT', 'Walmart Inc.'),
+    ('KO', 'The Coca-Cola Company'),
+    ('JNJ', 'Johnson & Johnson'),
+    ('PG', 'Procter & Gamble Co.'),
+    ('MCD', "McDonald's Corporation"),
+    ('PYPL', 'PayPal Holdings, Inc.'),
+    ('CRM', 'Salesforce.com, Inc.'),
+]
+
+# Símbolos aceptados: mayúsculas, dígitos y . ^ = - (p. ej. BRK.B, ^GSPC, EURUSD=X), hasta el largo
+# de PriceBar.ticker. El ticker forma parte de rutas de archivos (pricefiles, ReplayProvider)
+TICKER_PATTERN = re.compile(r'[A-Z0-9.^=-]{1,16}')
+
+
+def normalize_ticker(symbol):
+    """Símbolo sin espacios y en mayúsculas (como se guardan), o el valor tal cual si no es texto."""
+    return symbol.strip().upper() if isinstance(symbol, str) else symbol
+
+
+def is_valid_ticker(symbol):
+    """Indica si `symbol` es un ticker con formato válido."""
+    return isinstance(symbol, str) and TICKER_PATTERN.fullmatch(symbol) is not None
@@ -5,5 +5,14 @@ urlpatterns = [
     path('login', views.user_login),
     path('logout', views.user_logout),
     path('getReturns', views.getReturns),
+    path('getBatchReturns', views.getBatchReturns),
+    path('getReturnsAsync', views.getReturnsAsync),
+    path('getPortfolio', views.getPortfolio),
+    path('getBacktest', views.getBacktest),
+    path('getScreener', views.getScreener),
+    path('returns/<str:brand>', views.getCachedReturns),
+    path('export', views.exportReturns),
+    path('live/<str:brand>', views.liveReturns),
+    path('metrics', views.metrics_view),
     path('', views.home),
 ]
\ No newline at end of file
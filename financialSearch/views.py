@@ -1,14 +1,50 @@
 from django.shortcuts import render, redirect
+from django.template.loader import get_template
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from datetime import datetime
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import pandas as pd
-import markdown
+from django.http import HttpResponse, HttpResponsePermanentRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from datetime import date, datetime, timedelta, timezone
+import hashlib
+import json
+import math
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .cache import analysis_cache, portfolio_cache, series_hash
+from .lazy import lazy_import
+from .tickers import TICKERS, is_valid_ticker, normalize_ticker
+
+# pandas, NumPy y los módulos que dependen de ellos (store trae yfinance) se importan en el
+# primer uso: login, home, manage.py y el arranque de los workers no cargan la pila científica
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+backtest = lazy_import('financialSearch.backtest')
+downsample = lazy_import('financialSearch.downsample')
+formats = lazy_import('financialSearch.formats')
+indicators = lazy_import('financialSearch.indicators')
+live = lazy_import('financialSearch.live')
+portfolio = lazy_import('financialSearch.portfolio')
+screener = lazy_import('financialSearch.screener')
+store = lazy_import('financialSearch.store')
+
+NO_DATA_ERROR = 'No se encontraron datos para el ticker y rango de fechas dados.'
+INSUFFICIENT_DATA_ERROR = 'No hay suficientes datos para realizar un análisis fiable. Se requieren al menos 20 días de datos.'
+MAX_POINTS_ERROR = 'max_points debe ser un entero mayor o igual a 3.'
+INVALID_TICKER_ERROR = 'Ticker inválido.'
+
+# Modos del parámetro analysis: informe HTML, resultado estructurado o ambos
+ANALYSIS_HTML = 'html'
+ANALYSIS_STRUCTURED = 'structured'
+ANALYSIS_BOTH = 'both'
+ANALYSIS_MODES = (ANALYSIS_HTML, ANALYSIS_STRUCTURED, ANALYSIS_BOTH)
 
 def user_login(request):
     if request.method == "POST":
@@ -33,7 +69,7 @@ def user_logout(request):
 
 @login_required(login_url='/login')
 def home(request):
-    return render(request, 'index.html')
+    return render(request, 'index.html', {'tickers': TICKERS})
 
 @login_required(login_url='/login')
 def getReturns(request):
@@ -41,44 +77,736 @@ def getReturns(request):
 
         from_date = request.POST.get('from')
         to_date = request.POST.get('to')
-        brand = request.POST.get('brand')
+        brand = normalize_ticker(request.POST.get('brand'))
+        if brand and not is_valid_ticker(brand):
+            return JsonResponse({'error': INVALID_TICKER_ERROR}, status=400)
+
+        try:
+            fmt = formats.negotiate(request)
+        except formats.UnsupportedFormat as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+
+        try:
+            max_points = parse_max_points(request)
+            fields = parse_fields(request)
+            analysis_mode = parse_analysis_mode(request)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
 
         start = datetime.strptime(from_date, '%Y-%m-%d')
         end = datetime.strptime(to_date, '%Y-%m-%d')
 
-        # Crear el objeto Ticker y usar .history()
-        ticker = yf.Ticker(brand)
-        stock_data = ticker.history(start=start, end=end)
+        with metrics.request_timings() as timings, metrics.timed('total'):
+            # Consultar el almacén local, que solo descarga de yfinance los huecos faltantes
+            with metrics.timed('fetch'):
+                stock_data = store.get_columns(brand, start.date(), end.date())
 
-        if stock_data.empty:
-            return JsonResponse({'error': 'No se encontraron datos para el ticker y rango de fechas dados.'}, status=404)
-
-        closing_prices = stock_data['Close'].to_list()
-        dates = stock_data.index.strftime('%Y-%m-%d').to_list()
-
-        stock_data['SMA_5'] = stock_data['Close'].rolling(window=5).mean()
-        sma_5 = stock_data['SMA_5'].to_list()
-
-        analysis = analyze_data(sma_5, dates, closing_prices)
-
-        data = {
-            'brand': brand,
-            'data': [
-                {
-                    'date': date,
-                    'close': price,
-                    'sma_5': sma if not pd.isna(sma) else None
-                } 
-                for date, price, sma in zip(dates, closing_prices, sma_5)
-            ],
-            'analysis': analysis
+            if stock_data.empty:
+                return JsonResponse({'error': NO_DATA_ERROR}, status=404)
+
+            data = build_returns(brand, from_date, to_date, stock_data, fmt, max_points, fields, analysis_mode)
+            with metrics.timed('serialize'):
+                response = formats.render(data, fmt)
+
+        response['Server-Timing'] = metrics.server_timing(timings)
+        return response
+
+    return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+@login_required(login_url='/login')
+def getBatchReturns(request):
+    if request.method == 'POST':
+
+        from_date = request.POST.get('from')
+        to_date = request.POST.get('to')
+        if not from_date or not to_date:
+            return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+        try:
+            start = datetime.strptime(from_date, '%Y-%m-%d').date()
+            end = datetime.strptime(to_date, '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+        try:
+            brands = parse_brands(request)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        # Descarga concurrente de los huecos de todos los tickers
+        histories = store.get_histories(brands, start, end)
+
+        results, errors = {}, {}
+        for brand, stock_data in histories.items():
+            if stock_data.empty:
+                errors[brand] = NO_DATA_ERROR
+            else:
+                results[brand] = build_returns(brand, from_date, to_date, stock_data)
+
+        return JsonResponse({'from': from_date, 'to': to_date, 'results': results, 'errors': errors})
+
+    return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+@login_required(login_url='/login')
+def getPortfolio(request):
+    """
+    Correlación, covarianza, betas móviles y volatilidad de una canasta de tickers.
+
+    Parámetros (POST):
+    - brands: Tickers de la canasta (repetido o separado por comas; por defecto todo el listado).
+    - from, to: Rango de fechas 'YYYY-MM-DD'.
+    - weights: Pesos separados por comas en el orden de brands (por defecto iguales).
+    - window: Ventana de las betas móviles en días (por defecto 20).
+    - benchmark: Ticker de referencia de las betas (por defecto la propia cartera).
+    - format: rows/columnar (JSON) o msgpack.
+
+    La matriz alineada de rendimientos se guarda en portfolio_cache, así que repetir la
+    consulta de una canasta no vuelve a leer el almacén.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    from_date = request.POST.get('from')
+    to_date = request.POST.get('to')
+    benchmark = normalize_ticker(request.POST.get('benchmark')) or None
+    try:
+        brands = parse_brands(request)
+        if benchmark is not None and not is_valid_ticker(benchmark):
+            raise ValueError(INVALID_TICKER_ERROR)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    try:
+        fmt = formats.negotiate(request)
+    except formats.UnsupportedFormat as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+
+    try:
+        weights = parse_float_list(request.POST.get('weights'))
+        window = int(request.POST.get('window') or 20)
+        if window < 2:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Los pesos deben ser números y la ventana un entero mayor o igual a 2.'}, status=400)
+
+    if not from_date or not to_date:
+        return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d').date()
+        end = datetime.strptime(to_date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+    tickers = brands if benchmark is None or benchmark in brands else brands + [benchmark]
+
+    with metrics.request_timings() as timings, metrics.timed('total'):
+        with metrics.timed('fetch'):
+            dates, available, returns, missing = portfolio_cache.get_or_compute(
+                (tuple(tickers), start, end),
+                lambda: portfolio.align_returns(store.get_closes(tickers, start, end)),
+            )
+
+        # El benchmark agregado solo para las betas no forma parte de la cartera
+        in_basket = [ticker in brands for ticker in available]
+        basket = [ticker for ticker in available if ticker in brands]
+        if not basket or len(returns) < 2:
+            return JsonResponse({'error': NO_DATA_ERROR}, status=404)
+        if benchmark is not None and benchmark not in available:
+            return JsonResponse({'error': f'No se encontraron datos para el benchmark {benchmark}.'}, status=404)
+        try:
+            basket_weights = portfolio.normalize_weights(weights, brands, basket)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        with metrics.timed('portfolio'):
+            result = portfolio.analyze(
+                dates, returns[:, in_basket], basket_weights, window, benchmark,
+                None if benchmark is None else returns[:, available.index(benchmark)])
+
+        with metrics.timed('serialize'):
+            response = formats.render({
+                'from': from_date,
+                'to': to_date,
+                'tickers': basket,
+                'missing': [ticker for ticker in missing if ticker in brands],
+                'weights': basket_weights.tolist(),
+                'observations': len(returns),
+                'correlation': formats.nullable(result['correlation']),
+                'covariance': formats.nullable(result['covariance']),
+                'rolling_beta': {**result['rolling_beta'], 'values': formats.nullable(result['rolling_beta']['values'])},
+                'volatility': result['volatility'],
+            }, fmt)
+
+    response['Server-Timing'] = metrics.server_timing(timings)
+    return response
+
+@login_required(login_url='/login')
+def getBacktest(request):
+    """
+    Backtest histórico de la regla comprar/vender/mantener de analyze_data para varios tickers.
+
+    Parámetros (POST):
+    - brands: Tickers (repetido o separado por comas; por defecto todo el listado).
+    - from, to: Rango de fechas 'YYYY-MM-DD'.
+    - allow_short: '1'/'true' para que 'vender' abra una posición corta.
+    - cost: Costo por cambio de posición como fracción (por defecto 0).
+    - format: rows/columnar (JSON) o msgpack.
+
+    Con muchos tickers, el cálculo se reparte en el pool de procesos compartido (BACKTEST_MAX_WORKERS).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    from_date = request.POST.get('from')
+    to_date = request.POST.get('to')
+    allow_short = request.POST.get('allow_short', '').lower() in ('1', 'true')
+    try:
+        brands = parse_brands(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    try:
+        fmt = formats.negotiate(request)
+    except formats.UnsupportedFormat as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+
+    try:
+        cost = float(request.POST.get('cost') or 0)
+        if not 0 <= cost < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'cost debe ser un número entre 0 y 1.'}, status=400)
+
+    if not from_date or not to_date:
+        return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d').date()
+        end = datetime.strptime(to_date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+
+    with metrics.request_timings() as timings, metrics.timed('total'):
+        with metrics.timed('fetch'):
+            closes = store.get_closes(brands, start, end)
+            series = {ticker: closes[ticker].dropna().to_numpy() for ticker in brands}
+
+        errors = {ticker: NO_DATA_ERROR for ticker, close in series.items() if not len(close)}
+        with metrics.timed('backtest'):
+            results = backtest.run_many(
+                {ticker: close for ticker, close in series.items() if len(close)},
+                allow_short, cost, getattr(settings, 'BACKTEST_MAX_WORKERS', None),
+            )
+
+        with metrics.timed('serialize'):
+            response = formats.render({'from': from_date, 'to': to_date, 'results': results, 'errors': errors}, fmt)
+
+    response['Server-Timing'] = metrics.server_timing(timings)
+    return response
+
+@login_required(login_url='/login')
+def getScreener(request):
+    """
+    Screener del universo con los indicadores de analyze_data, leído solo del almacén local.
+
+    Parámetros (POST):
+    - brands: Tickers a evaluar (por defecto todos los del almacén).
+    - to: Último día del análisis 'YYYY-MM-DD' (por defecto hoy).
+    - days: Días de histórico hacia atrás (por defecto 120).
+    - recommendation: Recomendaciones aceptadas, separadas por comas.
+    - min_<campo> / max_<campo>: Límites inclusivos sobre los campos numéricos (p. ej. max_rsi_14=30).
+    - sort: Campo de orden, con '-' para descendente (por defecto 'ticker').
+    - limit: Máximo de filas.
+    - format: rows/columnar (JSON) o msgpack.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        fmt = formats.negotiate(request)
+    except formats.UnsupportedFormat as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+
+    try:
+        end = datetime.strptime(request.POST['to'], '%Y-%m-%d').date() if request.POST.get('to') else date.today()
+        days = int(request.POST.get('days') or 120)
+        limit = int(request.POST.get('limit') or 0) or None
+        bounds = {
+            (field, side): float(request.POST[f'{side}_{field}'])
+            for field in screener.NUMERIC_FIELDS for side in ('min', 'max')
+            if request.POST.get(f'{side}_{field}')
         }
+    except ValueError:
+        return JsonResponse({'error': 'Los parámetros to, days, limit y los límites min_/max_ deben ser válidos.'}, status=400)
+
+    recommendations = [value for value in request.POST.get('recommendation', '').split(',') if value]
+    sort = request.POST.get('sort') or 'ticker'
+    if sort.lstrip('-') not in screener.SORT_FIELDS:
+        return JsonResponse({'error': f"Campo de orden no soportado. Disponibles: {', '.join(screener.SORT_FIELDS)}."}, status=400)
+
+    try:
+        tickers = parse_brands(request) if request.POST.get('brands') else None
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    with metrics.request_timings() as timings, metrics.timed('total'):
+        with metrics.timed('load'):
+            closes = store.load_closes(tickers, end - timedelta(days=days), end)
+        with metrics.timed('screen'):
+            rows = screener.screen(closes, getattr(settings, 'SCREENER_MAX_WORKERS', None))
+            results = screener.apply_filters(rows, recommendations, bounds, sort, limit)
+        with metrics.timed('serialize'):
+            response = formats.render({
+                'to': end.isoformat(),
+                'universe': len(closes.columns),
+                'screened': len(rows),
+                'matched': len(results),
+                'results': [{key: None if value != value else value for key, value in row.items()} for row in results],
+            }, fmt)
+
+    response['Server-Timing'] = metrics.server_timing(timings)
+    return response
+
+# Series que puede devolver getReturns (seleccionables con fields=), calculadas sobre los cierres
+SERIES_FIELDS = {
+    'close': lambda close: close,
+    'sma_5': lambda close: indicators.sma(close, 5),
+    'ema_5': lambda close: indicators.ema(close, 5),
+    'diff': lambda close: np.concatenate([[np.nan], np.diff(close)]),
+    'rsi_14': lambda close: indicators.rsi(close, 14, method='simple'),
+    'volatility_20': lambda close: indicators.rolling_std(close, 20),
+}
+
+# Pools acotados de la vista asíncrona: uno grande para las descargas (esperan red) y uno
+# pequeño para el trabajo de pandas/NumPy, de modo que un solo worker ASGI pueda mantener
+# cientos de descargas en curso sin crear hilos sin límite.
+FETCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_FETCH_WORKERS', 100), thread_name_prefix='fetch')
+COMPUTE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_COMPUTE_WORKERS', 4), thread_name_prefix='compute')
 
+@login_required(login_url='/login')
+async def getReturnsAsync(request):
+    if request.method == 'POST':
+
+        from_date = request.POST.get('from')
+        to_date = request.POST.get('to')
+        brand = normalize_ticker(request.POST.get('brand'))
+        if brand and not is_valid_ticker(brand):
+            return JsonResponse({'error': INVALID_TICKER_ERROR}, status=400)
 
-        return JsonResponse(data)
+        try:
+            fmt = formats.negotiate(request)
+        except formats.UnsupportedFormat as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+
+        try:
+            max_points = parse_max_points(request)
+            fields = parse_fields(request)
+            analysis_mode = parse_analysis_mode(request)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        if not from_date or not to_date or not brand:
+            return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+        try:
+            start = datetime.strptime(from_date, '%Y-%m-%d').date()
+            end = datetime.strptime(to_date, '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+
+        loop = asyncio.get_running_loop()
+        with metrics.request_timings() as timings, metrics.timed('total'):
+            # run_in_executor no propaga el contexto: se ejecuta en una copia que comparte `timings`
+            context = contextvars.copy_context()
+            with metrics.timed('fetch'):
+                gaps = await sync_to_async(store.missing_ranges)(brand, start, end)
+                fetched = await asyncio.gather(*(
+                    loop.run_in_executor(FETCH_EXECUTOR, context.copy().run, store.fetch_upstream, brand, gap_start, gap_end)
+                    for gap_start, gap_end in gaps
+                ))
+                stock_data = await sync_to_async(_save_and_load)(brand, start, end, gaps, fetched)
+
+            if stock_data.empty:
+                return JsonResponse({'error': NO_DATA_ERROR}, status=404)
+
+            data = await loop.run_in_executor(
+                COMPUTE_EXECUTOR, context.run, build_returns,
+                brand, from_date, to_date, stock_data, fmt, max_points, fields, analysis_mode)
+            with metrics.timed('serialize'):
+                response = formats.render(data, fmt)
+
+        response['Server-Timing'] = metrics.server_timing(timings)
+        return response
 
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
+@login_required(login_url='/login')
+async def liveReturns(request, brand):
+    """
+    Canal Server-Sent Events con las barras nuevas de un ticker y sus indicadores actualizados.
+
+    La URL es /live/<ticker>?from=YYYY-MM-DD, con from igual al inicio del rango graficado para
+    que SMA_5, EMA_5, RSI y volatilidad coincidan con los de getReturns (por defecto, un año
+    atrás). Eventos:
+    - snapshot: indicadores de la última barra definitiva al conectarse.
+    - bar: barra nueva con sus indicadores; final=false para la barra de hoy, que puede cambiar
+      y se reenvía mientras su cierre varíe.
+    Cada LIVE_KEEPALIVE segundos sin eventos se envía un comentario para mantener la conexión.
+
+    Todas las conexiones de un mismo ticker comparten una sola consulta periódica al proveedor
+    (ver financialSearch.live). Requiere un servidor ASGI.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    brand = normalize_ticker(brand)
+    if not is_valid_ticker(brand):
+        return JsonResponse({'error': INVALID_TICKER_ERROR}, status=400)
+    try:
+        start = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') \
+            else date.today() - timedelta(days=365)
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+
+    queue = await live.hub.subscribe(brand, start)
+    keepalive = getattr(settings, 'LIVE_KEEPALIVE', 15)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+        finally:
+            live.hub.unsubscribe(brand, start, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el stream antes de enviarlo
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required(login_url='/login')
+def getCachedReturns(request, brand):
+    """
+    Variante GET de getReturns pensada para cachés HTTP (navegador y proxy inverso).
+
+    La URL es /returns/<ticker>?from=...&to=... con los mismos parámetros opcionales que el POST
+    (analysis, fields, format, max_points). Las consultas que no están en forma canónica (claves
+    ordenadas, sin valores por defecto) se redirigen con 301 a la URL canónica, de modo que cada
+    respuesta tenga una sola clave de caché.
+
+    La respuesta lleva un ETag fuerte (huella del cuerpo), Last-Modified (fin del día de la última
+    barra) y Cache-Control: un rango cerrado (termina antes de hoy) no vuelve a cambiar y se cachea
+    RETURNS_CLOSED_MAX_AGE segundos; un rango que incluye hoy, RETURNS_OPEN_MAX_AGE. If-None-Match
+    e If-Modified-Since se responden con 304.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    from_date = request.GET.get('from')
+    to_date = request.GET.get('to')
+    if not from_date or not to_date:
+        return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d').date()
+        end = datetime.strptime(to_date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+    brand = normalize_ticker(brand)
+    if not is_valid_ticker(brand):
+        return JsonResponse({'error': INVALID_TICKER_ERROR}, status=400)
+
+    try:
+        fmt = formats.negotiate(request)
+    except formats.UnsupportedFormat as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+
+    try:
+        max_points = parse_max_points(request)
+        fields = parse_fields(request)
+        analysis_mode = parse_analysis_mode(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    query = canonical_query(start, end, request.GET.get('format') or None, max_points, fields, analysis_mode)
+    if request.META.get('QUERY_STRING', '') != query:
+        return HttpResponsePermanentRedirect(f"{request.path}?{query}")
+
+    from_date, to_date = start.isoformat(), end.isoformat()
+    with metrics.request_timings() as timings, metrics.timed('total'):
+        with metrics.timed('fetch'):
+            stock_data = store.get_columns(brand, start, end)
+
+        if stock_data.empty:
+            return JsonResponse({'error': NO_DATA_ERROR}, status=404)
+
+        data = build_returns(brand, from_date, to_date, stock_data, fmt, max_points, fields, analysis_mode)
+        with metrics.timed('serialize'):
+            response = formats.render(data, fmt)
+
+    closed = end < date.today()
+    max_age = getattr(settings, 'RETURNS_CLOSED_MAX_AGE' if closed else 'RETURNS_OPEN_MAX_AGE', 0)
+    if closed:
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    if not request.GET.get('format'):
+        # Sin format= el formato sale de la cabecera Accept
+        patch_vary_headers(response, ['Accept'])
+
+    last_bar = stock_data.index[-1].date() + timedelta(days=1)
+    last_modified = min(
+        datetime.combine(last_bar, datetime.min.time(), tzinfo=timezone.utc).timestamp(),
+        datetime.now(timezone.utc).timestamp(),
+    )
+    etag = '"%s"' % hashlib.blake2b(response.content, digest_size=16).hexdigest()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Server-Timing'] = metrics.server_timing(timings)
+    return get_conditional_response(request, etag=etag, last_modified=int(last_modified), response=response)
+
+@login_required(login_url='/login')
+def exportReturns(request):
+    """
+    Exportación en streaming del histórico guardado de uno o varios tickers.
+
+    Parámetros (GET):
+    - brands: Tickers (repetido o separado por comas; por defecto todo el listado).
+    - from, to: Rango 'YYYY-MM-DD', ambos extremos incluidos.
+    - format: 'csv' (por defecto) o 'ndjson'; sin format= se usa la cabecera Accept.
+    - fields: Series de indicadores a añadir (las de SERIES_FIELDS salvo 'close').
+
+    Cada fila tiene ticker, date, open, high, low, close, volume y los indicadores pedidos,
+    calculados sobre el rango exportado como en getReturns. La respuesta empieza a enviarse de
+    inmediato: los tickers se leen (y se completan desde el proveedor si faltan barras) uno a uno
+    mientras se genera el cuerpo, de modo que la memoria depende del histórico de un solo ticker
+    y no del tamaño de la exportación.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    from_date = request.GET.get('from')
+    to_date = request.GET.get('to')
+    if not from_date or not to_date:
+        return JsonResponse({'error': 'Faltan campos requeridos.'}, status=400)
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d').date()
+        end = datetime.strptime(to_date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido.'}, status=400)
+
+    try:
+        fmt = formats.negotiate_export(request)
+    except formats.UnsupportedFormat as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    try:
+        fields = [field for field in parse_fields(request) or [] if field != 'close']
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    try:
+        brands = parse_brands(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    response = StreamingHttpResponse(
+        export_chunks(brands, start, end, fields, fmt), content_type=formats.EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="returns_{start.isoformat()}_{end.isoformat()}.{fmt}"'
+    return response
+
+def export_chunks(brands, start, end, fields, fmt):
+    """
+    Genera el cuerpo de exportReturns por bloques de filas, ticker a ticker.
+
+    Los tickers sin barras en el rango se omiten.
+    """
+    names = ['ticker', 'date', *store.COLUMNS.values(), *fields]
+    if fmt == formats.CSV:
+        yield formats.csv_header(names)
+    for brand in brands:
+        stock_data = store.get_columns(brand, start, end)
+        if stock_data.empty:
+            continue
+        close = np.asarray(stock_data['Close'], dtype=float)
+        columns = [
+            [brand] * len(close),
+            stock_data.index.strftime('%Y-%m-%d').to_list(),
+            *(formats.nullable(stock_data[column]) for column in store.COLUMNS),
+            *(formats.nullable(SERIES_FIELDS[field](close)) for field in fields),
+        ]
+        metrics.registry.increment('financialsearch_export_rows_total', len(close), format=fmt)
+        yield from formats.encode_rows(fmt, names, columns)
+
+def canonical_query(start, end, fmt, max_points, fields, analysis_mode):
+    """
+    Query string canónico de getCachedReturns: claves en orden alfabético y sin los valores por defecto.
+    """
+    params = {
+        'analysis': analysis_mode if analysis_mode != ANALYSIS_HTML else None,
+        # fields=date (lista vacía) pide solo las fechas y no equivale a omitir el parámetro
+        'fields': None if fields is None else ','.join(fields) or 'date',
+        'format': fmt,
+        'from': start.isoformat(),
+        'max_points': max_points,
+        'to': end.isoformat(),
+    }
+    return urlencode({key: value for key, value in params.items() if value is not None}, safe=',')
+
+def metrics_view(request):
+    """Métricas del proceso en formato de exposición de Prometheus."""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    return HttpResponse(metrics.registry.export(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _save_and_load(brand, start, end, gaps, fetched):
+    """Guarda los huecos descargados y lee el rango completo del almacén (acceso síncrono al ORM)."""
+    for (gap_start, gap_end), stock_data in zip(gaps, fetched):
+        store.save_bars(brand, stock_data, gap_start, gap_end)
+    return store.load_columns(brand, start, end)
+
+def parse_brands(request):
+    """
+    Tickers de una consulta múltiple: 'brands' repetido o separado por comas; sin tickers se usa todo el listado.
+
+    Lanza:
+    - ValueError: Si algún ticker no tiene un formato válido.
+    """
+    values = request.POST.getlist('brands') if request.method == 'POST' else request.GET.getlist('brands')
+    brands = [normalize_ticker(b) for value in values for b in value.split(',') if b.strip()]
+    if not all(map(is_valid_ticker, brands)):
+        raise ValueError(INVALID_TICKER_ERROR)
+    return list(dict.fromkeys(brands)) or [symbol for symbol, _ in TICKERS]
+
+def parse_float_list(value):
+    """Lista de números separados por comas, o None si no se envía. Lanza ValueError si alguno no es numérico o no es finito (nan, inf)."""
+    if not value:
+        return None
+    numbers = [float(item) for item in value.split(',')]
+    if not all(map(math.isfinite, numbers)):
+        raise ValueError
+    return numbers
+
+def parse_max_points(request):
+    """
+    Lee el parámetro opcional max_points.
+
+    Retorna:
+    - None si no se envía o el número máximo de puntos (>= 3).
+
+    Lanza:
+    - ValueError si el valor no es un entero mayor o igual a 3.
+    """
+    value = request.POST.get('max_points') or request.GET.get('max_points')
+    if not value:
+        return None
+    if not value.isdigit() or int(value) < 3:
+        raise ValueError(MAX_POINTS_ERROR)
+    return int(value)
+
+def parse_fields(request):
+    """
+    Lee el selector opcional fields (lista separada por comas de SERIES_FIELDS).
+
+    Retorna:
+    - None si no se envía (todas las series) o la lista de series pedidas.
+
+    Lanza:
+    - ValueError si alguna serie no existe.
+    """
+    value = request.POST.get('fields') or request.GET.get('fields')
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip() and field.strip() != 'date']
+    unknown = [field for field in fields if field not in SERIES_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(SERIES_FIELDS)}.")
+    return list(dict.fromkeys(fields))
+
+def parse_analysis_mode(request):
+    """
+    Lee el parámetro opcional analysis (html, structured o both).
+
+    Retorna:
+    - El modo pedido, 'html' si no se envía.
+
+    Lanza:
+    - ValueError si el modo no existe.
+    """
+    value = request.POST.get('analysis') or request.GET.get('analysis') or ANALYSIS_HTML
+    if value not in ANALYSIS_MODES:
+        raise ValueError(f"Modo de análisis no soportado. Disponibles: {', '.join(ANALYSIS_MODES)}.")
+    return value
+
+def build_returns(brand, from_date, to_date, stock_data, fmt='rows', max_points=None, fields=None,
+                  analysis_mode=ANALYSIS_HTML):
+    """
+    Construye la respuesta de un ticker: serie de cierres, SMA_5 y análisis.
+
+    Parámetros:
+    - brand: Ticker consultado.
+    - from_date, to_date: Rango solicitado en formato 'YYYY-MM-DD'.
+    - stock_data: DataFrame no vacío con la columna 'Close' indexado por fecha, o PriceColumns.
+    - fmt: Formato de la serie: 'rows' (lista de objetos) o columnar ('columnar'/'msgpack').
+    - max_points: Si se indica, las series devueltas se reducen con LTTB a ese número de
+      puntos. El análisis siempre se calcula con la resolución completa.
+    - fields: Series a incluir además de la fecha (por defecto todas las de SERIES_FIELDS).
+      Solo se calculan las series pedidas.
+    - analysis_mode: 'html' (informe HTML en 'analysis'), 'structured' (diccionario de
+      compute_analysis en 'analysis') o 'both' (informe en 'analysis' y diccionario en 'analysis_data').
+
+    Retorna:
+    - Diccionario con las claves 'brand', 'data' y 'analysis' (y 'analysis_data' con 'both').
+    """
+    # Con PriceColumns el cierre es una vista del archivo de precios: no se copia
+    close = np.asarray(stock_data['Close'], dtype=float)
+    with metrics.timed('sma'):
+        sma_5 = indicators.sma(close, 5)
+
+    index = stock_data.index
+    dates = index.values.astype('datetime64[D]')
+    with metrics.timed('analysis'):
+        analysis = {}
+        if analysis_mode in (ANALYSIS_HTML, ANALYSIS_BOTH):
+            analysis['analysis'] = cached_analysis(brand, from_date, to_date, sma_5, dates, close)
+        if analysis_mode in (ANALYSIS_STRUCTURED, ANALYSIS_BOTH):
+            key = 'analysis' if analysis_mode == ANALYSIS_STRUCTURED else 'analysis_data'
+            analysis[key] = cached_analysis(brand, from_date, to_date, sma_5, dates, close, structured=True)
+
+    with metrics.timed('indicators'):
+        series = {'close': close, 'sma_5': sma_5}
+        series = {
+            field: series[field] if field in series else SERIES_FIELDS[field](close)
+            for field in (SERIES_FIELDS if fields is None else fields)
+        }
+    if max_points and len(close) > max_points:
+        with metrics.timed('downsample'):
+            keep = downsample.lttb_indices(close, max_points)
+            index = index[keep]
+            series = {name: values[keep] for name, values in series.items()}
+
+    with metrics.timed('layout'):
+        if fmt == formats.ROWS:
+            data = formats.rows(index, series)
+        else:
+            data = formats.columns(index, series)
+
+    return {
+        'brand': brand,
+        'data': data,
+        **analysis
+    }
+
+def cached_analysis(brand, from_date, to_date, prices, dates, close_prices, structured=False):
+    """
+    Versión memorizada de analyze_data (o de compute_analysis si structured=True).
+
+    La clave combina el ticker, el rango de fechas y una huella del contenido de las series,
+    de modo que si los datos cambian el análisis se vuelve a calcular. El informe HTML y el
+    resultado estructurado se guardan como entradas distintas.
+    """
+    key = (brand, from_date, to_date, series_hash(dates, close_prices, prices))
+    if structured:
+        return analysis_cache.get_or_compute(key + ('structured',), lambda: compute_analysis(prices, dates, close_prices))
+    return analysis_cache.get_or_compute(key, lambda: analyze_data(prices, dates, close_prices))
+
 def analyze_data(prices, dates, close_prices):
     """
     Realiza un análisis predictivo exhaustivo de los precios de cierre históricos para recomendar comprar, vender o mantener una acción.
@@ -89,45 +817,52 @@ def analyze_data(prices, dates, close_prices):
     - close_prices: Lista de precios de cierre diarios.
 
     Retorna:
-    - Un informe detallado en formato de string con el análisis y la recomendación.
+    - Un informe detallado en formato de string (HTML) con el análisis y la recomendación.
+    """
+    return render_analysis(compute_analysis(prices, dates, close_prices))
+
+def compute_analysis(prices, dates, close_prices):
+    """
+    Calcula los indicadores y la recomendación del análisis predictivo, sin generar texto.
+
+    Parámetros:
+    - prices: Lista de medias móviles simples (SMA_5).
+    - dates: Lista de fechas correspondientes a los precios.
+    - close_prices: Lista de precios de cierre diarios.
+
+    Retorna:
+    - Diccionario con el período, las pendientes de tendencia, SMA_5, EMA_5, RSI, volatilidad
+      y la recomendación, o {'error': mensaje} si hay menos de 20 días válidos.
     """
-    # Limpiar datos: eliminar None y convertir a arrays
-    valid_data = [(d, c, s) for d, c, s in zip(dates, close_prices, prices) if c is not None and s is not None]
-    if len(valid_data) < 20:
-        return "No hay suficientes datos para realizar un análisis fiable. Se requieren al menos 20 días de datos."
+    # Limpiar datos: eliminar los días con None. Los arrays de NumPy no pueden contener None y
+    # se usan tal cual, sin copiarlos (p. ej. vistas de los archivos de precios)
+    valid = _present(close_prices) & _present(prices)
+    positions = np.flatnonzero(valid)
+    if len(positions) < 20:
+        return {'error': INSUFFICIENT_DATA_ERROR}
 
-    dates, close_prices, sma_5 = zip(*valid_data)
-    close_prices = np.array(close_prices)
-    sma_5 = np.array(sma_5)
-    dates = pd.to_datetime(dates)
+    close_prices = np.asarray(close_prices, dtype=float)
+    sma_5 = np.asarray(prices, dtype=float)
+    if len(positions) < len(valid):
+        close_prices, sma_5 = close_prices[positions], sma_5[positions]
 
-    # 1. Análisis de Tendencia
+    # 1. Análisis de Tendencia (pendientes de regresión lineal)
     # Tendencia a largo plazo (mínimo 60 días o todo el período)
     long_term_window = min(60, len(close_prices))
-    long_term_trend = np.polyfit(range(long_term_window), close_prices[-long_term_window:], 1)[0]
+    long_term_trend = indicators.rolling_slope(close_prices, long_term_window)[-1]
 
     # Tendencia a corto plazo (últimos 10 días)
-    short_term_trend = np.polyfit(range(10), close_prices[-10:], 1)[0] if len(close_prices) >= 10 else 0
+    short_term_trend = indicators.rolling_slope(close_prices, 10)[-1]
 
     # 2. Indicadores Técnicos
     # Media Móvil Exponencial (EMA_5)
-    ema_5 = pd.Series(close_prices).ewm(span=5, adjust=False).mean().tolist()
-
-    # Índice de Fuerza Relativa (RSI, 14 días)
-    def calculate_rsi(data, window=14):
-        delta = np.diff(data)
-        gain = np.where(delta > 0, delta, 0)
-        loss = np.where(delta < 0, -delta, 0)
-        avg_gain = np.mean(gain[-window:]) if len(gain) >= window else np.mean(gain)
-        avg_loss = np.mean(loss[-window:]) if len(loss) >= window else np.mean(loss)
-        rs = avg_gain / avg_loss if avg_loss != 0 else np.inf
-        rsi = 100 - (100 / (1 + rs)) if rs != np.inf else 100
-        return rsi
+    ema_5 = indicators.ema(close_prices, span=5)
 
-    rsi = calculate_rsi(close_prices) if len(close_prices) >= 14 else np.nan
+    # Índice de Fuerza Relativa (RSI, media simple de las últimas 14 variaciones)
+    rsi = indicators.rsi(close_prices, 14, method='simple')[-1]
 
-    # 3. Volatilidad
-    volatility = np.std(close_prices[-20:]) if len(close_prices) >= 20 else np.std(close_prices)
+    # 3. Volatilidad (desviación estándar de los últimos 20 días)
+    volatility = indicators.rolling_std(close_prices, 20)[-1]
 
     # 4. Recomendación Predictiva
     recommendation = "mantener"
@@ -136,35 +871,58 @@ def analyze_data(prices, dates, close_prices):
     elif short_term_trend < 0 and sma_5[-1] < ema_5[-1] and rsi > 30:
         recommendation = "vender"
 
-    # Generar el resumen en Markdown
-    summary_md = (
-        f"### Análisis Predictivo de Precios de Cierre\n"
-        f"**Período Analizado**: {dates[0].strftime('%Y-%m-%d')} a {dates[-1].strftime('%Y-%m-%d')} ({len(dates)} días)\n\n"
-        
-        f"#### 1. Tendencia de Precios\n"
-        f"- **Largo Plazo ({long_term_window} días)**: {'positiva' if long_term_trend > 0 else 'negativa'} (pendiente: {long_term_trend:.4f}).\n"
-        f"- **Corto Plazo (10 días)**: {'positiva' if short_term_trend > 0 else 'negativa'} (pendiente: {short_term_trend:.4f}).\n\n"
-        
-        f"#### 2. Indicadores Técnicos\n"
-        f"- **SMA_5**: {sma_5[-1]:.2f} USD (media móvil simple de 5 días).\n"
-        f"- **EMA_5**: {ema_5[-1]:.2f} USD (media móvil exponencial de 5 días).\n"
-        f"- **RSI (14 días)**: {rsi:.2f} ({'sobrecomprado' if rsi > 70 else 'sobrevendido' if rsi < 30 else 'neutral'}).\n\n"
-        
-        f"#### 3. Volatilidad\n"
-        f"- **Desviación Estándar (20 días)**: {volatility:.2f} USD ({'baja' if volatility < 5 else 'alta'}).\n\n"
-        
-        f"#### 4. Recomendación\n"
-        f"**{recommendation.upper()}**\n"
-        f"Basado en un análisis predictivo del comportamiento histórico, se recomienda **{recommendation}** la acción. "
-        f"Esto se fundamenta en la tendencia a corto plazo ({'alcista' if short_term_trend > 0 else 'bajista'}), "
-        f"el cruce entre SMA_5 y EMA_5 ({'señal de compra' if sma_5[-1] > ema_5[-1] else 'señal de venta'}), "
-        f"y el RSI que indica {'condiciones normales' if 30 <= rsi <= 70 else 'extremos a considerar'}. "
-        f"La volatilidad actual sugiere un mercado {'estable' if volatility < 5 else 'inestable'}, "
-        f"lo que refuerza la decisión. Se aconseja monitorear continuamente los indicadores para ajustar la estrategia ante cambios significativos."
-    )
+    return {
+        'start': pd.Timestamp(dates[positions[0]]).strftime('%Y-%m-%d'),
+        'end': pd.Timestamp(dates[positions[-1]]).strftime('%Y-%m-%d'),
+        'days': len(positions),
+        'long_term_window': long_term_window,
+        'long_term_trend': float(long_term_trend),
+        'short_term_trend': float(short_term_trend),
+        'sma_5': float(sma_5[-1]),
+        'ema_5': float(ema_5[-1]),
+        'rsi_14': float(rsi),
+        'volatility_20': float(volatility),
+        'recommendation': recommendation,
+    }
+
+def _present(values):
+    """Máscara de los valores distintos de None (en un array de NumPy, todos)."""
+    if isinstance(values, np.ndarray):
+        return np.ones(len(values), dtype=bool)
+    return np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
 
-    # Convertir el Markdown a HTML
-    summary_html = markdown.markdown(summary_md)
+def render_analysis(result):
+    """
+    Genera el informe HTML de un análisis a partir de la plantilla analysis.html.
+
+    Django compila la plantilla una sola vez y la reutiliza, así que el informe no pasa
+    por ningún parser de Markdown.
+    """
+    if 'error' in result:
+        return result['error']
 
-    return summary_html
-    
+    short_term_up = result['short_term_trend'] > 0
+    rsi, volatility = result['rsi_14'], result['volatility_20']
+    context = {
+        'start': result['start'],
+        'end': result['end'],
+        'days': result['days'],
+        'long_term_window': result['long_term_window'],
+        'long_term_trend': f"{result['long_term_trend']:.4f}",
+        'long_term_label': 'positiva' if result['long_term_trend'] > 0 else 'negativa',
+        'short_term_trend': f"{result['short_term_trend']:.4f}",
+        'short_term_label': 'positiva' if short_term_up else 'negativa',
+        'short_term_direction': 'alcista' if short_term_up else 'bajista',
+        'sma_5': f"{result['sma_5']:.2f}",
+        'ema_5': f"{result['ema_5']:.2f}",
+        'cross_signal': 'señal de compra' if result['sma_5'] > result['ema_5'] else 'señal de venta',
+        'rsi_14': f"{rsi:.2f}",
+        'rsi_label': 'sobrecomprado' if rsi > 70 else 'sobrevendido' if rsi < 30 else 'neutral',
+        'rsi_condition': 'condiciones normales' if 30 <= rsi <= 70 else 'extremos a considerar',
+        'volatility_20': f"{volatility:.2f}",
+        'volatility_label': 'baja' if volatility < 5 else 'alta',
+        'market_state': 'estable' if volatility < 5 else 'inestable',
+        'recommendation': result['recommendation'],
+    }
+    with metrics.timed('render'):
+        return get_template('analysis.html').render(context).rstrip('\n')
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import incremental, store
+
+
+def _timed_fetch(ticker, gaps):
+    """Descarga todos los huecos de un ticker y mide cuánto tarda."""
+    started = time.perf_counter()
+    fetched = [store.fetch_upstream(ticker, gap_start, gap_end) for gap_start, gap_end in gaps]
+    return fetched, time.perf_counter() - started
+
+
+def warm_up(tickers, start, end, max_workers=None):
+    """
+    Precarga el histórico reciente y el análisis de un universo de tickers.
+
+    Las descargas se hacen con concurrencia acotada; el guardado en el almacén, el análisis y
+    la actualización de los indicadores incrementales se hacen en el hilo que llama.
+
+    Parámetros:
+    - tickers: Lista de símbolos.
+    - start, end: Fechas (date) del rango a precargar, ambos extremos incluidos.
+    - max_workers: Máximo de descargas simultáneas (por defecto MARKET_DATA_MAX_WORKERS).
+
+    Retorna:
+    - Lista de diccionarios por ticker con 'ticker', 'gaps', 'bars', 'fetch_s', 'analysis_s' y 'error'.
+    """
+    from .views import build_returns
+
+    gaps = {ticker: store.missing_ranges(ticker, start, end) for ticker in tickers}
+    pending = [ticker for ticker in tickers if gaps[ticker]]
+    max_workers = max_workers or getattr(settings, 'MARKET_DATA_MAX_WORKERS', 8)
+
+    fetched = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {ticker: executor.submit(_timed_fetch, ticker, gaps[ticker]) for ticker in pending}
+        for ticker, future in futures.items():
+            try:
+                fetched[ticker] = future.result()
+            except Exception as error:
+                fetched[ticker] = error
+
+    report = []
+    from_date, to_date = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    for ticker in tickers:
+        row = {'ticker': ticker, 'gaps': len(gaps[ticker]), 'bars': 0, 'fetch_s': 0.0, 'analysis_s': 0.0, 'error': None}
+        result = fetched.get(ticker)
+        if isinstance(result, Exception):
+            row['error'] = str(result)
+            report.append(row)
+            continue
+        if result is not None:
+            frames, row['fetch_s'] = result
+            for (gap_start, gap_end), stock_data in zip(gaps[ticker], frames):
+                store.save_bars(ticker, stock_data, gap_start, gap_end)
+
+        stock_data = store.load_bars(ticker, start, end)
+        row['bars'] = len(stock_data)
+        if not stock_data.empty:
+            started = time.perf_counter()
+            build_returns(ticker, from_date, to_date, stock_data)
+            row['analysis_s'] = time.perf_counter() - started
+        report.append(row)
+
+    incremental.refresh_states(list(tickers))
+    return report
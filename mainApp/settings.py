@@ -78,6 +78,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Las transacciones toman el lock de escritura al empezar (BEGIN IMMEDIATE): una que lee
+        # antes de escribir no puede fallar con "database is locked" al pasar a escritura mientras
+        # otro hilo escribe; espera su turno como cualquier escritura
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Base de pruebas en archivo (como en producción): SQLite en memoria con caché compartida
+        # bloquea las tablas ante escrituras concurrentes (load_test, servidor de pruebas)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -126,3 +137,69 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Caché en memoria de los análisis de financialSearch (número máximo de entradas y vida en segundos)
+
+ANALYSIS_CACHE_MAXSIZE = 256
+
+ANALYSIS_CACHE_TTL = 300
+
+# Descargas simultáneas máximas hacia el proveedor de datos de mercado
+
+MARKET_DATA_MAX_WORKERS = 8
+
+# Hilos de la vista asíncrona getReturnsAsync: descargas en curso y cálculo de indicadores
+
+ASYNC_FETCH_WORKERS = 100
+
+ASYNC_COMPUTE_WORKERS = 4
+
+# Vida en caché (segundos) de GET /returns/<ticker>: rangos ya cerrados y rangos que incluyen hoy
+
+RETURNS_CLOSED_MAX_AGE = 31536000
+
+RETURNS_OPEN_MAX_AGE = 60
+
+# Caché de matrices alineadas de rendimientos de getPortfolio (entradas y vida en segundos)
+
+PORTFOLIO_CACHE_MAXSIZE = 32
+
+PORTFOLIO_CACHE_TTL = 300
+
+# Procesos del pool compartido del backtest de getBacktest (None usa todos los núcleos); el pool
+# se crea una vez por proceso y solo se usa con muchos tickers (backtest.PARALLEL_MIN_TICKERS)
+
+BACKTEST_MAX_WORKERS = None
+
+# Procesos del pool compartido del screener de getScreener (None usa todos los núcleos); solo se
+# usa en universos grandes (screener.PARALLEL_MIN_TICKERS)
+
+SCREENER_MAX_WORKERS = None
+
+# Archivos columnares de precios por ticker leídos con memmap (None los desactiva)
+
+PRICE_FILES_DIR = BASE_DIR / 'price_files'
+
+# Proveedor de datos de mercado de store.fetch_upstream (ver financialSearch/providers.py):
+# YFinanceProvider, ReplayProvider (OPTIONS {'path': carpeta}) o SyntheticProvider
+
+MARKET_DATA_PROVIDER = {
+    'BACKEND': 'financialSearch.providers.YFinanceProvider',
+    'OPTIONS': {},
+}
+
+# Canal en vivo /live/<ticker>: segundos entre consultas al proveedor por ticker y entre
+# comentarios keepalive de Server-Sent Events
+
+LIVE_POLL_INTERVAL = 60
+
+LIVE_KEEPALIVE = 15
+
+# Planificador de descargas al proveedor (financialSearch/scheduler.py): cubeta de tokens del
+# proceso con RATE consultas por segundo y ráfagas de hasta BURST (None la desactiva), y
+# reintentos con espera exponencial (BACKOFF * 2^intento, como máximo MAX_BACKOFF) y jitter
+
+MARKET_DATA_RATE_LIMIT = {'RATE': 2.0, 'BURST': 10}
+
+MARKET_DATA_RETRIES = {'ATTEMPTS': 3, 'BACKOFF': 0.5, 'MAX_BACKOFF': 8.0}
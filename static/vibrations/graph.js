@@ -15,6 +15,7 @@ function getCookie(name) {
 }
 
 let chart, smaChartInstance, diffChartInstance, emaChartInstance;
+let liveSource;
 
 async function obtenerDatos() {
     const from = document.getElementById('from').value;
@@ -32,13 +33,16 @@ async function obtenerDatos() {
         body: new URLSearchParams({
             'from': from,
             'to': to,
-            'brand': brand
+            'brand': brand,
+            // Solo las series que se grafican; EMA y variaciones llegan calculadas del servidor
+            'fields': 'close,sma_5,ema_5,diff'
         })
     });
 
     if (response.ok) {
         const data = await response.json();
         graficarDatos(data);
+        suscribirEnVivo(brand, from, to);
     } else {
         console.error('Error en la consulta:', response.statusText);
     }
@@ -147,13 +151,9 @@ function graficarSMAArea(data) {
 }
 
 function graficarDiferencias(data) {
+    // La variación diaria ya viene calculada por el servidor (la primera barra no tiene variación)
     const labels = data.data.slice(1).map(item => item.date);
-    const closingPrices = data.data.map(item => item.close);
-    const changes = [];
-
-    for (let i = 1; i < closingPrices.length; i++) {
-        changes.push(closingPrices[i] - closingPrices[i - 1]);
-    }
+    const changes = data.data.slice(1).map(item => item.diff);
 
     const ctx = document.getElementById('diffChart').getContext('2d');
     if (diffChartInstance) diffChartInstance.destroy();
@@ -182,32 +182,10 @@ function graficarDiferencias(data) {
     });
 }
 
-function calcularEMA(data, window) {
-    let k = 2 / (window + 1);
-    let emaArray = [];
-    let emaPrev = null;
-
-    for (let i = 0; i < data.length; i++) {
-        if (data[i] === null || isNaN(data[i])) {
-            emaArray.push(null);
-            continue;
-        }
-
-        if (emaPrev === null) {
-            emaPrev = data[i];
-        } else {
-            emaPrev = data[i] * k + emaPrev * (1 - k);
-        }
-        emaArray.push(emaPrev);
-    }
-    return emaArray;
-}
-
 function graficarSMAvsEMA(data) {
     const labels = data.data.map(item => item.date);
     const sma = data.data.map(item => item.sma_5);
-    const closePrices = data.data.map(item => item.close);
-    const ema = calcularEMA(closePrices, 5);
+    const ema = data.data.map(item => item.ema_5);
     const ctx = document.getElementById('emaChart').getContext('2d');
     if (emaChartInstance) emaChartInstance.destroy();
     emaChartInstance = new Chart(ctx, {
@@ -246,3 +224,42 @@ function graficarSMAvsEMA(data) {
         }
     });
 }
+
+// Actualizaciones en vivo: si el rango llega hasta hoy, el servidor envía por Server-Sent Events
+// las barras nuevas con sus indicadores y se agregan a los gráficos sin volver a pedir el rango
+function suscribirEnVivo(brand, from, to) {
+    if (liveSource) {
+        liveSource.close();
+        liveSource = null;
+    }
+    const today = new Date().toISOString().slice(0, 10);
+    if (!window.EventSource || to < today) {
+        return;
+    }
+    liveSource = new EventSource(`/live/${encodeURIComponent(brand)}?from=${from}`);
+    liveSource.addEventListener('bar', event => agregarBarra(JSON.parse(event.data)));
+}
+
+function agregarBarra(bar) {
+    const labels = chart.data.labels;
+    // La barra de hoy llega varias veces mientras cambia su cierre: se reemplaza el último punto
+    const replace = labels.length && labels[labels.length - 1] === bar.date;
+    const previousClose = chart.data.datasets[0].data[labels.length - (replace ? 2 : 1)];
+
+    const values = [
+        [chart, [bar.close, bar.sma_5]],
+        [smaChartInstance, [bar.sma_5]],
+        [emaChartInstance, [bar.sma_5, bar.ema_5]],
+        [diffChartInstance, [previousClose === undefined ? null : bar.close - previousClose]],
+    ];
+    for (const [instance, points] of values) {
+        if (replace) {
+            instance.data.labels[instance.data.labels.length - 1] = bar.date;
+            points.forEach((point, i) => instance.data.datasets[i].data[instance.data.datasets[i].data.length - 1] = point);
+        } else {
+            instance.data.labels.push(bar.date);
+            points.forEach((point, i) => instance.data.datasets[i].data.push(point));
+        }
+        instance.update('none');
+    }
+}